@@ -0,0 +1,28 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.db import connections
+
+
+def _run_in_worker(function, args):
+    # Каждый процесс открывает свое соединение с БД и закрывает его после задачи
+    try:
+        return function(*args)
+    finally:
+        connections.close_all()
+
+
+def run_parallel(function, tasks, workers):
+    """
+    Вызывает function(*args) для каждого кортежа аргументов из tasks в
+    workers процессах и возвращает результаты в порядке задач. При
+    workers == 1 задачи выполняются в текущем процессе. function должна
+    быть объявлена на уровне модуля, чтобы ее можно было передать в
+    дочерний процесс.
+    """
+    if workers == 1:
+        return [function(*args) for args in tasks]
+    # Соединение родителя не должно достаться дочерним процессам
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(partial(_run_in_worker, function), tasks))
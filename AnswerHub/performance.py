@@ -0,0 +1,262 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.shortcuts import redirect, render
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.utils import timezone
+
+logger = logging.getLogger('answerhub.performance')
+
+# Метрики текущего запроса; None, если запрос не попал в выборку
+_current = ContextVar('request_metrics', default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    """Счетчики одного запроса. Время в секундах."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обертка connection.execute_wrapper: время каждого запроса к БД
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self):
+        """
+        Значение заголовка Server-Timing. Интервалы пересекаются: запросы,
+        выполненные при рендеринге, входят и в db, и в tpl, а все вместе -
+        в total.
+        """
+        return ', '.join([
+            'db;dur=%.1f;desc="%s queries"' % (self.db_time * 1000, self.queries),
+            'tpl;dur=%.1f' % (self.template_time * 1000),
+            'cache;desc="hit=%s miss=%s"' % (self.cache_hits, self.cache_misses),
+            'total;dur=%.1f' % (self.total_time * 1000),
+        ])
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'total_ms': round(self.total_time * 1000, 1),
+        }
+
+
+class TimedTemplate(Template):
+    """Шаблон, время рендеринга которого добавляется к метрикам запроса."""
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Бэкенд шаблонов Django с замером времени рендеринга. Замеряются только
+    шаблоны, которые рендерят виды ({% include %} и {% extends %} входят
+    во время родителя и не считаются дважды).
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class MeteredCacheMixin:
+    """
+    Считает попадания и промахи get/get_many в метриках запроса. Подмешивается
+    к классу бэкенда кеша, например MeteredLocMemCache ниже; для Redis или
+    Memcached достаточно такого же подкласса их бэкенда.
+    """
+    _in_get_many = False
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        metrics = _current.get()
+        if metrics is not None and not self._in_get_many:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        # Базовый get_many вызывает get для каждого ключа - не считаем их дважды
+        self._in_get_many = True
+        try:
+            values = super().get_many(keys, version)
+        finally:
+            self._in_get_many = False
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
+
+
+class MeteredLocMemCache(MeteredCacheMixin, LocMemCache):
+    pass
+
+
+class EndpointStats:
+    """
+    Сводка по представлениям в памяти процесса: число запросов, средние
+    значения метрик и перцентили времени по последним
+    PERFORMANCE_SUMMARY_WINDOW запросам. При нескольких воркерах у каждого
+    своя сводка.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.started_at = timezone.now()
+
+    def add(self, view_name, metrics):
+        with self._lock:
+            entry = self._endpoints.get(view_name)
+            if entry is None:
+                entry = self._endpoints[view_name] = {
+                    'requests': 0,
+                    'total_time': 0.0,
+                    'db_time': 0.0,
+                    'template_time': 0.0,
+                    'queries': 0,
+                    'cache_hits': 0,
+                    'cache_misses': 0,
+                    'max_time': 0.0,
+                    'recent': deque(maxlen=settings.PERFORMANCE_SUMMARY_WINDOW),
+                }
+            entry['requests'] += 1
+            entry['total_time'] += metrics.total_time
+            entry['db_time'] += metrics.db_time
+            entry['template_time'] += metrics.template_time
+            entry['queries'] += metrics.queries
+            entry['cache_hits'] += metrics.cache_hits
+            entry['cache_misses'] += metrics.cache_misses
+            entry['max_time'] = max(entry['max_time'], metrics.total_time)
+            entry['recent'].append(metrics.total_time)
+
+    def summary(self, limit=None):
+        """Представления от самых медленных (по p95) к самым быстрым. Время в мс."""
+        with self._lock:
+            rows = []
+            for view_name, entry in self._endpoints.items():
+                recent = sorted(entry['recent'])
+                requests = entry['requests']
+                cache_lookups = entry['cache_hits'] + entry['cache_misses']
+                rows.append({
+                    'view': view_name,
+                    'requests': requests,
+                    'avg_ms': entry['total_time'] / requests * 1000,
+                    'p50_ms': recent[len(recent) // 2] * 1000,
+                    'p95_ms': recent[min(int(len(recent) * 0.95), len(recent) - 1)] * 1000,
+                    'max_ms': entry['max_time'] * 1000,
+                    'avg_queries': entry['queries'] / requests,
+                    'avg_db_ms': entry['db_time'] / requests * 1000,
+                    'avg_template_ms': entry['template_time'] / requests * 1000,
+                    'cache_hit_rate': entry['cache_hits'] / cache_lookups if cache_lookups else None,
+                })
+        rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.started_at = timezone.now()
+
+
+endpoint_stats = EndpointStats()
+
+
+class PerformanceMiddleware:
+    """
+    Метрики запроса: число и время SQL-запросов, время рендеринга шаблонов,
+    попадания и промахи кеша и полное время обработки. Отдаются заголовком
+    Server-Timing, пишутся строкой JSON в лог answerhub.performance с именем
+    URL и копятся в сводке endpoint_stats для админки.
+
+    В выборку попадает доля PERFORMANCE_SAMPLE_RATE запросов, остальные
+    проходят без накладных расходов. Middleware стоит первым в MIDDLEWARE,
+    чтобы учитывать запросы сессий и аутентификации.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PERFORMANCE_SAMPLE_RATE:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            metrics.total_time = time.perf_counter() - start
+            _current.reset(token)
+
+        match = request.resolver_match
+        view_name = match.view_name if match else '<unresolved>'
+        endpoint_stats.add(view_name, metrics)
+
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing()
+
+        record = dict(metrics.as_dict(), view=view_name, method=request.method, status=response.status_code)
+        level = logging.WARNING if metrics.total_time * 1000 >= settings.PERFORMANCE_SLOW_REQUEST_MS else logging.INFO
+        logger.log(level, json.dumps(record, sort_keys=True), extra={'performance': record})
+        return response
+
+
+def summary_view(request):
+    """Страница админки со сводкой по самым медленным представлениям."""
+    if request.method == 'POST':
+        endpoint_stats.reset()
+        messages.success(request, 'Статистика сброшена')
+        return redirect('performance_summary')
+
+    return render(request, 'admin/performance_summary.html', {
+        **admin.site.each_context(request),
+        'title': 'Производительность представлений',
+        'rows': endpoint_stats.summary(settings.PERFORMANCE_SUMMARY_LIMIT),
+        'started_at': endpoint_stats.started_at,
+        'sample_rate': settings.PERFORMANCE_SAMPLE_RATE,
+    })
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 INSTALLED_APPS += [
@@ -42,6 +43,7 @@ INSTALLED_APPS += [
 ]
 
 MIDDLEWARE = [
+    'AnswerHub.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,7 +57,8 @@ ROOT_URLCONF = 'AnswerHub.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга (AnswerHub/performance.py)
+        'BACKEND': 'AnswerHub.performance.TimedDjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates',
         ],
@@ -91,6 +94,126 @@ DATABASES = {
 
 AUTH_USER_MODEL = 'users.User'
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMemCache живет внутри одного процесса: при нескольких воркерах явный сброс
+# виден только в текущем процессе, остальные обновятся по таймауту.
+# Для общего кеша укажите Redis или Memcached.
+
+CACHES = {
+    'default': {
+        # LocMemCache со счетчиками попаданий для PerformanceMiddleware
+        'BACKEND': 'AnswerHub.performance.MeteredLocMemCache',
+        'LOCATION': 'answerhub',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    }
+}
+
+# Блоки боковой панели (популярные теги, лучшие пользователи)
+SIDEBAR_CACHE_TIMEOUT = 300
+SIDEBAR_POPULAR_TAGS_LIMIT = 12
+SIDEBAR_TOP_USERS_LIMIT = 5
+
+# Буфер просмотров вопросов (questions/viewcount.py)
+VIEW_BUFFER_FLUSH_INTERVAL = 10  # секунд между выгрузками буфера в БД
+VIEW_BUFFER_BATCH_SIZE = 1000  # событий в одной пачке выгрузки
+# Выгрузка из запроса, пришедшего после интервала. С общим кешем ее можно
+# отключить и запускать периодически: python manage.py flush_views --interval 10
+VIEW_BUFFER_INLINE_FLUSH = True
+VIEW_BUFFER_SEEN_TIMEOUT = 60 * 60 * 24  # сколько помнить уже учтенную пару
+
+# Движок уникальных просмотров:
+# 'm2m' - точный учет авторизованных зрителей в таблице viewed_by,
+# 'hll' - HyperLogLog-скетчи (около 1.6% погрешности), учитывают и анонимов.
+# Перед переключением на 'hll' выполните python manage.py fold_viewed_by
+QUESTION_VIEWS_ENGINE = 'm2m'
+VIEW_SKETCH_PRECISION = 12
+VIEW_BLOOM_CAPACITY = 100000
+VIEWER_COOKIE_NAME = 'viewer_id'
+
+# Автодополнение тегов: индекс имен в памяти процесса
+TAG_AUTOCOMPLETE_LIMIT = 8
+TAG_AUTOCOMPLETE_REFRESH_INTERVAL = 60  # догрузка тегов, созданных другими процессами
+TAG_AUTOCOMPLETE_REBUILD_INTERVAL = 600  # полная перезагрузка индекса
+
+# Похожие теги (матрица совместного использования, build_tag_cooccurrence)
+TAG_RELATED_LIMIT = 10
+TAG_COOCCURRENCE_TOP_N = 20
+
+# Похожие вопросы на странице вопроса (RelatedQuestion, build_related_questions)
+RELATED_QUESTIONS_LIMIT = 5
+RELATED_QUESTIONS_TOP_K = 10
+RELATED_QUESTIONS_MAX_CANDIDATES = 500  # лучших по голосам вопросов на тег
+RELATED_QUESTIONS_VOTE_WEIGHT = 0.25
+
+# Поиск (search/backends.py): 'postgres' - полнотекстовый поиск PostgreSQL,
+# 'bm25' - переносимый индекс BM25 в памяти процесса (search/index.py),
+# 'icontains' - простой поиск подстроки без индексов
+SEARCH_BACKEND = 'postgres'
+# Конфигурация текстового поиска; должна совпадать с конфигурацией в
+# триггерах, заполняющих search_vector (миграции questions и answers)
+SEARCH_CONFIG = 'russian'
+# Выдача поиска: каждый блок (вопросы, ответы, теги) листается отдельно,
+# а совпадения считаются не дальше SEARCH_COUNT_CAP ("1000+")
+SEARCH_COUNT_CAP = 1000
+SEARCH_ANSWERS_PER_PAGE = 10
+SEARCH_TAGS_PER_PAGE = 30
+# Кеш первых страниц выдачи (search/cache.py); правки вопросов и ответов
+# сбрасывают его сразу, таймаут ограничивает устаревание тегов
+SEARCH_CACHE_TIMEOUT = 60
+# Нечеткий поиск на триграммах (search/fuzzy.py, pg_trgm): включается,
+# когда основной поиск нашел меньше SEARCH_FUZZY_MIN_RESULTS совпадений
+SEARCH_FUZZY_MIN_RESULTS = 3
+SEARCH_FUZZY_LIMIT = 10
+SEARCH_FUZZY_MAX_WORDS = 5
+SEARCH_TRIGRAM_SIMILARITY = 0.3  # порог similarity для имен тегов
+SEARCH_TRIGRAM_WORD_SIMILARITY = 0.5  # порог word_similarity для заголовков
+# Индекс BM25: файл для быстрого старта процессов (mmap), догрузка
+# изменений других процессов и размер выдачи
+SEARCH_BM25_PATH = BASE_DIR / 'var' / 'bm25.idx'
+SEARCH_BM25_REFRESH_INTERVAL = 60
+SEARCH_BM25_CATCH_UP_OVERLAP = 300  # секунд до водяного знака, которые перечитываются (долгие транзакции)
+SEARCH_BM25_MAX_RESULTS = 1000
+SEARCH_BM25_CHUNK_SIZE = 20000  # id на одну часть при сборке индекса
+
+# Поиск дублей при создании вопроса (MinHash + LSH, QuestionSignature):
+# 48 хешей в 16 полосах по 3 - кандидатами становятся тексты со сходством
+# Жаккара примерно от 0.4. Смена параметров требует backfill_question_signatures
+DUPLICATES_NUM_PERM = 48
+DUPLICATES_BANDS = 16
+DUPLICATES_MIN_SIMILARITY = 0.4
+DUPLICATES_MAX_CANDIDATES = 500
+DUPLICATES_LIMIT = 5
+DUPLICATES_MAX_CONTENT = 20000  # символов текста, которые разбирает api/duplicates
+
+# Метрики запросов (AnswerHub/performance.py): заголовок Server-Timing,
+# строка JSON в логе answerhub.performance и сводка в админке
+# (/admin/performance/). В production достаточно выборки в 1-5% запросов
+PERFORMANCE_SAMPLE_RATE = 1.0
+PERFORMANCE_SERVER_TIMING = True  # заголовок раскрывает внутренние тайминги
+PERFORMANCE_SLOW_REQUEST_MS = 500  # медленные запросы пишутся с уровнем WARNING
+PERFORMANCE_SUMMARY_WINDOW = 500  # последних запросов на представление для перцентилей
+PERFORMANCE_SUMMARY_LIMIT = 50  # строк в сводке
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'answerhub.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.cache import cache
+from tags.models import Tag
+from users.models import User
+
+
+class CachedSidebar:
+    """
+    Кешируемый блок боковой панели.
+
+    Данные загружаются функцией loader не чаще одного раза в
+    SIDEBAR_CACHE_TIMEOUT секунд и сбрасываются явно, когда меняются
+    данные, из которых блок построен.
+    """
+
+    def __init__(self, key, loader):
+        self.key = key
+        self.loader = loader
+
+    def get(self):
+        data = cache.get(self.key)
+        if data is None:
+            data = list(self.loader())
+            cache.set(self.key, data, settings.SIDEBAR_CACHE_TIMEOUT)
+        return data
+
+    def invalidate(self):
+        cache.delete(self.key)
+
+
+def _load_popular_tags():
+    return Tag.objects.only('id', 'name', 'usage_count').popular(limit=settings.SIDEBAR_POPULAR_TAGS_LIMIT)
+
+
+def _load_top_users():
+    # Только поля, нужные шаблону, - в кеш не должен попадать хеш пароля
+    return User.objects.only('id', 'username', 'avatar', 'reputation').top_by_reputation()[:settings.SIDEBAR_TOP_USERS_LIMIT]
+
+
+popular_tags = CachedSidebar('sidebar:popular_tags', _load_popular_tags)
+top_users = CachedSidebar('sidebar:top_users', _load_top_users)
@@ -0,0 +1,281 @@
+import json
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.template.base import TokenType
+from django.test import TestCase, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+
+from answers.models import Answer, AnswerVote
+from AnswerHub.performance import endpoint_stats
+from questions.models import Question, QuestionSignature, QuestionVote, RelatedQuestion
+from tags.models import Tag
+from users.models import User
+
+# Бюджеты запросов по представлениям и размеры наборов данных
+BUDGETS_PATH = Path(__file__).with_name('query_budgets.json')
+
+# Представления, которые рендерятся на каждом размере данных:
+# имя URL -> (функция, собирающая путь по набору данных, нужен ли вход).
+# Пользователь набора данных - автор главного вопроса и сотрудник (staff).
+VIEWS = {
+    'questions:list': (lambda data: reverse('questions:list'), True),
+    'questions:hot': (lambda data: reverse('questions:hot'), True),
+    'questions:my': (lambda data: reverse('questions:my'), True),
+    'questions:detail': (lambda data: reverse('questions:detail', args=[data.question.pk]), True),
+    'questions:ask': (lambda data: reverse('questions:ask'), True),
+    'questions:edit': (lambda data: reverse('questions:edit', args=[data.question.pk]), True),
+    'questions:delete': (lambda data: reverse('questions:delete', args=[data.question.pk]), True),
+    'questions:vote_state': (lambda data: '%s?questions=%s&answers=%s' % (
+        reverse('questions:vote_state'),
+        ','.join(str(pk) for pk in data.question_ids),
+        ','.join(str(pk) for pk in data.answer_ids),
+    ), True),
+    'questions:duplicates': (lambda data: '%s?title=%s' % (reverse('questions:duplicates'), data.question.title), True),
+    'tags:list': (lambda data: reverse('tags:list'), True),
+    'tags:detail': (lambda data: reverse('tags:detail', args=[data.tag.name]), True),
+    'tags:autocomplete': (lambda data: '%s?q=tag' % reverse('tags:autocomplete'), True),
+    'search:search': (lambda data: '%s?q=django' % reverse('search:search'), True),
+    'users:login': (lambda data: reverse('users:login'), False),
+    'users:signup': (lambda data: reverse('users:signup'), False),
+    'users:profile_edit': (lambda data: reverse('users:profile_edit'), True),
+    'performance_summary': (lambda data: reverse('performance_summary'), True),
+}
+
+# Маршруты без своей страницы, которые харнес не рендерит: обработчики POST
+# и редиректы. Страницы самой админки Django (пространство имен admin)
+# тоже не проверяются.
+NOT_RENDERED = {
+    'questions:vote_question',
+    'answers:create',
+    'answers:vote',
+    'answers:mark_correct',
+    'answers:delete',
+    'users:logout',
+}
+SKIPPED_NAMESPACES = {'admin'}
+
+
+def url_names(patterns=None, namespace=None):
+    """Имена всех маршрутов URLconf с пространствами имен: "questions:list"."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in SKIPPED_NAMESPACES:
+                continue
+            nested = ':'.join(filter(None, (namespace, pattern.namespace))) or None
+            names |= url_names(pattern.url_patterns, nested)
+        elif pattern.name:
+            names.add('%s:%s' % (namespace, pattern.name) if namespace else pattern.name)
+    return names
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+LIMIT_RE = re.compile(r'\b(LIMIT|OFFSET) \d+')
+
+
+def normalize_sql(sql):
+    """SQL без значений, зависящих от размера данных: списков IN и LIMIT/OFFSET."""
+    return LIMIT_RE.sub(r'\1 N', IN_LIST_RE.sub('IN (...)', sql))
+
+
+def _template_location(frame):
+    """Ближайший к запросу узел шаблона: "шаблон:строка {{ ... }}"."""
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                tag = '{{ %s }}' if token.token_type == TokenType.VAR else '{%% %s %%}'
+                return '%s:%s %s' % (origin.template_name, token.lineno, tag % token.contents)
+        frame = frame.f_back
+    return None
+
+
+def _code_location(frame):
+    """Ближайшая к запросу строка кода проекта (не Django и не этого файла)."""
+    base_dir = str(settings.BASE_DIR)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base_dir) and filename != __file__ and 'site-packages' not in filename:
+            return '%s:%s' % (Path(filename).relative_to(base_dir), frame.f_lineno)
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """
+    Записывает выполненные запросы: нормализованный SQL, строку шаблона
+    и кода, откуда он пришел.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        frame = sys._getframe(1)
+        self.queries.append((normalize_sql(sql), _template_location(frame), _code_location(frame)))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def counts(self):
+        return Counter(sql for sql, _, _ in self.queries)
+
+    def locations(self, sql):
+        return sorted({
+            ' / '.join(filter(None, (template, code))) or '?'
+            for query, template, code in self.queries if query == sql
+        })
+
+
+class Dataset:
+    """
+    Набор данных, который растет до заданного размера: столько же вопросов
+    (с общим тегом django и собственным тегом), ответов на главный вопрос,
+    авторов и голосов текущего пользователя за вопросы и ответы.
+    """
+
+    def __init__(self):
+        self.viewer = User.objects.create_user(username='viewer', password='x', is_staff=True)
+        self.tag = Tag.objects.create(name='django')
+        self.question = self._question(0, self.viewer)
+        self.question_ids = [self.question.pk]
+        self.answer_ids = []
+        self.size = 0
+
+    def _question(self, number, author):
+        question = Question.objects.create(
+            title='Django question number %s' % number,
+            content='How to configure django project %s' % number,
+            author=author,
+        )
+        Tag.objects.set_for_question(question, ['django', 'tag%s' % number])
+        QuestionSignature.objects.update_for([(question.pk, question.title, question.content)])
+        return question
+
+    def grow(self, size):
+        for number in range(self.size + 1, size + 1):
+            author = User.objects.create_user(
+                username='author%s' % number, password='x', avatar='avatars/author%s.png' % number,
+            )
+            question = self._question(number, author)
+            QuestionVote.objects.add_or_update_vote(self.viewer, question, 1)
+            self.question_ids.append(question.pk)
+
+            answer = Answer.objects.create(content='Answer %s' % number, question=self.question, author=author)
+            AnswerVote.objects.add_or_update_vote(self.viewer, answer, 1)
+            self.answer_ids.append(answer.pk)
+        RelatedQuestion.objects.refresh_for(self.question)
+        self.size = size
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=0)
+class QueryCountTests(TestCase):
+    """
+    Харнес N+1: каждое представление рендерится на двух размерах данных,
+    и число SQL-запросов не должно расти вместе с числом строк на странице.
+    При росте тест показывает запросы, которых стало больше, с местом в
+    шаблоне и коде. Бюджеты (максимум запросов на большом наборе) лежат в
+    AnswerHub/query_budgets.json.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(BUDGETS_PATH, encoding='utf-8') as file:
+            cls.config = json.load(file)
+
+    def _render(self, data, name):
+        path, login = VIEWS[name]
+        self.client.logout()
+        if login:
+            self.client.force_login(data.viewer)
+        # Кеш страниц и сайдбара не должен скрывать запросы
+        cache.clear()
+        self.client.get(path(data))
+        cache.clear()
+
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.client.get(path(data))
+        self.assertEqual(response.status_code, 200, '%s returned %s' % (name, response.status_code))
+        return recorder
+
+    def _growth_report(self, name, small, large, sizes):
+        lines = ['%s: %s queries with %s rows, %s with %s rows' % (name, len(small), sizes[0], len(large), sizes[1])]
+        small_counts = small.counts()
+        for sql, count in large.counts().most_common():
+            if count > small_counts.get(sql, 0):
+                lines.append('  %s -> %s times: %s' % (small_counts.get(sql, 0), count, sql))
+                lines.extend('      at %s' % location for location in large.locations(sql))
+        return '\n'.join(lines)
+
+    def test_budgets_cover_every_view(self):
+        # Новый маршрут должен попасть либо в VIEWS с бюджетом, либо в NOT_RENDERED
+        names = url_names()
+        self.assertEqual(set(VIEWS), names - NOT_RENDERED)
+        self.assertLessEqual(NOT_RENDERED, names)
+        self.assertEqual(set(self.config['views']), set(VIEWS))
+
+    def test_query_counts_do_not_grow(self):
+        sizes = self.config['sizes']
+        data = Dataset()
+        results = {}
+        for size in sizes:
+            data.grow(size)
+            for name in VIEWS:
+                results.setdefault(name, []).append(self._render(data, name))
+
+        for name, (small, large) in results.items():
+            with self.subTest(view=name):
+                self.assertLessEqual(len(large), len(small), self._growth_report(name, small, large, sizes))
+                budget = self.config['views'][name]
+                self.assertLessEqual(
+                    len(large), budget,
+                    '%s: %s queries, budget %s (%s)' % (name, len(large), budget, BUDGETS_PATH.name),
+                )
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        endpoint_stats.reset()
+        self.question = Question.objects.create(title='Performance question', content='Text', author=User.objects.create_user(username='author', password='x'))
+
+    def test_server_timing_and_summary(self):
+        with self.assertLogs('answerhub.performance') as logs:
+            response = self.client.get(reverse('questions:detail', args=[self.question.pk]))
+
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(timing, r'tpl;dur=[\d.]+')
+        self.assertRegex(timing, r'cache;desc="hit=\d+ miss=[1-9]\d*"')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'questions:detail')
+        self.assertEqual(record['status'], 200)
+
+        [row] = endpoint_stats.summary()
+        self.assertEqual((row['view'], row['requests']), ('questions:detail', 1))
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get(reverse('questions:list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(endpoint_stats.summary(), [])
+
+    def test_summary_requires_staff(self):
+        with self.assertLogs('answerhub.performance'):
+            self.assertEqual(self.client.get(reverse('performance_summary')).status_code, 302)
+
+            self.client.force_login(User.objects.create_superuser(username='admin', password='x'))
+            self.client.get(reverse('questions:list'))
+            response = self.client.get(reverse('performance_summary'))
+        self.assertContains(response, 'questions:list')
@@ -4,8 +4,11 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
 
+from .performance import summary_view
+
 urlpatterns = [
     path('', lambda request: redirect('questions/', permanent=False)),
+    path('admin/performance/', admin.site.admin_view(summary_view), name='performance_summary'),
     path('admin/', admin.site.urls),
     path('questions/', include('questions.urls')),
     path('users/', include('users.urls')),
@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+
+from questions.voting import apply_vote
+from users.models import ReputationEvent, User
 
 class AnswerManager(models.Manager):
     """Менеджер для модели Answer."""
@@ -18,17 +21,37 @@ class AnswerManager(models.Manager):
     def mark_correct(self, answer):
         """
         Устанавливает ответ как правильный и сбрасывает предыдущий правильный ответ
-        для того же вопроса.
+        для того же вопроса. Бонус за принятый ответ переходит к автору нового ответа.
         """
-        # Сброс флага у всех ответов для данного вопроса.
-        # Используем .all() для доступа ко всем объектам (включая потенциально неактивные),
-        # чтобы гарантировать сброс, если флаг is_correct был установлен неконсистентно.
-        answer.question.answers.all().update(is_correct=False)
+        with transaction.atomic(using=self.db):
+            # Сброс флага у всех ответов для данного вопроса.
+            # Используем .all() для доступа ко всем объектам (включая потенциально неактивные),
+            # чтобы гарантировать сброс, если флаг is_correct был установлен неконсистентно.
+            # select_for_update не дает двум параллельным отметкам выдать бонус дважды.
+            previous = list(
+                answer.question.answers.all().select_for_update()
+                .filter(is_correct=True).values_list('id', 'author_id', 'is_active')
+            )
+            if any(answer_id == answer.id for answer_id, _, _ in previous):
+                return answer
+
+            answer.question.answers.all().filter(is_correct=True).update(is_correct=False)
 
-        # Установка нового правильного ответа
-        answer.is_correct = True
-        answer.is_active = True # Правильный ответ должен быть активным
-        answer.save(update_fields=['is_correct', 'is_active'])
+            # Установка нового правильного ответа. update() вместо save():
+            # меняются только флаги, остальные поля экземпляра могли устареть
+            answer.is_correct = True
+            answer.is_active = True # Правильный ответ должен быть активным
+            self.model.all_objects.filter(pk=answer.pk).update(is_correct=True, is_active=True)
+
+            bonus = ReputationEvent.ANSWER_ACCEPTED_BONUS
+            ReputationEvent.objects.record(
+                [
+                    ReputationEvent(user_id=author_id, kind=ReputationEvent.ANSWER_ACCEPTED, delta=-bonus, object_id=answer_id)
+                    for answer_id, author_id, is_active in previous if is_active
+                ] + [
+                    ReputationEvent(user_id=answer.author_id, kind=ReputationEvent.ANSWER_ACCEPTED, delta=bonus, object_id=answer.id)
+                ]
+            )
 
         return answer
 
@@ -40,43 +63,43 @@ class AnswerVoteManager(models.Manager):
         """Возвращает существующий голос пользователя за ответ."""
         return self.filter(user=user, answer=answer).first()
 
+    def votes_map(self, user, answer_ids):
+        """
+        Возвращает голоса пользователя за набор ответов одним запросом:
+        {answer_id: value}. Для анонимного пользователя - пустой словарь.
+        """
+        if not user.is_authenticated or not answer_ids:
+            return {}
+        return dict(
+            self.filter(user=user, answer_id__in=answer_ids).values_list('answer_id', 'value')
+        )
+
+    def set_my_vote(self, user, answers):
+        """Проставляет каждому ответу атрибут my_vote (1, -1 или 0) по голосам пользователя."""
+        votes = self.votes_map(user, [answer.id for answer in answers])
+        for answer in answers:
+            answer.my_vote = votes.get(answer.id, 0)
+        return answers
+
     def add_or_update_vote(self, user, answer, value):
         """
-        Создает, обновляет или удаляет голос пользователя и обновляет
-        общий счетчик голосов (votes) в модели Answer.
+        Создает, обновляет или удаляет голос пользователя и атомарно
+        обновляет общий счетчик голосов (votes) в модели Answer.
         """
-        existing_vote = self.get_vote(user, answer)
-        answer_votes_change = 0
-        voted = False
-        vote_value = 0
-
-        if existing_vote:
-            if existing_vote.value == value:
-                # Отмена голоса (повторное нажатие)
-                existing_vote.delete()
-                answer_votes_change = -value
-                voted = False
-            else:
-                # Изменение голоса (Up -> Down или наоборот)
-                answer_votes_change = -existing_vote.value  # Отменяем старый голос
-                existing_vote.value = value
-                existing_vote.save(update_fields=['value'])
-                answer_votes_change += value  # Добавляем новый голос
-                voted = True
-                vote_value = value
-        else:
-            # Создание нового голоса
-            self.create(user=user, answer=answer, value=value)
-            answer_votes_change = value
-            voted = True
-            vote_value = value
-
-        # Обновление общего счетчика голосов в Answer
-        answer.votes += answer_votes_change
-        answer.save(update_fields=['votes'])
+        with transaction.atomic(using=self.db):
+            result = apply_vote(self.model, 'answer', user.id, answer.id, value)
+            answer.votes = result['votes']
+
+            if result['delta']:
+                User.objects.change_reputation(
+                    answer.author_id,
+                    result['delta'] * ReputationEvent.ANSWER_VOTE_WEIGHT,
+                    ReputationEvent.ANSWER_VOTE,
+                    answer.id,
+                )
 
         return {
-            'votes': answer.votes,
-            'voted': voted,
-            'value': vote_value
+            'votes': result['votes'],
+            'voted': result['voted'] != 0,
+            'value': result['voted']
         }
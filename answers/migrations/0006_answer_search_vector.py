@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('answers', '0005_remove_answer_answers_ans_questio_9b1f58_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE FUNCTION answers_answer_search_vector_update() RETURNS trigger AS $$
+                BEGIN
+                    NEW.search_vector := setweight(to_tsvector('russian', coalesce(NEW.content, '')), 'B');
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER answers_answer_search_vector_trigger
+                BEFORE INSERT OR UPDATE OF content, search_vector ON answers_answer
+                FOR EACH ROW EXECUTE FUNCTION answers_answer_search_vector_update();
+
+                UPDATE answers_answer SET search_vector =
+                    setweight(to_tsvector('russian', coalesce(content, '')), 'B');
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS answers_answer_search_vector_trigger ON answers_answer;
+                DROP FUNCTION IF EXISTS answers_answer_search_vector_update();
+            """,
+        ),
+        # Индексы из Meta.indexes: раньше список стоял вне Meta и не применялся
+        migrations.RemoveIndex(
+            model_name='answer',
+            name='answers_ans_questio_e7322f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['-is_correct', '-votes', 'created_at'], name='answers_ans_is_corr_beca36_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', '-is_correct', '-votes', 'created_at'], name='answers_ans_questio_f84780_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='answers_ans_search__457a29_gin'),
+        ),
+    ]
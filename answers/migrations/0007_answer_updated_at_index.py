@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('answers', '0006_answer_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['updated_at'], name='answers_ans_updated_a73b13_idx'),
+        ),
+    ]
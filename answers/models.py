@@ -1,7 +1,11 @@
-from django.db import models
-from django.db.models import Index
-from users.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import F, Index
+from django.utils import timezone
+from users.models import ReputationEvent, User
 from questions.models import Question
+from questions.managers import hot_score_expression
 from .managers import AnswerManager, AnswerVoteManager # Импортируем менеджеры
 
 class Answer(models.Model):
@@ -41,6 +45,12 @@ class Answer(models.Model):
         default=True,
         verbose_name='Активный'
     )
+    # Заполняется триггером БД из content
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
 
     # Назначаем пользовательские менеджеры
     objects = AnswerManager()
@@ -50,19 +60,51 @@ class Answer(models.Model):
         verbose_name = 'Ответ'
         verbose_name_plural = 'Ответы'
         ordering = ['-is_correct', '-votes', 'created_at']
-    indexes = [
-        Index(fields=['-is_correct', '-votes', 'created_at']),
-        Index(fields=['question', '-is_correct', '-votes', 'created_at']),
-        Index(fields=['author', 'created_at']),
-        Index(fields=['is_active', 'created_at']),
-        Index(fields=['votes']),
-    ]
+        indexes = [
+            Index(fields=['-is_correct', '-votes', 'created_at']),
+            Index(fields=['question', '-is_correct', '-votes', 'created_at']),
+            Index(fields=['author', 'created_at']),
+            Index(fields=['is_active', 'created_at']),
+            Index(fields=['updated_at']),
+            Index(fields=['votes']),
+            GinIndex(fields=['search_vector']),
+        ]
 
     def delete_answer(self):
-        """Мягкое удаление ответа (оставлено в модели, так как это операция над экземпляром)."""
-        self.is_active = False
-        self.is_correct = False
-        self.save(update_fields=['is_active', 'is_correct'])
+        """
+        Мягкое удаление ответа (оставлено в модели, так как это операция над экземпляром).
+        Возвращает False, если ответ уже был удален.
+        """
+        with transaction.atomic():
+            # Блокируем строку, чтобы параллельное удаление не списало счетчики дважды
+            state = Answer.all_objects.select_for_update().filter(
+                pk=self.pk, is_active=True
+            ).values('author_id', 'votes', 'is_correct').first()
+            if state is None:
+                return False
+
+            Answer.all_objects.filter(pk=self.pk).update(
+                is_active=False, is_correct=False, updated_at=timezone.now()
+            )
+            self.is_active = False
+            self.is_correct = False
+
+            Question.all_objects.filter(pk=self.question_id).update(
+                answers_count=F('answers_count') - 1,
+                hot_score=hot_score_expression(answers_count=F('answers_count') - 1)
+            )
+
+            # Автор теряет очки за голоса удаленного ответа и бонус за принятие
+            delta = state['votes'] * ReputationEvent.ANSWER_VOTE_WEIGHT
+            if state['is_correct']:
+                delta += ReputationEvent.ANSWER_ACCEPTED_BONUS
+            User.objects.change_reputation(state['author_id'], -delta, ReputationEvent.ANSWER_DELETED, self.pk)
+
+            # Мягкое удаление идет через update() без post_save
+            from search.cache import search_cache
+            transaction.on_commit(search_cache.bump)
+
+        return True
 
     def __str__(self):
         return f"Ответ на вопрос: {self.question.title}"
@@ -5,10 +5,13 @@ from django.contrib import messages
 from django.views.generic import CreateView, View
 from django.urls import reverse_lazy
 from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import F
 
 from .models import Answer, AnswerVote
 from .forms import AnswerForm
 from questions.models import Question
+from questions.managers import hot_score_expression
 
 class AnswerCreateView(LoginRequiredMixin, CreateView):
     """Создание нового ответа. (Логика остается во View, т.к. связана с формой и request)"""
@@ -20,7 +23,12 @@ class AnswerCreateView(LoginRequiredMixin, CreateView):
         question = get_object_or_404(Question, id=self.kwargs['question_id'], is_active=True)
         form.instance.question = question
         form.instance.author = self.request.user
-        response = super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            Question.all_objects.filter(pk=question.pk).update(
+                answers_count=F('answers_count') + 1,
+                hot_score=hot_score_expression(answers_count=F('answers_count') + 1)
+            )
         messages.success(self.request, 'Ваш ответ успешно добавлен!')
         return response
 
@@ -118,10 +126,11 @@ class AnswerDeleteView(LoginRequiredMixin, View):
         answer.delete_answer()
 
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            question.refresh_from_db(fields=['answers_count'])
             return JsonResponse({
                 'success': True,
                 'answer_id': answer_id,
-                'answers_count': question.answers.count()
+                'answers_count': question.answers_count
             })
 
         return redirect('questions:detail', question.id)
@@ -1,5 +1,6 @@
 from django import forms
-from questions.models import Question
+from django.urls import reverse_lazy
+from questions.models import Question, QuestionSignature, RelatedQuestion
 from tags.models import Tag
 
 class QuestionForm(forms.ModelForm):
@@ -9,7 +10,9 @@ class QuestionForm(forms.ModelForm):
         widget=forms.TextInput(attrs={
             'class': 'form-input',
             'placeholder': 'docker, django, python',
-            'id': 'tags'
+            'id': 'tags',
+            'autocomplete': 'off',
+            'data-autocomplete-url': reverse_lazy('tags:autocomplete'),
         }),
         label='Теги',
         help_text='Добавьте до 3 тегов через запятую'
@@ -22,7 +25,9 @@ class QuestionForm(forms.ModelForm):
             'title': forms.TextInput(attrs={
                 'class': 'form-input',
                 'placeholder': 'Например: Как настроить Docker для Django проекта?',
-                'id': 'title'
+                'id': 'title',
+                'autocomplete': 'off',
+                'data-duplicates-url': reverse_lazy('questions:duplicates'),
             }),
             'content': forms.Textarea(attrs={
                 'class': 'form-textarea',
@@ -84,6 +89,7 @@ class QuestionForm(forms.ModelForm):
         if commit:
             question.save()
             self._save_tags()
+            QuestionSignature.objects.update_for([(question.pk, question.title, question.content)])
 
         return question
 
@@ -92,20 +98,8 @@ class QuestionForm(forms.ModelForm):
         question = self.instance
         tag_names = self.cleaned_data.get('tags_input', [])
 
-        # Очищаем старые теги
-        question.tags.clear()
-
-        # Добавляем новые теги
-        for tag_name in tag_names[:3]:  # максимум 3 тега
-            tag, created = Tag.objects.get_or_create(
-                name=tag_name,
-                defaults={'description': f'Вопросы о {tag_name}'}
-            )
-            question.tags.add(tag)
-
-            # Обновляем счетчик использования
-            if created:
-                tag.usage_count = 1
-            else:
-                tag.usage_count += 1
-            tag.save(update_fields=['usage_count'])
+        # Запросов не больше константы независимо от числа тегов,
+        # usage_count меняется только у добавленных и убранных тегов
+        added, removed = Tag.objects.set_for_question(question, tag_names[:3])  # максимум 3 тега
+        if added or removed:
+            RelatedQuestion.objects.refresh_for(question)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+from questions.models import Question
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the denormalized Question.answers_count column from active answers. Usage: python manage.py backfill_answers_count [--batch-size N]'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Number of question ids updated per UPDATE statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('batch-size must be positive integer')
+
+        bounds = Question.all_objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write('No questions found')
+            return
+
+        self.stdout.write('Backfilling answers_count...')
+        updated = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            # Каждая пачка - отдельная короткая транзакция, чтобы не держать блокировки на всей таблице
+            with transaction.atomic():
+                updated += Question.all_objects.filter(
+                    id__gte=start, id__lt=start + batch_size
+                ).recalculate_answers_count()
+            self.stdout.write('.', ending='')
+        self.stdout.write(' done')
+
+        self.stdout.write(self.style.SUCCESS('answers_count backfilled for %s questions' % updated))
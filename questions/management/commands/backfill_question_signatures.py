@@ -0,0 +1,65 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from AnswerHub.parallel import run_parallel
+from questions.models import Question, QuestionSignature
+
+# Строк в одном upsert
+WRITE_BATCH = 1000
+
+
+def _backfill_range(first_id, last_id, missing_only=False):
+    questions = Question.objects.filter(id__range=(first_id, last_id))
+    if missing_only:
+        questions = questions.filter(signature__isnull=True)
+
+    written = 0
+    batch = []
+    for row in questions.values_list('id', 'title', 'content').iterator(chunk_size=WRITE_BATCH):
+        batch.append(row)
+        if len(batch) >= WRITE_BATCH:
+            written += QuestionSignature.objects.update_for(batch)
+            batch = []
+    if batch:
+        written += QuestionSignature.objects.update_for(batch)
+    return written
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute MinHash signatures and LSH bands used for duplicate question detection. '
+        'Id ranges are processed in parallel worker processes. '
+        'Usage: python manage.py backfill_question_signatures [--workers N] [--batch-size N] [--missing-only]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Number of question ids per worker task')
+        parser.add_argument('--missing-only', action='store_true', help='Skip questions that already have a signature')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        batch_size = options['batch_size']
+        if workers <= 0 or batch_size <= 0:
+            raise CommandError('workers and batch-size must be positive integers')
+
+        bounds = Question.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write('No questions to process')
+            return
+
+        tasks = [
+            (start, min(start + batch_size - 1, bounds['last']), options['missing_only'])
+            for start in range(bounds['first'], bounds['last'] + 1, batch_size)
+        ]
+        self.stdout.write('Processing %s id ranges in %s processes...' % (len(tasks), workers))
+
+        started = time.monotonic()
+        written = sum(run_parallel(_backfill_range, tasks, workers))
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS('Wrote %s signatures in %.2fs (%.0f rows/s)' % (
+            written, elapsed, written / elapsed if elapsed else 0,
+        )))
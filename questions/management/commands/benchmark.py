@@ -0,0 +1,387 @@
+import http.client
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from answers.models import Answer
+from questions.models import Question
+from questions.workload import ZipfSampler
+from tags.models import Tag
+from users.models import User
+
+# Сценарии нагрузки: имя -> представление, которое он нагружает
+ENDPOINTS = {
+    'list': 'QuestionListView',
+    'detail': 'QuestionDetailView',
+    'search': 'search.views.search',
+    'vote_question': 'vote_question',
+    'vote_answer': 'AnswerVoteView',
+}
+DEFAULT_MIX = 'list=35,detail=35,search=15,vote_question=10,vote_answer=5'
+
+QUERIES_HEADER = 'X-Benchmark-Queries'
+# Столько самых "горячих" вопросов служат целями чтения и голосов
+TARGET_QUESTIONS = 10000
+PERCENTILES = (50, 95, 99)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryCountingApp:
+    """
+    WSGI-приложение Django, которое добавляет к ответу заголовок с числом
+    SQL-запросов, выполненных при его обработке. Соединение с БД у каждого
+    потока сервера свое, поэтому счетчик ставится на время запроса.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        counter = QueryCounter()
+
+        def counting_start_response(status, headers, exc_info=None):
+            # Django формирует ответ целиком до вызова start_response
+            return start_response(status, headers + [(QUERIES_HEADER, str(counter.count))], exc_info)
+
+        with connection.execute_wrapper(counter):
+            return self.application(environ, counting_start_response)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(values, percent):
+    """Процентиль по методу ближайшего ранга для отсортированного списка."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise CommandError('Unknown endpoint %r in --mix (available: %s)' % (name, ', '.join(ENDPOINTS)))
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError('Invalid weight for %r in --mix' % name)
+        # random.choices в потоках нагрузки падает на отрицательных весах
+        if not math.isfinite(mix[name]) or mix[name] < 0:
+            raise CommandError('Weight for %r in --mix must be a non-negative number' % name)
+    if not any(weight > 0 for weight in mix.values()):
+        raise CommandError('--mix must contain a positive weight')
+    return mix
+
+
+class Workload:
+    """
+    Цели запросов: вопросы и ответы выбираются по закону Ципфа среди самых
+    "горячих" вопросов (как на живом сайте), поисковые запросы - из имен
+    популярных тегов и слов заголовков.
+    """
+
+    def __init__(self, rnd):
+        self.question_ids = list(
+            Question.objects.order_by('-hot_score', '-id').values_list('id', flat=True)[:TARGET_QUESTIONS]
+        )
+        if not self.question_ids:
+            raise CommandError('No questions to benchmark - fill the database first (fill_db or --fill)')
+        self.answer_ids = list(
+            Answer.objects.filter(question_id__in=self.question_ids[:1000]).order_by('-votes', 'id')
+            .values_list('id', flat=True)[:TARGET_QUESTIONS]
+        )
+
+        terms = list(Tag.objects.order_by('-usage_count').values_list('name', flat=True)[:200])
+        for title in Question.objects.filter(pk__in=self.question_ids[:200]).values_list('title', flat=True):
+            terms.extend(word for word in title.split() if len(word) > 3)
+        self.terms = terms or ['question']
+        rnd.shuffle(self.terms)
+
+        self.questions = ZipfSampler(0, len(self.question_ids), 1.0)
+        self.answers = ZipfSampler(0, len(self.answer_ids), 1.0) if self.answer_ids else None
+        self.search_terms = ZipfSampler(0, len(self.terms), 1.0)
+
+    def request(self, endpoint, rnd):
+        """(method, path, body) одного запроса сценария endpoint."""
+        if endpoint == 'list':
+            return 'GET', reverse('questions:list'), None
+        if endpoint == 'detail':
+            question_id = self.question_ids[self.questions.sample(rnd)]
+            return 'GET', reverse('questions:detail', args=[question_id]), None
+        if endpoint == 'search':
+            query = self.terms[self.search_terms.sample(rnd)]
+            return 'GET', '%s?%s' % (reverse('search:search'), urlencode({'q': query})), None
+        value = rnd.choice(('1', '-1'))
+        if endpoint == 'vote_question' or self.answers is None:
+            question_id = self.question_ids[self.questions.sample(rnd)]
+            return 'POST', reverse('questions:vote_question', args=[question_id]), urlencode({'value': value})
+        answer_id = self.answer_ids[self.answers.sample(rnd)]
+        return 'POST', reverse('answers:vote', args=[answer_id]), urlencode({'value': value})
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.recording = False
+
+    def add(self, endpoint, seconds, status, queries):
+        if not self.recording:
+            return
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append((seconds, status, queries))
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a mix of reads and writes against an in-process WSGI server with concurrent simulated users '
+        'and report throughput, p50/p95/p99 latency and SQL queries per endpoint. '
+        'Usage: python manage.py benchmark [--duration S] [--concurrency N] [--mix list=35,detail=35,...] '
+        '[--fill RATIO --profile NAME] [--seed N] [--output results.json] [--baseline old.json]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=30, help='Measured run time in seconds')
+        parser.add_argument('--warmup', type=float, default=3, help='Warm-up time in seconds (not recorded)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent simulated users')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='Endpoint weights: %s' % ', '.join(ENDPOINTS))
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the request sequence (and --fill)')
+        parser.add_argument('--fill', type=int, default=None, help='Run fill_db --fast with this ratio before benchmarking')
+        parser.add_argument('--profile', default='realistic', help='fill_db profile for --fill')
+        parser.add_argument('--output', default=None, help='Write JSON results to this file')
+        parser.add_argument('--baseline', default=None, help='JSON results of a previous run to compare with')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] <= 0 or options['duration'] <= 0 or options['warmup'] < 0:
+            raise CommandError('concurrency and duration must be positive, warmup must not be negative')
+        mix = parse_mix(options['mix'])
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError('Cannot read baseline: %s' % error)
+
+        if options['fill']:
+            call_command('fill_db', options['fill'], fast=True, profile=options['profile'], seed=options['seed'], stdout=self.stdout)
+
+        rnd = random.Random(options['seed'])
+        workload = Workload(rnd)
+        cookies = self._sessions(options['concurrency'])
+
+        server = ThreadingWSGIServer(('127.0.0.1', 0), QuietHandler)
+        server.set_app(QueryCountingApp(get_wsgi_application()))
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        port = server.server_address[1]
+        self.stdout.write('Serving on 127.0.0.1:%s, %s simulated users, mix %s' % (
+            port, len(cookies), ', '.join('%s=%g' % item for item in mix.items()),
+        ))
+
+        recorder = Recorder()
+        stop = threading.Event()
+        names, weights = list(mix), list(mix.values())
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+
+        def simulated_user(number, cookie):
+            user_rnd = random.Random('%s:%s' % (options['seed'], number))
+            headers = {'Host': host, 'Cookie': cookie['header'], 'X-Requested-With': 'XMLHttpRequest'}
+            post_headers = dict(headers, **{
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'X-CSRFToken': cookie['csrf'],
+            })
+            while not stop.is_set():
+                endpoint = user_rnd.choices(names, weights)[0]
+                method, path, body = workload.request(endpoint, user_rnd)
+                started = time.perf_counter()
+                client = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                try:
+                    client.request(method, path, body, post_headers if body else headers)
+                    response = client.getresponse()
+                    response.read()
+                    status = response.status
+                    queries = int(response.getheader(QUERIES_HEADER) or 0)
+                except (OSError, http.client.HTTPException):
+                    status, queries = 0, 0
+                finally:
+                    client.close()
+                recorder.add(endpoint, time.perf_counter() - started, status, queries)
+
+        threads = [
+            threading.Thread(target=simulated_user, args=(number, cookie), daemon=True)
+            for number, cookie in enumerate(cookies)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            if options['warmup']:
+                self.stdout.write('Warming up for %gs...' % options['warmup'])
+                time.sleep(options['warmup'])
+            self.stdout.write('Measuring for %gs...' % options['duration'])
+            recorder.recording = True
+            measured_from = time.monotonic()
+            time.sleep(options['duration'])
+            recorder.recording = False
+            elapsed = time.monotonic() - measured_from
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            server.shutdown()
+            server.server_close()
+            connections.close_all()
+
+        results = self._results(recorder.samples, elapsed, mix, options)
+        self._print(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+                file.write('\n')
+            self.stdout.write('Results written to %s' % options['output'])
+
+    def _sessions(self, count):
+        """Cookie сессий и CSRF-токены для count пользователей (голосование требует входа)."""
+        users = list(User.objects.filter(is_active=True).order_by('id')[:count])
+        if len(users) < count:
+            raise CommandError('Need at least %s active users for --concurrency %s' % (count, count))
+        cookies = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            csrf = get_random_string(32)
+            cookies.append({
+                'header': '%s=%s; %s=%s' % (
+                    settings.SESSION_COOKIE_NAME, client.cookies[settings.SESSION_COOKIE_NAME].value,
+                    settings.CSRF_COOKIE_NAME, csrf,
+                ),
+                'csrf': csrf,
+            })
+        return cookies
+
+    def _results(self, samples, elapsed, mix, options):
+        endpoints = {}
+        all_latencies = []
+        for endpoint, rows in sorted(samples.items()):
+            latencies = sorted(seconds * 1000 for seconds, _, _ in rows)
+            queries = [count for _, _, count in rows]
+            all_latencies.extend(latencies)
+            endpoints[endpoint] = {
+                'view': ENDPOINTS[endpoint],
+                'requests': len(rows),
+                'errors': sum(1 for _, status, _ in rows if not 200 <= status < 400),
+                'throughput': round(len(rows) / elapsed, 2),
+                'latency_ms': self._latency(latencies),
+                'queries': {
+                    'mean': round(sum(queries) / len(queries), 2),
+                    'max': max(queries),
+                },
+            }
+        all_latencies.sort()
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+
+        return {
+            'meta': {
+                'commit': self._commit(),
+                'date': timezone.now().isoformat(),
+                'seed': options['seed'],
+                'concurrency': options['concurrency'],
+                'duration': round(elapsed, 2),
+                'mix': mix,
+                'search_backend': settings.SEARCH_BACKEND,
+                'dataset': {
+                    'users': User.objects.count(),
+                    'questions': Question.objects.count(),
+                    'answers': Answer.objects.count(),
+                    'tags': Tag.objects.count(),
+                },
+            },
+            'total': {
+                'requests': total,
+                'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+                'throughput': round(total / elapsed, 2),
+                'latency_ms': self._latency(all_latencies),
+            },
+            'endpoints': endpoints,
+        }
+
+    @staticmethod
+    def _latency(latencies):
+        result = {'p%s' % percent: percentile(latencies, percent) for percent in PERCENTILES}
+        result['mean'] = sum(latencies) / len(latencies) if latencies else None
+        result['max'] = latencies[-1] if latencies else None
+        return {key: round(value, 2) if value is not None else None for key, value in result.items()}
+
+    @staticmethod
+    def _commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _print(self, results, baseline):
+        rows = list(results['endpoints'].items()) + [('total', results['total'])]
+        self.stdout.write('%-14s %8s %7s %9s %9s %9s %9s %8s' % (
+            'endpoint', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'queries',
+        ))
+        for endpoint, stats in rows:
+            latency = stats['latency_ms']
+            self.stdout.write('%-14s %8s %7s %9.1f %9s %9s %9s %8s' % (
+                endpoint, stats['requests'], stats['errors'], stats['throughput'],
+                latency['p50'], latency['p95'], latency['p99'], stats.get('queries', {}).get('mean', ''),
+            ))
+
+        if not baseline:
+            return
+        self.stdout.write('Compared with baseline %s:' % (baseline.get('meta', {}).get('commit') or ''))
+        self.stdout.write('%-14s %9s %9s %9s' % ('endpoint', 'req/s', 'p95', 'queries'))
+        old_rows = dict(baseline.get('endpoints', {}), total=baseline.get('total'))
+        for endpoint, stats in rows:
+            old = old_rows.get(endpoint)
+            if not old or not old['throughput'] or not old['latency_ms']['p95']:
+                continue
+            queries = ''
+            if 'queries' in stats and 'queries' in old:
+                queries = '%+.2f' % (stats['queries']['mean'] - old['queries']['mean'])
+            self.stdout.write('%-14s %+8.1f%% %+8.1f%% %9s' % (
+                endpoint,
+                100 * (stats['throughput'] / old['throughput'] - 1),
+                100 * ((stats['latency_ms']['p95'] or 0) / old['latency_ms']['p95'] - 1),
+                queries,
+            ))
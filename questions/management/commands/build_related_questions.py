@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from questions.models import RelatedQuestion
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the related questions table (top-K questions sharing tags, weighted by tag rarity and votes). '
+        'Usage: python manage.py build_related_questions [--top N] [--chunk-size N]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=settings.RELATED_QUESTIONS_TOP_K, help='Number of related questions stored per question')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Number of question-tag links fetched per round trip')
+
+    def handle(self, *args, **options):
+        if options['top'] <= 0 or options['chunk_size'] <= 0:
+            raise CommandError('top and chunk-size must be positive integers')
+
+        self.stdout.write('Building related questions...')
+        started = time.monotonic()
+        questions, rows = RelatedQuestion.objects.rebuild(
+            top_k=options['top'], chunk_size=options['chunk_size']
+        )
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            'Stored %s rows for %s questions in %.2fs' % (rows, questions, elapsed)
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from questions.viewcount import view_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        'Drain the buffered question views into the database. With --interval the command keeps '
+        'running and drains the buffer periodically (use with a shared cache and '
+        'VIEW_BUFFER_INLINE_FLUSH = False). Usage: python manage.py flush_views [--interval 10]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None, help='Seconds between flushes; run forever')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if interval is None:
+            self._flush()
+            return
+
+        while True:
+            self._flush()
+            time.sleep(interval)
+
+    def _flush(self):
+        self.stdout.write('Pending view events: %s' % view_buffer.pending())
+        applied = view_buffer.flush()
+        if applied is None:
+            self.stdout.write(self.style.WARNING('Buffer is being flushed by another process, skipping'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Flushed views, %s new unique views counted' % applied))
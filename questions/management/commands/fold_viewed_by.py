@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from questions.models import Question, QuestionViewerSketch
+from questions.sketches import HyperLogLog
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold existing Question.viewed_by rows into per-question HyperLogLog sketches. '
+        'Run before switching QUESTION_VIEWS_ENGINE to "hll"; safe to re-run. '
+        'Usage: python manage.py fold_viewed_by [--batch-size N]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of question sketches written per upsert')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Number of viewed_by rows fetched per round trip')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0 or options['chunk_size'] <= 0:
+            raise CommandError('batch-size and chunk-size must be positive integers')
+
+        rows = (
+            Question.viewed_by.through.objects
+            .order_by('question_id')
+            .values_list('question_id', 'user_id')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+
+        self.stdout.write('Folding viewed_by into sketches...')
+        batch = {}
+        folded = 0
+        processed = 0
+        current_id = None
+        current = None
+        for question_id, user_id in rows:
+            if question_id != current_id:
+                if current is not None:
+                    batch[current_id] = current
+                if len(batch) >= batch_size:
+                    QuestionViewerSketch.objects.merge_sketches(batch)
+                    folded += len(batch)
+                    batch = {}
+                    self.stdout.write('.', ending='')
+                current_id = question_id
+                current = HyperLogLog(settings.VIEW_SKETCH_PRECISION)
+            # Ключ зрителя совпадает с тем, что пишет движок 'hll' для авторизованных
+            current.add('u%s' % user_id)
+            processed += 1
+
+        if current is not None:
+            batch[current_id] = current
+        if batch:
+            QuestionViewerSketch.objects.merge_sketches(batch)
+            folded += len(batch)
+        self.stdout.write(' done')
+
+        self.stdout.write(self.style.SUCCESS(
+            'Folded %s viewed_by rows into %s question sketches' % (processed, folded)
+        ))
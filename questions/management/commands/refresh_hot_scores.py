@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from questions.managers import HOT_SCORE_WINDOW_DAYS
+from questions.models import Question
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the time-decayed Question.hot_score in id-range batches for questions created '
+        'within the last HOT_SCORE_WINDOW_DAYS days and reset the score of questions that have '
+        'left the window. Meant to run periodically (e.g. from cron every 10-15 minutes). '
+        'Usage: python manage.py refresh_hot_scores [--all] [--batch-size N]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refresh every active question regardless of age')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of question ids updated per UPDATE statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('batch-size must be positive integer')
+
+        queryset = Question.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(created_at__gte=timezone.now() - timedelta(days=HOT_SCORE_WINDOW_DAYS))
+            expired = Question.objects.all().expire_hot_score()
+            self.stdout.write('hot_score reset for %s questions older than %s days' % (expired, HOT_SCORE_WINDOW_DAYS))
+
+        bounds = queryset.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write('No questions to refresh')
+            return
+
+        self.stdout.write('Refreshing hot scores...')
+        updated = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            with transaction.atomic():
+                updated += queryset.filter(id__gte=start, id__lt=start + batch_size).refresh_hot_score()
+            self.stdout.write('.', ending='')
+        self.stdout.write(' done')
+
+        self.stdout.write(self.style.SUCCESS('hot_score refreshed for %s questions' % updated))
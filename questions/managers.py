@@ -1,5 +1,51 @@
-from django.db import models
-from django.db.models import F
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from heapq import nlargest
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import (
+    Case, Count, DurationField, ExpressionWrapper, F, FloatField, OuterRef,
+    Subquery, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Extract, Greatest, Now, Power
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from users.models import ReputationEvent, User
+from .voting import apply_vote
+
+# Параметры "горячего" рейтинга: очки (голоса + ответы с весом) делятся на
+# возраст вопроса в часах в степени HOT_SCORE_GRAVITY, поэтому со временем
+# старые вопросы опускаются ниже свежих. Вопросы старше
+# HOT_SCORE_WINDOW_DAYS получают рейтинг 0: refresh_hot_scores пересчитывает
+# только окно, и без обнуления вышедшие из него вопросы навсегда сохранили
+# бы последний рассчитанный рейтинг.
+HOT_SCORE_ANSWER_WEIGHT = 2
+HOT_SCORE_GRAVITY = 1.8
+HOT_SCORE_WINDOW_DAYS = 14
+
+
+def hot_score_expression(votes=None, answers_count=None):
+    """
+    SQL-выражение для Question.hot_score. Позволяет передать новые значения
+    votes/answers_count (например, F('votes') + 1), чтобы пересчитать рейтинг
+    в том же UPDATE, который меняет счетчики.
+    """
+    votes = F('votes') if votes is None else votes
+    answers_count = F('answers_count') if answers_count is None else answers_count
+
+    age = ExpressionWrapper(Now() - F('created_at'), output_field=DurationField())
+    age_hours = Cast(Extract(age, 'epoch'), FloatField()) / 3600
+    points = Cast(votes + answers_count * HOT_SCORE_ANSWER_WEIGHT, FloatField())
+    return Case(
+        When(created_at__lt=Now() - timedelta(days=HOT_SCORE_WINDOW_DAYS), then=Value(0.0)),
+        default=points / Power(age_hours + 2, HOT_SCORE_GRAVITY),
+        output_field=FloatField()
+    )
+
 
 # 1. Пользовательский QuerySet
 class QuestionQuerySet(models.QuerySet):
@@ -8,20 +54,55 @@ class QuestionQuerySet(models.QuerySet):
     """
     def new(self):
         """Свежие вопросы (сортировка по дате создания)."""
-        return self.order_by('-created_at')
+        return self.order_by('-created_at', '-id')
 
     def best(self):
         """Лучшие (популярные) вопросы (сортировка по голосам)."""
-        return self.order_by('-votes', '-created_at')
+        return self.order_by('-votes', '-created_at', '-id')
+
+    def hot(self):
+        """Горячие вопросы (сортировка по сохраненному рейтингу с затуханием)."""
+        return self.order_by('-hot_score', '-id')
 
     def by_author(self, user):
         """Вопросы, созданные конкретным пользователем."""
-        return self.filter(author=user).order_by('-created_at')
+        return self.filter(author=user).order_by('-created_at', '-id')
 
     def with_prefetches(self):
         """Предварительная загрузка связанных объектов для оптимизации."""
         return self.select_related('author').prefetch_related('tags')
 
+    def recalculate_answers_count(self):
+        """
+        Пересчитывает денормализованный счетчик answers_count по активным
+        ответам одним UPDATE для всех вопросов выборки.
+        """
+        Answer = apps.get_model('answers', 'Answer')
+        active_answers = (
+            Answer.all_objects.filter(question=OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('question')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return self.update(answers_count=Coalesce(Subquery(active_answers), 0))
+
+    def refresh_hot_score(self):
+        """Пересчитывает hot_score для всей выборки одним UPDATE."""
+        return self.update(hot_score=hot_score_expression())
+
+    def expire_hot_score(self):
+        """
+        Обнуляет hot_score вопросов, вышедших из окна HOT_SCORE_WINDOW_DAYS
+        с прошлого пересчета. Уже обнуленные строки не трогает (условие на
+        hot_score обслуживает индекс по рейтингу).
+        """
+        cutoff = timezone.now() - timedelta(days=HOT_SCORE_WINDOW_DAYS)
+        return self.filter(
+            models.Q(hot_score__gt=0) | models.Q(hot_score__lt=0),
+            created_at__lt=cutoff,
+        ).update(hot_score=0)
+
 
 # 2. Пользовательский Manager
 class QuestionManager(models.Manager):
@@ -39,6 +120,9 @@ class QuestionManager(models.Manager):
     def best(self):
         return self.get_queryset().best()
 
+    def hot(self):
+        return self.get_queryset().hot()
+
     def by_author(self, user):
         return self.get_queryset().by_author(user)
 
@@ -47,18 +131,157 @@ class QuestionManager(models.Manager):
         return self.get_queryset().with_prefetches()
     # -----------------------
 
-    def record_view(self, question, user):
+    def record_view(self, question, user, anonymous_id=None):
         """
-        Записывает просмотр вопроса, увеличивая счетчик views только
-        для уникальных пользователей.
+        Записывает просмотр вопроса. Событие попадает в буфер и учитывается
+        в счетчике views при ближайшей выгрузке (только для уникальных
+        зрителей). Анонимные просмотры (anonymous_id) учитываются только
+        движком 'hll'.
         """
+        from .viewcount import view_buffer
+
+        if settings.QUESTION_VIEWS_ENGINE == 'hll':
+            if user.is_authenticated:
+                return view_buffer.record(question.id, 'u%s' % user.id)
+            if anonymous_id:
+                return view_buffer.record(question.id, 'a%s' % anonymous_id)
+            return False
+
         if user.is_authenticated:
-            if not question.viewed_by.filter(id=user.id).exists():
-                question.viewed_by.add(user)
-                self.filter(id=question.id).update(views=F('views') + 1)
-                return True
+            return view_buffer.record(question.id, user.id)
         return False
 
+    def apply_views(self, events):
+        """
+        Применяет пачку просмотров (question_id, viewer).
+
+        Для движка 'm2m' это один INSERT в viewed_by, пропускающий уже
+        существующие пары, и один UPDATE, увеличивающий views на число новых
+        зрителей каждого вопроса. Для движка 'hll' зрители добавляются в
+        скетчи QuestionViewerSketch.
+        """
+        if settings.QUESTION_VIEWS_ENGINE == 'hll':
+            Sketch = apps.get_model('questions', 'QuestionViewerSketch')
+            return Sketch.objects.apply_views(events)
+
+        # События от движка 'hll' (строковые ключи зрителей) в viewed_by не пишем
+        pairs = sorted({(question_id, viewer) for question_id, viewer in events if isinstance(viewer, int)})
+        if not pairs:
+            return 0
+
+        through = self.model.viewed_by.through
+        qn = connection.ops.quote_name
+        question_column = through._meta.get_field('question').column
+        user_column = through._meta.get_field('user').column
+        user_model = through._meta.get_field('user').related_model
+
+        values = ', '.join(['(%s, %s)'] * len(pairs))
+        params = [value for pair in pairs for value in pair]
+        # JOIN отбрасывает события по уже удаленным вопросам и пользователям
+        sql = (
+            f'INSERT INTO {qn(through._meta.db_table)} ({qn(question_column)}, {qn(user_column)}) '
+            f'SELECT v.question_id, v.user_id FROM (VALUES {values}) AS v (question_id, user_id) '
+            f'JOIN {qn(self.model._meta.db_table)} q ON q.id = v.question_id '
+            f'JOIN {qn(user_model._meta.db_table)} u ON u.id = v.user_id '
+            f'ON CONFLICT DO NOTHING '
+            f'RETURNING {qn(question_column)}'
+        )
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                new_viewers = Counter(row[0] for row in cursor.fetchall())
+
+            if new_viewers:
+                self.model.all_objects.filter(id__in=new_viewers).update(
+                    views=F('views') + Case(
+                        *[When(id=question_id, then=Value(count)) for question_id, count in new_viewers.items()],
+                        default=Value(0)
+                    )
+                )
+
+        return sum(new_viewers.values())
+
+
+class QuestionViewerSketchManager(models.Manager):
+    """Менеджер HyperLogLog-скетчей уникальных зрителей."""
+
+    def apply_views(self, events):
+        """
+        Добавляет пачку (question_id, viewer_key) в скетчи: одно чтение
+        скетчей, один upsert и один UPDATE views = max(views, оценка).
+        Возвращает прирост счетчиков просмотров.
+        """
+        from .sketches import HyperLogLog
+
+        viewers = {}
+        for question_id, viewer in events:
+            if isinstance(viewer, int):
+                viewer = 'u%s' % viewer
+            viewers.setdefault(question_id, set()).add(viewer)
+        if not viewers:
+            return 0
+
+        Question = self.model._meta.get_field('question').related_model
+        with transaction.atomic():
+            questions = dict(
+                Question.all_objects.filter(id__in=viewers).values_list('id', 'views')
+            )
+            existing = {
+                sketch.question_id: sketch
+                for sketch in self.select_for_update().filter(question_id__in=questions)
+            }
+
+            changed = []
+            estimates = {}
+            for question_id, keys in viewers.items():
+                if question_id not in questions:
+                    continue
+                sketch = existing.get(question_id)
+                hll = (
+                    HyperLogLog(registers=sketch.registers) if sketch
+                    else HyperLogLog(settings.VIEW_SKETCH_PRECISION)
+                )
+                if any([hll.add(key) for key in keys]):
+                    changed.append(self.model(question_id=question_id, registers=hll.to_bytes()))
+                    estimates[question_id] = hll.count()
+
+            if not changed:
+                return 0
+
+            self.bulk_create(
+                changed,
+                update_conflicts=True,
+                unique_fields=['question'],
+                update_fields=['registers', 'updated_at'],
+            )
+            Question.all_objects.filter(id__in=estimates).update(
+                views=Greatest(F('views'), Case(
+                    *[When(id=question_id, then=Value(estimate)) for question_id, estimate in estimates.items()],
+                    default=F('views')
+                ))
+            )
+
+        return sum(max(estimate - questions[question_id], 0) for question_id, estimate in estimates.items())
+
+    def merge_sketches(self, sketches):
+        """
+        Объединяет скетчи {question_id: HyperLogLog} с уже сохраненными
+        и записывает результат одним upsert.
+        """
+        from .sketches import HyperLogLog
+
+        with transaction.atomic():
+            for sketch in self.select_for_update().filter(question_id__in=sketches):
+                sketches[sketch.question_id].merge(HyperLogLog(registers=sketch.registers))
+
+            self.bulk_create(
+                [self.model(question_id=question_id, registers=hll.to_bytes()) for question_id, hll in sketches.items()],
+                update_conflicts=True,
+                unique_fields=['question'],
+                update_fields=['registers', 'updated_at'],
+            )
+
 
 class QuestionVoteManager(models.Manager):
     """Менеджер для модели QuestionVote, включающий логику голосования."""
@@ -67,40 +290,297 @@ class QuestionVoteManager(models.Manager):
         """Возвращает существующий голос пользователя за вопрос."""
         return self.filter(user=user, question=question).first()
 
+    def votes_map(self, user, question_ids):
+        """
+        Возвращает голоса пользователя за набор вопросов одним запросом:
+        {question_id: value}. Для анонимного пользователя - пустой словарь.
+        """
+        if not user.is_authenticated or not question_ids:
+            return {}
+        return dict(
+            self.filter(user=user, question_id__in=question_ids).values_list('question_id', 'value')
+        )
+
+    def set_my_vote(self, user, questions):
+        """
+        Проставляет каждому вопросу атрибут my_vote (1, -1 или 0) по голосам
+        пользователя, чтобы шаблоны могли подсветить стрелки без запроса на
+        каждый вопрос.
+        """
+        votes = self.votes_map(user, [question.id for question in questions])
+        for question in questions:
+            question.my_vote = votes.get(question.id, 0)
+        return questions
+
     def add_or_update_vote(self, user, question, value):
         """
         Создает, обновляет или удаляет голос пользователя и атомарно
         обновляет общий счетчик голосов (votes) в модели Question.
         """
-        existing_vote = self.get_vote(user, question)
-        vote_delta = 0
-        voted = None
-
-        if existing_vote:
-            if existing_vote.value == value:
-                existing_vote.delete()
-                vote_delta = -value
-                voted = 0
-            else:
-                vote_delta = value - existing_vote.value
-                existing_vote.value = value
-                existing_vote.save(update_fields=['value'])
-                voted = value
-        else:
-            self.create(user=user, question=question, value=value)
-            vote_delta = value
-            voted = value
-
-        # Атомарное обновление счетчика votes в Question
-        if vote_delta != 0:
-            # ИСПРАВЛЕНИЕ: Используем question.__class__.all_objects для доступа к менеджеру
-            # через класс модели, что корректно даже без прямого импорта Question.
-            question.__class__.all_objects.filter(id=question.id).update(votes=F('votes') + vote_delta)
-
-        # Получаем актуальное количество голосов из БД
-        question.refresh_from_db(fields=['votes'])
+        with transaction.atomic(using=self.db):
+            result = apply_vote(self.model, 'question', user.id, question.id, value)
+
+            # hot_score и репутация автора меняются в той же транзакции
+            if result['delta']:
+                question.__class__.all_objects.filter(id=question.id).update(
+                    hot_score=hot_score_expression()
+                )
+                User.objects.change_reputation(
+                    question.author_id,
+                    result['delta'] * ReputationEvent.QUESTION_VOTE_WEIGHT,
+                    ReputationEvent.QUESTION_VOTE,
+                    question.id,
+                )
+
+        question.votes = result['votes']
 
         return {
-            'new_votes': question.votes,
-            'voted': voted,
+            'new_votes': result['votes'],
+            'voted': result['voted'],
         }
+
+
+class QuestionSignatureManager(models.Manager):
+    """Менеджер MinHash-сигнатур вопросов (поиск дублей)."""
+
+    def _minhash(self):
+        from .sketches import MinHash
+        return MinHash(settings.DUPLICATES_NUM_PERM, settings.DUPLICATES_BANDS)
+
+    def compute(self, title, content, minhash=None):
+        """
+        Сигнатуры заголовка и текста и хеши их LSH-полос. Для поля без
+        слов сигнатура пустая и полос не дает (иначе все пустые тексты
+        попали бы в одну корзину).
+        """
+        from .sketches import shingles
+        minhash = minhash or self._minhash()
+        result = {'bands': []}
+        for field, text, salt in (('title_signature', title, 't'), ('content_signature', strip_tags(content), 'c')):
+            signature = minhash.signature(shingles(text))
+            result[field] = signature.tobytes() if signature is not None else b''
+            if signature is not None:
+                result['bands'].extend(minhash.band_hashes(signature, salt))
+        return result
+
+    def update_for(self, rows):
+        """
+        Пересчитывает сигнатуры для пар (question_id, title, content)
+        одним upsert. Возвращает число записанных строк.
+        """
+        minhash = self._minhash()
+        signatures = [
+            self.model(question_id=question_id, **self.compute(title, content, minhash))
+            for question_id, title, content in rows
+        ]
+        self.bulk_create(
+            signatures,
+            update_conflicts=True,
+            unique_fields=['question'],
+            update_fields=['title_signature', 'content_signature', 'bands'],
+        )
+        return len(signatures)
+
+    def similar(self, title, content='', exclude=None, limit=None):
+        """
+        Вероятные дубли текста среди активных вопросов: [(question_id,
+        сходство), ...] по убыванию. Кандидаты берутся по совпавшим
+        LSH-полосам (GIN-индекс), сходство оценивается по сигнатурам: по
+        заголовку, а если текст уже набран - лучшее из двух оценок.
+        """
+        from .sketches import MinHash
+
+        query = self.compute(title, content)
+        if not query['bands']:
+            return []
+
+        candidates = self.filter(bands__overlap=query['bands'], question__is_active=True)
+        if exclude:
+            candidates = candidates.exclude(question_id=exclude)
+        rows = candidates.order_by('-question_id').values_list(
+            'question_id', 'title_signature', 'content_signature'
+        )[:settings.DUPLICATES_MAX_CANDIDATES]
+
+        title_signature = MinHash.from_bytes(query['title_signature'])
+        content_signature = MinHash.from_bytes(query['content_signature'])
+        scored = []
+        for question_id, other_title, other_content in rows:
+            score = max(
+                MinHash.similarity(title_signature, MinHash.from_bytes(other_title)),
+                MinHash.similarity(content_signature, MinHash.from_bytes(other_content)),
+            )
+            if score >= settings.DUPLICATES_MIN_SIMILARITY:
+                scored.append((question_id, score))
+
+        scored.sort(key=lambda item: (-item[1], -item[0]))
+        return scored[:limit or settings.DUPLICATES_LIMIT]
+
+
+def _tag_weight(usage_count):
+    """Вес общего тега: чем реже тег, тем больше говорит совпадение по нему."""
+    return 1 / math.log(2 + max(usage_count, 0))
+
+
+def _vote_factor(votes):
+    return 1 + settings.RELATED_QUESTIONS_VOTE_WEIGHT * math.log1p(max(votes, 0))
+
+
+class RelatedQuestionManager(models.Manager):
+    """
+    Менеджер таблицы похожих вопросов.
+
+    Похожесть вопроса B на вопрос A - сумма весов их общих тегов (редкие
+    теги весят больше), умноженная на множитель голосов B. Кандидатами по
+    каждому тегу служат не больше RELATED_QUESTIONS_MAX_CANDIDATES лучших
+    по голосам вопросов с этим тегом - иначе популярный тег превращает
+    расчет в перебор всей базы.
+    """
+
+    def _through(self):
+        return self.model._meta.get_field('question').related_model.tags.through
+
+    def _tag_weights(self, tag_ids):
+        Tag = apps.get_model('tags', 'Tag')
+        return {
+            tag_id: _tag_weight(usage_count)
+            for tag_id, usage_count in Tag.objects.filter(pk__in=tag_ids).values_list('id', 'usage_count')
+        }
+
+    @staticmethod
+    def _overlaps(question_id, tag_ids, weights, postings):
+        """Сумма весов общих тегов для каждого кандидата: {question_id: вес}."""
+        overlaps = defaultdict(float)
+        for tag_id in tag_ids:
+            weight = weights.get(tag_id, 0)
+            for candidate in postings.get(tag_id, ()):
+                if candidate != question_id:
+                    overlaps[candidate] += weight
+        return overlaps
+
+    @staticmethod
+    def _top(overlaps, votes, top_k):
+        return nlargest(
+            top_k,
+            ((candidate, overlap * _vote_factor(votes[candidate])) for candidate, overlap in overlaps.items()),
+            key=lambda item: (item[1], item[0]),
+        )
+
+    def for_question(self, question, limit=None):
+        """Похожие активные вопросы - один запрос по индексу (question, -score)."""
+        return [
+            row.related for row in
+            self.filter(question=question, related__is_active=True)
+            .select_related('related')
+            .only('related__id', 'related__title', 'related__answers_count', 'related__votes')
+            .order_by('-score')[:limit or settings.RELATED_QUESTIONS_LIMIT]
+        ]
+
+    def refresh_for(self, question):
+        """
+        Пересчитывает похожие вопросы одного вопроса после смены его тегов
+        (не больше одного запроса на тег). Вопрос также вписывается в списки
+        своих новых соседей и убирается из остальных: эти списки могут
+        временно стать длиннее top-K - лишнее отрежет полная пересборка.
+        """
+        through = self._through()
+        top_k = settings.RELATED_QUESTIONS_TOP_K
+        tag_ids = list(through.objects.filter(question_id=question.pk).values_list('tag_id', flat=True))
+        weights = self._tag_weights(tag_ids)
+
+        postings, votes = {}, {}
+        for tag_id in tag_ids:
+            rows = (
+                through.objects.filter(tag_id=tag_id, question__is_active=True)
+                .order_by('-question__votes', '-question_id')
+                .values_list('question_id', 'question__votes')[:settings.RELATED_QUESTIONS_MAX_CANDIDATES]
+            )
+            postings[tag_id] = []
+            for candidate, candidate_votes in rows:
+                postings[tag_id].append(candidate)
+                votes[candidate] = candidate_votes
+
+        overlaps = self._overlaps(question.pk, tag_ids, weights, postings)
+        top = self._top(overlaps, votes, top_k) if question.is_active else []
+        own_factor = _vote_factor(question.votes)
+
+        with transaction.atomic(using=self.db):
+            self.filter(models.Q(question=question) | models.Q(related=question)).delete()
+            self.bulk_create(
+                [self.model(question_id=question.pk, related_id=candidate, score=score) for candidate, score in top]
+                + [
+                    self.model(question_id=candidate, related_id=question.pk, score=overlaps[candidate] * own_factor)
+                    for candidate, _ in top
+                ]
+            )
+        return len(top)
+
+    def rebuild(self, top_k=None, chunk_size=20000):
+        """
+        Полностью перестраивает таблицу по тегам активных вопросов.
+
+        Сначала читаются списки кандидатов по тегам (лучшие по голосам),
+        затем связи вопросов с тегами идут потоком по вопросу, и для каждого
+        вопроса сохраняются top_k самых похожих. Возвращает (число вопросов,
+        записано строк).
+        """
+        top_k = top_k or settings.RELATED_QUESTIONS_TOP_K
+        through = self._through()
+        limit = settings.RELATED_QUESTIONS_MAX_CANDIDATES
+
+        postings = defaultdict(list)
+        votes = {}
+        ranked = (
+            through.objects.filter(question__is_active=True)
+            .order_by('tag_id', '-question__votes', '-question_id')
+            .values_list('tag_id', 'question_id', 'question__votes')
+            .iterator(chunk_size=chunk_size)
+        )
+        for tag_id, candidate, candidate_votes in ranked:
+            if len(postings[tag_id]) < limit:
+                postings[tag_id].append(candidate)
+                votes[candidate] = candidate_votes
+        weights = self._tag_weights(list(postings))
+
+        links = (
+            through.objects.filter(question__is_active=True)
+            .order_by('question_id')
+            .values_list('question_id', 'tag_id')
+            .iterator(chunk_size=chunk_size)
+        )
+
+        questions = 0
+        written = 0
+        batch = []
+
+        def flush_question(question_id, tag_ids):
+            overlaps = self._overlaps(question_id, tag_ids, weights, postings)
+            batch.extend(
+                self.model(question_id=question_id, related_id=candidate, score=score)
+                for candidate, score in self._top(overlaps, votes, top_k)
+            )
+
+        # Замена целиком в одной транзакции - читатели видят либо старую, либо
+        # новую таблицу; строки пишутся пачками, чтобы не держать все в памяти
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            current_id = None
+            current_tags = []
+            for question_id, tag_id in links:
+                if question_id != current_id:
+                    if current_id is not None:
+                        flush_question(current_id, current_tags)
+                        questions += 1
+                    current_id = question_id
+                    current_tags = []
+                    if len(batch) >= chunk_size:
+                        self.bulk_create(batch, batch_size=5000)
+                        written += len(batch)
+                        batch = []
+                current_tags.append(tag_id)
+            if current_id is not None:
+                flush_question(current_id, current_tags)
+                questions += 1
+            self.bulk_create(batch, batch_size=5000)
+            written += len(batch)
+
+        return questions, written
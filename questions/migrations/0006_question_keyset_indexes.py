@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0005_alter_question_author'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['is_active', '-created_at', '-id'], name='questions_q_is_acti_e444fb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['is_active', '-votes', '-created_at', '-id'], name='questions_q_is_acti_46faf8_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0008_question_hot_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionViewerSketch',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='viewer_sketch', serialize=False, to='questions.question', verbose_name='Вопрос')),
+                ('registers', models.BinaryField(verbose_name='Регистры HyperLogLog')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Скетч зрителей вопроса',
+                'verbose_name_plural': 'Скетчи зрителей вопросов',
+            },
+        ),
+    ]
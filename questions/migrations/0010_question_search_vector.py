@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0009_questionviewersketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        # Триггер держит search_vector в актуальном состоянии при любой записи
+        # title/content, в том числе в обход ORM; существующие строки заполняются сразу
+        migrations.RunSQL(
+            sql="""
+                CREATE FUNCTION questions_question_search_vector_update() RETURNS trigger AS $$
+                BEGIN
+                    NEW.search_vector :=
+                        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+                        setweight(to_tsvector('russian', coalesce(NEW.content, '')), 'B');
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER questions_question_search_vector_trigger
+                BEFORE INSERT OR UPDATE OF title, content, search_vector ON questions_question
+                FOR EACH ROW EXECUTE FUNCTION questions_question_search_vector_update();
+
+                UPDATE questions_question SET search_vector =
+                    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('russian', coalesce(content, '')), 'B');
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS questions_question_search_vector_trigger ON questions_question;
+                DROP FUNCTION IF EXISTS questions_question_search_vector_update();
+            """,
+        ),
+        # btree по тексту вопроса не помогает поиску подстроки и полнотекстовому поиску
+        migrations.AlterField(
+            model_name='question',
+            name='content',
+            field=models.TextField(verbose_name='Текст вопроса'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='questions_q_search__34fc30_gin'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:05
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0010_question_search_vector'),
+        # Расширение pg_trgm создается миграцией тегов
+        ('tags', '0005_tag_name_trgm'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='questions_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
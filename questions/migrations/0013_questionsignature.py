@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:40
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0012_question_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSignature',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='questions.question', verbose_name='Вопрос')),
+                ('title_signature', models.BinaryField(verbose_name='Сигнатура заголовка')),
+                ('content_signature', models.BinaryField(verbose_name='Сигнатура текста')),
+                ('bands', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=None, verbose_name='LSH-полосы')),
+            ],
+            options={
+                'verbose_name': 'Сигнатура вопроса',
+                'verbose_name_plural': 'Сигнатуры вопросов',
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['bands'], name='questions_q_bands_f44c1f_gin')],
+            },
+        ),
+    ]
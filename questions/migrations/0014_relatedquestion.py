@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0013_questionsignature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Похожесть')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_questions', to='questions.question', verbose_name='Вопрос')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.question', verbose_name='Похожий вопрос')),
+            ],
+            options={
+                'verbose_name': 'Похожий вопрос',
+                'verbose_name_plural': 'Похожие вопросы',
+                'indexes': [models.Index(fields=['question', '-score'], name='questions_r_questio_a21eae_idx')],
+                'constraints': [models.UniqueConstraint(fields=('question', 'related'), name='questions_related_unique_pair')],
+            },
+        ),
+    ]
@@ -1,8 +1,15 @@
-from django.db import models
-from django.db.models import Index
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import F, Index
 from django.urls import reverse
-from users.models import User
-from .managers import QuestionManager, QuestionVoteManager
+from django.utils import timezone
+from users.models import ReputationEvent, User
+from .managers import (
+    QuestionManager, QuestionQuerySet, QuestionSignatureManager, QuestionViewerSketchManager,
+    QuestionVoteManager, RelatedQuestionManager,
+)
 
 class Question(models.Model):
     title = models.CharField(
@@ -11,8 +18,7 @@ class Question(models.Model):
         db_index=True
     )
     content = models.TextField(
-        verbose_name='Текст вопроса',
-        db_index=True
+        verbose_name='Текст вопроса'
     )
     author = models.ForeignKey(
         User,
@@ -45,6 +51,14 @@ class Question(models.Model):
         default=0,
         verbose_name='Просмотры'
     )
+    answers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество ответов'
+    )
+    hot_score = models.FloatField(
+        default=0,
+        verbose_name='Горячий рейтинг'
+    )
     viewed_by = models.ManyToManyField(
         User,
         blank=True,
@@ -56,6 +70,12 @@ class Question(models.Model):
         verbose_name='Активный',
         db_index=True
     )
+    # Заполняется триггером БД из title (вес A) и content (вес B)
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
 
     class Meta:
         verbose_name = 'Вопрос'
@@ -67,26 +87,77 @@ class Question(models.Model):
             Index(fields=['votes', 'is_active']),
             Index(fields=['author', 'created_at']),
             Index(fields=['is_active', 'author']),
+            # Ключи keyset-пагинации лент "новые" и "лучшие"
+            Index(fields=['is_active', '-created_at', '-id']),
+            Index(fields=['is_active', '-votes', '-created_at', '-id']),
+            Index(fields=['is_active', '-hot_score', '-id']),
+            Index(fields=['updated_at']),
+            GinIndex(fields=['search_vector']),
+            # Нечеткий поиск по заголовку (pg_trgm): word_similarity, ILIKE
+            GinIndex(name='questions_title_trgm', fields=['title'], opclasses=['gin_trgm_ops']),
         ]
 
     def __str__(self):
         return self.title
 
     def delete_question(self):
-        """Мягкое удаление вопроса."""
-        self.is_active = False
-        self.save(update_fields=['is_active'])
-        # Также деактивируем все ответы к этому вопросу
-        self.answers.update(is_active=False)
+        """
+        Мягкое удаление вопроса вместе с его ответами.
+        Возвращает False, если вопрос уже был удален.
+        """
+        with transaction.atomic():
+            state = Question.all_objects.select_for_update().filter(
+                pk=self.pk, is_active=True
+            ).values('author_id', 'votes').first()
+            if state is None:
+                return False
+
+            # updated_at сдвигаем явно: по нему догоняют изменения внешние
+            # индексы (поиск BM25), а update() не трогает auto_now
+            now = timezone.now()
+            Question.all_objects.filter(pk=self.pk).update(is_active=False, updated_at=now)
+            self.is_active = False
+
+            # Также деактивируем все ответы к этому вопросу
+            answers = list(
+                self.answers.select_for_update().values_list('id', 'author_id', 'votes', 'is_correct')
+            )
+            deactivated = self.answers.update(is_active=False, updated_at=now)
+            if deactivated:
+                Question.all_objects.filter(pk=self.pk).update(
+                    answers_count=F('answers_count') - deactivated
+                )
+
+            # Репутация за голоса (и принятие) скрытого контента списывается
+            events = [
+                ReputationEvent(
+                    user_id=state['author_id'], kind=ReputationEvent.QUESTION_DELETED,
+                    delta=-state['votes'] * ReputationEvent.QUESTION_VOTE_WEIGHT, object_id=self.pk,
+                )
+            ]
+            for answer_id, author_id, votes, is_correct in answers:
+                delta = votes * ReputationEvent.ANSWER_VOTE_WEIGHT
+                if is_correct:
+                    delta += ReputationEvent.ANSWER_ACCEPTED_BONUS
+                events.append(ReputationEvent(
+                    user_id=author_id, kind=ReputationEvent.ANSWER_DELETED, delta=-delta, object_id=answer_id,
+                ))
+            ReputationEvent.objects.record(events)
+
+            # Теги удаленного вопроса не учитываются в счетчиках и матрице соседей
+            self.tags.model.objects.release_for_question(self.pk)
+
+            # Мягкое удаление идет через update() без post_save
+            from search.cache import search_cache
+            transaction.on_commit(search_cache.bump)
+
+        return True
 
     def get_absolute_url(self):
         return reverse('questions:detail', kwargs={'pk': self.id})
 
-    def answers_count(self):
-        return self.answers.filter(is_active=True).count()
-
     objects = QuestionManager()
-    all_objects = models.Manager()
+    all_objects = QuestionQuerySet.as_manager()
 
 
 class QuestionVote(models.Model):
@@ -125,3 +196,112 @@ class QuestionVote(models.Model):
 
     # Подключаем новый менеджер
     objects = QuestionVoteManager()
+
+
+class QuestionViewerSketch(models.Model):
+    """
+    HyperLogLog-скетч уникальных зрителей вопроса (авторизованных и анонимных).
+    Используется вместо таблицы viewed_by при QUESTION_VIEWS_ENGINE = 'hll'.
+    """
+    question = models.OneToOneField(
+        Question,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='viewer_sketch',
+        verbose_name='Вопрос'
+    )
+    registers = models.BinaryField(
+        verbose_name='Регистры HyperLogLog'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления'
+    )
+
+    objects = QuestionViewerSketchManager()
+
+    class Meta:
+        verbose_name = 'Скетч зрителей вопроса'
+        verbose_name_plural = 'Скетчи зрителей вопросов'
+
+    def __str__(self):
+        return f"Viewers sketch for {self.question_id}"
+
+
+class QuestionSignature(models.Model):
+    """
+    MinHash-сигнатуры заголовка и текста вопроса для поиска дублей.
+    bands - хеши LSH-полос обеих сигнатур: кандидаты находятся одним
+    запросом пересечения массивов (&&) по GIN-индексу.
+    """
+    question = models.OneToOneField(
+        Question,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='Вопрос'
+    )
+    title_signature = models.BinaryField(
+        verbose_name='Сигнатура заголовка'
+    )
+    content_signature = models.BinaryField(
+        verbose_name='Сигнатура текста'
+    )
+    bands = ArrayField(
+        models.BigIntegerField(),
+        default=list,
+        verbose_name='LSH-полосы'
+    )
+
+    objects = QuestionSignatureManager()
+
+    class Meta:
+        verbose_name = 'Сигнатура вопроса'
+        verbose_name_plural = 'Сигнатуры вопросов'
+        indexes = [
+            GinIndex(fields=['bands']),
+        ]
+
+    def __str__(self):
+        return f"MinHash signature for {self.question_id}"
+
+
+class RelatedQuestion(models.Model):
+    """
+    Заранее посчитанные похожие вопросы: top-K соседей каждого активного
+    вопроса по общим тегам (с учетом редкости тегов и голосов). Блок на
+    странице вопроса читается одним запросом по индексу (question, -score).
+
+    Таблица строится командой build_related_questions и обновляется для
+    отдельного вопроса при смене его тегов.
+    """
+    question = models.ForeignKey(
+        Question,
+        on_delete=models.CASCADE,
+        related_name='related_questions',
+        verbose_name='Вопрос'
+    )
+    related = models.ForeignKey(
+        Question,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий вопрос'
+    )
+    score = models.FloatField(
+        verbose_name='Похожесть'
+    )
+
+    objects = RelatedQuestionManager()
+
+    class Meta:
+        verbose_name = 'Похожий вопрос'
+        verbose_name_plural = 'Похожие вопросы'
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'related'], name='questions_related_unique_pair'),
+        ]
+        indexes = [
+            Index(fields=['question', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.question_id} -> {self.related_id}: {self.score:.3f}"
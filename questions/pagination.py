@@ -0,0 +1,208 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class CursorPage:
+    """
+    Страница keyset-пагинации. Повторяет интерфейс django.core.paginator.Page
+    в той мере, в какой он используется шаблонами (итерация, has_next и т.д.),
+    но вместо номеров страниц хранит непрозрачные курсоры.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage: %s objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация по упорядоченному QuerySet.
+
+    Вместо OFFSET и COUNT(*) следующая страница выбирается условием
+    "строго после последней строки" по ключу сортировки, поэтому любая
+    страница стоит столько же, сколько первая. Последнее поле сортировки
+    должно быть уникальным (id), иначе ключ неоднозначен.
+    """
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, queryset, per_page, ordering=None):
+        ordering = tuple(ordering or queryset.query.order_by)
+        if not ordering or ordering[-1].lstrip('-') not in ('id', 'pk'):
+            raise ImproperlyConfigured(
+                'CursorPaginator requires an ordering that ends with a unique "id" field.'
+            )
+
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = ordering
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def _model_field(self, name):
+        opts = self.queryset.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def encode_cursor(self, obj, direction):
+        """Упаковывает ключ сортировки объекта в непрозрачный токен для URL."""
+        values = []
+        for name, _ in self.fields:
+            value = getattr(obj, name)
+            if isinstance(value, (datetime, date)):
+                # isoformat сохраняет микросекунды, без них ключ был бы неточным
+                value = value.isoformat()
+            values.append(value)
+
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        """Возвращает (направление, значения ключа) или None для некорректного токена."""
+        if not token:
+            return None
+
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            direction, raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            return None
+
+        if direction not in (self.NEXT, self.PREVIOUS) or not isinstance(raw_values, list):
+            return None
+        if len(raw_values) != len(self.fields):
+            return None
+
+        try:
+            values = [
+                self._model_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, raw_values)
+            ]
+        except ValidationError:
+            return None
+
+        return direction, values
+
+    def _seek(self, values, backwards):
+        """
+        Условие "строка идёт после ключа values" в порядке сортировки
+        (или перед ним, если backwards=True).
+
+        Лексикографическое сравнение раскрывается в OR из цепочек равенств,
+        а первое поле дополнительно ограничивается сверху/снизу, чтобы
+        планировщик мог начать сканирование индекса сразу с нужного места.
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= equal & Q(**{'%s__%s' % (name, lookup): value})
+            equal &= Q(**{name: value})
+
+        first_name, first_descending = self.fields[0]
+        bound = 'lte' if first_descending != backwards else 'gte'
+        return Q(**{'%s__%s' % (first_name, bound): values[0]}) & condition
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        direction, values = decoded if decoded else (self.NEXT, None)
+        backwards = direction == self.PREVIOUS
+
+        if backwards:
+            ordering = [name[1:] if name.startswith('-') else '-' + name for name in self.ordering]
+        else:
+            ordering = list(self.ordering)
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if values is not None and not rows:
+            # Курсор указывает в пустоту (например, строки удалили) - начинаем сначала
+            return self.get_page()
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], self.NEXT) if has_next and rows else None,
+            previous_cursor=self.encode_cursor(rows[0], self.PREVIOUS) if has_previous and rows else None,
+        )
+
+
+class CursorPaginationMixin:
+    """Подменяет стандартную пагинацию ListView на keyset-пагинацию."""
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size)
+        page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class CappedPaginator(Paginator):
+    """
+    Постраничная навигация без полного подсчета: COUNT считается по
+    подзапросу с LIMIT cap + 1, а страницы доступны только в пределах
+    первых cap строк. Широкий запрос стоит ограниченно, а шаблон
+    показывает "cap+" (is_capped), если совпадений больше.
+    """
+
+    def __init__(self, object_list, per_page, cap, total=None, **kwargs):
+        self.cap = cap
+        super().__init__(object_list, per_page, **kwargs)
+        if total is not None:
+            # Уже известное число совпадений (например, из кеша выдачи)
+            self.total = total
+
+    @cached_property
+    def total(self):
+        """Число совпадений, но не больше cap + 1."""
+        if isinstance(self.object_list, QuerySet):
+            # Для подсчета не нужны ни сортировка, ни аннотации (ранг и т.п.)
+            return self.object_list.order_by().values('pk')[:self.cap + 1].count()
+        return min(len(self.object_list), self.cap + 1)
+
+    @cached_property
+    def count(self):
+        return min(self.total, self.cap)
+
+    @property
+    def is_capped(self):
+        return self.total > self.cap
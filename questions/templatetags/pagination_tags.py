@@ -0,0 +1,19 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, number, param=None):
+    """
+    Строка запроса текущей страницы с номером страницы number в параметре
+    param (по умолчанию page). Остальные параметры (q, страницы других
+    блоков) сохраняются. number=None убирает параметр - первая страница
+    keyset-пагинации, у которой нет курсора.
+    """
+    params = context['request'].GET.copy()
+    if number is None:
+        params.pop(param or 'page', None)
+    else:
+        params[param or 'page'] = number
+    return '?' + params.urlencode()
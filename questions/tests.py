@@ -1,3 +1,339 @@
-from django.test import TestCase
+import random
+import threading
+from array import array
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import close_old_connections, connection
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+
+from answers.models import Answer, AnswerVote
+from tags.models import Tag
+from users.models import ReputationEvent, User
+from .management.commands.fill_db import CopyWriter
+from .managers import HOT_SCORE_WINDOW_DAYS
+from .models import Question, QuestionVote
+from .pagination import CursorPaginator
+from .sketches import BloomFilter, HyperLogLog, MinHash, RecentlySeen, shingles
+from .viewcount import view_buffer
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class VoteConcurrencyTests(TransactionTestCase):
+    """
+    Стресс-тест движка голосования: параллельные потоки голосуют одними и
+    теми же пользователями за один вопрос и один ответ, после чего счетчики
+    votes должны совпадать с SUM(value) по таблицам голосов.
+    """
+    THREADS = 8
+    VOTES_PER_THREAD = 40
+    USERS = 5
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='x')
+        self.voters = [
+            User.objects.create_user(username='voter%s' % i, password='x')
+            for i in range(self.USERS)
+        ]
+        self.question = Question.objects.create(title='Вопрос', content='Текст', author=self.author)
+        self.answer = Answer.objects.create(content='Ответ', question=self.question, author=self.author)
+
+    def _run_in_threads(self, target):
+        errors = []
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            try:
+                for _ in range(self.VOTES_PER_THREAD):
+                    target(rnd.choice(self.voters), rnd.choice((1, -1)))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+    def assertReputationMatches(self, expected):
+        """Репутация автора совпадает и с весом голосов, и с суммой журнала."""
+        self.author.refresh_from_db()
+        ledger = self.author.reputation_events.aggregate(total=Sum('delta'))['total'] or 0
+        self.assertEqual(self.author.reputation, expected)
+        self.assertEqual(ledger, expected)
+
+    def test_question_votes_match_sum(self):
+        def vote(user, value):
+            question = Question.all_objects.get(pk=self.question.pk)
+            result = QuestionVote.objects.add_or_update_vote(user, question, value)
+            self.assertIn(result['voted'], (0, value))
+
+        self._run_in_threads(vote)
+
+        expected = QuestionVote.objects.filter(question=self.question).aggregate(total=Sum('value'))['total'] or 0
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.votes, expected)
+        self.assertReputationMatches(expected * ReputationEvent.QUESTION_VOTE_WEIGHT)
+        self.assertLessEqual(QuestionVote.objects.filter(question=self.question).count(), self.USERS)
+
+    def test_answer_votes_match_sum(self):
+        def vote(user, value):
+            answer = Answer.all_objects.get(pk=self.answer.pk)
+            result = AnswerVote.objects.add_or_update_vote(user, answer, value)
+            self.assertEqual(result['voted'], result['value'] != 0)
+
+        self._run_in_threads(vote)
+
+        expected = AnswerVote.objects.filter(answer=self.answer).aggregate(total=Sum('value'))['total'] or 0
+        self.answer.refresh_from_db()
+        self.assertEqual(self.answer.votes, expected)
+        self.assertReputationMatches(expected * ReputationEvent.ANSWER_VOTE_WEIGHT)
+
+    def test_vote_toggle(self):
+        first = QuestionVote.objects.add_or_update_vote(self.voters[0], self.question, 1)
+        changed = QuestionVote.objects.add_or_update_vote(self.voters[0], self.question, -1)
+        removed = QuestionVote.objects.add_or_update_vote(self.voters[0], self.question, -1)
+
+        self.assertEqual((first['new_votes'], first['voted']), (1, 1))
+        self.assertEqual((changed['new_votes'], changed['voted']), (-1, -1))
+        self.assertEqual((removed['new_votes'], removed['voted']), (0, 0))
+        self.assertFalse(QuestionVote.objects.exists())
+
+
+@override_settings(QUESTION_VIEWS_ENGINE='m2m', VIEW_BUFFER_INLINE_FLUSH=False, VIEW_BUFFER_BATCH_SIZE=7)
+class ViewBufferTests(TestCase):
+    VIEWERS = 30
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author', password='x')
+        self.question = Question.objects.create(title='Вопрос', content='Текст', author=author)
+        self.viewers = [User.objects.create_user(username='viewer%s' % i, password='x') for i in range(self.VIEWERS)]
+
+    def test_flush_drains_whole_backlog(self):
+        for viewer in self.viewers:
+            self.assertTrue(Question.objects.record_view(self.question, viewer))
+        # Повторный просмотр не попадает в буфер
+        self.assertFalse(Question.objects.record_view(self.question, self.viewers[0]))
+        self.assertEqual(view_buffer.pending(), self.VIEWERS)
+
+        # Очередь длиннее нескольких пачек выгружается за один вызов
+        self.assertEqual(view_buffer.flush(), self.VIEWERS)
+        self.assertEqual(view_buffer.pending(), 0)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.views, self.VIEWERS)
+
+    def test_head_evicted_keeps_numbering(self):
+        for viewer in self.viewers[:10]:
+            Question.objects.record_view(self.question, viewer)
+        view_buffer.flush()
+        cache.delete(view_buffer.HEAD_KEY)
+
+        for viewer in self.viewers[10:]:
+            Question.objects.record_view(self.question, viewer)
+        self.assertEqual(view_buffer.flush(), self.VIEWERS - 10)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.views, self.VIEWERS)
+
+
+class HotScoreTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='x')
+
+    def _question(self, title, votes, age):
+        question = Question.objects.create(title=title, content='Текст', author=self.author)
+        Question.all_objects.filter(pk=question.pk).update(votes=votes, created_at=timezone.now() - age)
+        return question
+
+    def test_question_leaving_window_drops_below_fresh(self):
+        old = self._question('Старый', 1000, timedelta(days=HOT_SCORE_WINDOW_DAYS, hours=-1))
+        fresh = self._question('Свежий', 2, timedelta(hours=10))
+        call_command('refresh_hot_scores', stdout=StringIO())
+        self.assertEqual(list(Question.objects.hot()), [old, fresh])
+
+        # Вопрос вышел из окна: последний рассчитанный рейтинг не сохраняется
+        Question.all_objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=HOT_SCORE_WINDOW_DAYS, hours=1))
+        call_command('refresh_hot_scores', stdout=StringIO())
+        self.assertEqual(list(Question.objects.hot()), [fresh, old])
+        old.refresh_from_db()
+        self.assertEqual(old.hot_score, 0)
+
+        # Голос за старый вопрос тоже не возвращает его наверх
+        QuestionVote.objects.add_or_update_vote(self.author, old, 1)
+        self.assertEqual(list(Question.objects.hot()), [fresh, old])
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=0)
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author', password='x')
+        Question.objects.bulk_create([
+            Question(title='Вопрос %s' % i, content='Текст', author=author, votes=i // 4)
+            for i in range(10)
+        ])
+        # Много равных значений первого поля: порядок внутри них задает id
+        self.queryset = Question.objects.order_by('-votes', '-id')
+        self.expected = list(self.queryset)
+
+    def _paginator(self):
+        return CursorPaginator(self.queryset, per_page=4)
+
+    def test_next_and_previous_pages(self):
+        paginator = self._paginator()
+        first = paginator.get_page()
+        self.assertEqual(list(first), self.expected[:4])
+        self.assertFalse(first.has_previous())
+
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(second), self.expected[4:8])
+        third = paginator.get_page(second.next_cursor)
+        self.assertEqual(list(third), self.expected[8:])
+        self.assertFalse(third.has_next())
+
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), self.expected[4:8])
+        self.assertTrue(back.has_next())
+        self.assertEqual(list(paginator.get_page(back.previous_cursor)), self.expected[:4])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        paginator = self._paginator()
+        for cursor in ('garbage', 'W10', paginator.encode_cursor(self.expected[0], 'x')):
+            page = paginator.get_page(cursor)
+            self.assertEqual(list(page), self.expected[:4])
+            self.assertFalse(page.has_previous())
+
+    def test_links_keep_other_parameters(self):
+        author = User.objects.get(username='author')
+        Question.objects.create(title='Еще вопрос', content='Текст', author=author)
+        self.client.force_login(author)
+        response = self.client.get(reverse('questions:list'), {'ref': 'nav', 'tab': 'new'})
+        next_cursor = response.context['page'].next_cursor
+        self.assertContains(response, 'href="?ref=nav&amp;tab=new&amp;cursor=%s"' % next_cursor)
+
+        response = self.client.get(reverse('questions:list'), {'ref': 'nav', 'cursor': next_cursor})
+        self.assertContains(response, 'href="?ref=nav" class="page-link" title="Первая страница"')
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def test_error_within_bounds(self):
+        # Стандартная ошибка при precision=12 около 1.6% - проверяем 3 сигмы
+        for total in (100, 5000, 50000):
+            hll = HyperLogLog(12)
+            for i in range(total):
+                hll.add('viewer%s' % i)
+            self.assertLess(abs(hll.count() - total) / total, 0.05, total)
+
+    def test_duplicates_merge_and_serialization(self):
+        first, second = HyperLogLog(10), HyperLogLog(10)
+        for i in range(3000):
+            first.add('a%s' % i)
+            second.add('a%s' % (i + 1500))
+        self.assertFalse(first.add('a1'))
+        restored = HyperLogLog(registers=first.to_bytes())
+        self.assertEqual(restored.count(), first.count())
+
+        first.merge(second)
+        self.assertLess(abs(first.count() - 4500) / 4500, 0.1)
+        with self.assertRaises(ValueError):
+            first.merge(HyperLogLog(12))
+        with self.assertRaises(ValueError):
+            HyperLogLog(registers=bytes(100))
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter(2000, error_rate=0.01)
+        for i in range(2000):
+            bloom.add('seen%s' % i)
+        self.assertTrue(all('seen%s' % i in bloom for i in range(2000)))
+
+        false_positives = sum('other%s' % i in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_recently_seen_forgets_old_generations(self):
+        recent = RecentlySeen(100)
+        self.assertFalse(recent.check_and_add('first'))
+        self.assertTrue(recent.check_and_add('first'))
+
+        # Два заполненных поколения вытесняют первый элемент (с запасом на
+        # ложные срабатывания, которые не увеличивают счетчик фильтра)
+        for i in range(250):
+            recent.check_and_add('item%s' % i)
+        self.assertFalse(recent.check_and_add('first'))
+
+
+class MinHashTests(SimpleTestCase):
+    def setUp(self):
+        self.minhash = MinHash()
+
+    def test_similarity_estimates_jaccard(self):
+        first = {'word%s' % i for i in range(100)}
+        second = {'word%s' % i for i in range(50, 150)}
+        signature = self.minhash.signature(first)
+
+        self.assertEqual(self.minhash.similarity(signature, self.minhash.signature(set(first))), 1.0)
+        self.assertLess(self.minhash.similarity(signature, self.minhash.signature({'other%s' % i for i in range(100)})), 0.1)
+        # Сходство Жаккара 50 / 150; стандартная ошибка при 48 позициях около 0.07
+        estimate = self.minhash.similarity(signature, self.minhash.signature(second))
+        self.assertAlmostEqual(estimate, 1 / 3, delta=0.2)
+        self.assertEqual(self.minhash.similarity(signature, None), 0.0)
+
+    def test_band_hashes(self):
+        signature = self.minhash.signature({'django', 'orm', 'query'})
+        bands = self.minhash.band_hashes(signature, 'title')
+        self.assertEqual(len(bands), self.minhash.bands)
+        self.assertEqual(self.minhash.band_hashes(self.minhash.signature({'query', 'orm', 'django'}), 'title'), bands)
+        self.assertTrue(all(-2 ** 63 <= band < 2 ** 63 for band in bands))
+        # Одинаковые полосы разных полей и разных номеров не совпадают
+        self.assertFalse(set(bands) & set(self.minhash.band_hashes(signature, 'content')))
+        self.assertEqual(len(set(MinHash(num_perm=4, bands=4).band_hashes(array('I', [7] * 4)))), 4)
+
+        # Частично похожие множества делят часть полос
+        similar = self.minhash.signature({'django', 'orm', 'query', 'filter'})
+        shared = set(bands) & set(self.minhash.band_hashes(similar, 'title'))
+        self.assertTrue(0 < len(shared) < len(bands))
+
+    def test_signature_serialization_and_validation(self):
+        self.assertIsNone(self.minhash.signature(set()))
+        signature = self.minhash.signature({'django'})
+        self.assertEqual(len(signature), self.minhash.num_perm)
+        self.assertEqual(MinHash.from_bytes(signature.tobytes()), signature)
+        self.assertIsNone(MinHash.from_bytes(b''))
+        with self.assertRaises(ValueError):
+            MinHash(num_perm=50, bands=16)
+
+    def test_shingles(self):
+        self.assertEqual(
+            shingles('Как настроить Django ORM? Настройка ORM'),
+            {'как', 'настро', 'django', 'orm'},
+        )
+
+
+class CopyWriterTests(TestCase):
+    def test_values_are_escaped(self):
+        description = 'Табуляция\tперевод\nстроки\r и обратный \\N слеш'
+        with connection.cursor() as cursor:
+            writer = CopyWriter(cursor, Tag, ['name', 'description'], timezone.now())
+            writer.write(('tab\tname', description))
+            writer.write(('null', '\\N'))
+            writer.flush()
+        self.assertEqual(writer.rows, 2)
+        self.assertEqual(Tag.objects.get(name='tab\tname').description, description)
+        self.assertEqual(Tag.objects.get(name='null').description, '\\N')
+
+
+class BenchmarkMixTests(SimpleTestCase):
+    def test_invalid_weights_are_rejected_before_start(self):
+        for mix in ('detail=-1,list=1', 'detail=nan', 'detail=0', 'detail=x', 'unknown=1'):
+            with self.subTest(mix=mix), self.assertRaises(CommandError):
+                call_command('benchmark', mix=mix, stdout=StringIO())
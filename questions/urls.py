@@ -15,4 +15,6 @@ urlpatterns = [
 
     # Функциональные представления
     path('<int:pk>/vote/', views.vote_question, name='vote_question'),
+    path('api/votes/', views.vote_state, name='vote_state'),
+    path('api/duplicates/', views.duplicates, name='duplicates'),
 ]
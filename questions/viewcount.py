@@ -0,0 +1,134 @@
+import hashlib
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+from .sketches import RecentlySeen
+
+
+class ViewCountBuffer:
+    """
+    Буфер просмотров вопросов.
+
+    Вместо трех запросов к БД на каждый просмотр событие (question_id, user_id)
+    кладется в кеш, а раз в VIEW_BUFFER_FLUSH_INTERVAL секунд буфер целиком
+    сбрасывается в БД пачками: на пачку один INSERT в viewed_by и один
+    сгруппированный UPDATE счетчиков. Выгрузку запускает просмотр, пришедший
+    после интервала, или (с общим кешем и VIEW_BUFFER_INLINE_FLUSH = False)
+    команда flush_views --interval.
+
+    Каждое событие лежит под своим ключом с порядковым номером из счетчика
+    head, поэтому с общим кешем (Redis, Memcached) буфер виден всем воркерам
+    и может быть выгружен командой flush_views. С LocMemCache у каждого
+    процесса свой буфер.
+
+    Повторные просмотры отсекаются до записи в буфер: для движка 'm2m' через
+    ключ в кеше, для 'hll' - локальным фильтром Блума (повторное добавление
+    в скетч ничего не меняет, поэтому ложные срабатывания фильтра почти не
+    влияют на оценку, а запрос к кешу не нужен).
+    """
+    HEAD_KEY = 'views:head'
+    TAIL_KEY = 'views:tail'
+    LOCK_KEY = 'views:lock'
+    SEEN_KEY = 'views:seen:%s:%s'
+    EVENT_KEY = 'views:event:%s'
+
+    def __init__(self):
+        self._last_flush = time.monotonic()
+        self._recent = None
+
+    def _seen(self, question_id, viewer):
+        if settings.QUESTION_VIEWS_ENGINE == 'hll':
+            if self._recent is None:
+                self._recent = RecentlySeen(settings.VIEW_BLOOM_CAPACITY)
+            return self._recent.check_and_add('%s:%s' % (question_id, viewer))
+        return not cache.add(self.SEEN_KEY % (question_id, viewer), 1, settings.VIEW_BUFFER_SEEN_TIMEOUT)
+
+    def record(self, question_id, viewer):
+        """
+        Ставит просмотр в очередь. viewer - id пользователя (движок 'm2m')
+        или строковый ключ зрителя (движок 'hll'). Повторные просмотры той
+        же пары отбрасываются еще до записи в буфер.
+        """
+        if self._seen(question_id, viewer):
+            return False
+
+        try:
+            slot = cache.incr(self.HEAD_KEY)
+        except ValueError:
+            # Счетчик вытеснен из кеша: нумерация продолжается с tail, а не
+            # с нуля, иначе новые события получили бы уже выгруженные номера
+            cache.add(self.HEAD_KEY, cache.get(self.TAIL_KEY, 0), None)
+            slot = cache.incr(self.HEAD_KEY)
+        cache.set(self.EVENT_KEY % slot, (question_id, viewer), settings.VIEW_BUFFER_SEEN_TIMEOUT)
+
+        if (settings.VIEW_BUFFER_INLINE_FLUSH
+                and time.monotonic() - self._last_flush >= settings.VIEW_BUFFER_FLUSH_INTERVAL):
+            self.flush()
+        return True
+
+    def flush(self):
+        """
+        Выгружает в БД все события, накопленные к началу выгрузки, пачками
+        по VIEW_BUFFER_BATCH_SIZE, пока tail не догонит head. Возвращает
+        количество засчитанных просмотров или None, если буфер сейчас
+        выгружает другой процесс.
+        """
+        self._last_flush = time.monotonic()
+        if not cache.add(self.LOCK_KEY, 1, 60):
+            return None
+
+        Question = apps.get_model('questions', 'Question')
+        applied = 0
+        try:
+            head = cache.get(self.HEAD_KEY, 0)
+            tail = cache.get(self.TAIL_KEY, 0)
+            if head < tail:
+                # Счетчик head начат заново без tail (например, после
+                # сброса ключей вручную): выгружаем с начала. Повторно примененное событие ничего не меняет -
+                # и viewed_by, и скетчи учитывают пару зрителя один раз
+                tail = 0
+
+            # События, пришедшие во время выгрузки, достанутся следующей
+            while tail < head:
+                last = min(head, tail + settings.VIEW_BUFFER_BATCH_SIZE)
+                keys = [self.EVENT_KEY % slot for slot in range(tail + 1, last + 1)]
+                # Событие, номер которого уже выдан, но еще не записан в кеш,
+                # будет пропущено - для счетчика просмотров это допустимо.
+                events = cache.get_many(keys).values()
+                applied += Question.objects.apply_views(events)
+
+                cache.set(self.TAIL_KEY, last, None)
+                cache.delete_many(keys)
+                cache.touch(self.LOCK_KEY, 60)
+                tail = last
+            return applied
+        finally:
+            cache.delete(self.LOCK_KEY)
+
+    def pending(self):
+        """Количество событий, ожидающих выгрузки."""
+        return max(cache.get(self.HEAD_KEY, 0) - cache.get(self.TAIL_KEY, 0), 0)
+
+
+def anonymous_viewer_id(request):
+    """
+    Идентификатор анонимного зрителя: значение cookie, а если ее нет -
+    хеш IP и User-Agent (его же стоит записать в cookie, чтобы следующий
+    просмотр из этого браузера совпал с первым).
+    """
+    viewer_id = request.COOKIES.get(settings.VIEWER_COOKIE_NAME)
+    if viewer_id:
+        return viewer_id[:64]
+
+    source = '%s|%s|%s' % (
+        settings.SECRET_KEY,
+        request.META.get('REMOTE_ADDR', ''),
+        request.META.get('HTTP_USER_AGENT', ''),
+    )
+    return hashlib.blake2b(source.encode(), digest_size=16).hexdigest()
+
+
+view_buffer = ViewCountBuffer()
@@ -1,19 +1,23 @@
+from django.conf import settings
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
 from django.urls import reverse_lazy
-from django.db.models import Q
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET, require_http_methods
 from django.contrib.auth.decorators import login_required
-from .models import Question, QuestionVote
+from .models import Question, QuestionSignature, QuestionVote, RelatedQuestion
 from .forms import QuestionForm
-from tags.models import Tag
-from answers.models import Answer
+from .pagination import CursorPaginationMixin
+from .viewcount import anonymous_viewer_id
+from answers.models import Answer, AnswerVote
+from search.backends import get_backend
 
-class QuestionListView(ListView):
+class QuestionListView(CursorPaginationMixin, ListView):
     model = Question
     template_name = 'questions/list.html'
     context_object_name = 'page'
@@ -24,29 +28,25 @@ class QuestionListView(ListView):
 
         search_query = self.request.GET.get('q')
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(content__icontains=search_query)
-            )
+            queryset = get_backend().filter_questions(queryset, search_query)
 
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Шаблон итерирует страницу и передаёт её в пагинацию
+        context['page'] = context['page_obj']
+        QuestionVote.objects.set_my_vote(self.request.user, context['page'].object_list)
         context['title'] = 'Новые вопросы'
-        context['popular_tags'] = Tag.objects.all().order_by('-usage_count')[:12]
         return context
 
 class HotQuestionListView(QuestionListView):
     def get_queryset(self):
-        queryset = Question.objects.best().with_prefetches()
+        queryset = Question.objects.hot().with_prefetches()
 
         search_query = self.request.GET.get('q')
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(content__icontains=search_query)
-            )
+            queryset = get_backend().filter_questions(queryset, search_query)
 
         return queryset
 
@@ -76,7 +76,7 @@ class QuestionDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        question = self.get_object()
+        question = self.object
 
         answers = Answer.objects.filter(
             question_id=question.id,
@@ -85,16 +85,34 @@ class QuestionDetailView(DetailView):
         paginator = Paginator(answers, 10)
         page_number = self.request.GET.get('page')
         page_obj = paginator.get_page(page_number)
+        page_obj.object_list = list(page_obj.object_list)
+
+        # Голоса текущего пользователя - по одному запросу на вопрос и страницу ответов
+        QuestionVote.objects.set_my_vote(self.request.user, [question])
+        AnswerVote.objects.set_my_vote(self.request.user, page_obj.object_list)
 
         context['page_obj'] = page_obj
         context['answers'] = answers
-        context['popular_tags'] = Tag.objects.all().order_by('-usage_count')[:10]
-
-        # Логика подсчета просмотров вынесена в менеджер
-        Question.objects.record_view(question, self.request.user)
+        context['related_questions'] = RelatedQuestion.objects.for_question(question)
 
         return context
 
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+
+        # Логика подсчета просмотров вынесена в менеджер
+        anonymous_id = None
+        if settings.QUESTION_VIEWS_ENGINE == 'hll' and not request.user.is_authenticated:
+            anonymous_id = anonymous_viewer_id(request)
+            if settings.VIEWER_COOKIE_NAME not in request.COOKIES:
+                response.set_cookie(
+                    settings.VIEWER_COOKIE_NAME, anonymous_id,
+                    max_age=60 * 60 * 24 * 365, httponly=True, samesite='Lax'
+                )
+        Question.objects.record_view(self.object, request.user, anonymous_id)
+
+        return response
+
 class QuestionCreateView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
     model = Question
     form_class = QuestionForm
@@ -146,10 +164,12 @@ class QuestionDeleteView(LoginRequiredMixin, UserPassesTestMixin, SuccessMessage
         question = self.get_object()
         return self.request.user == question.author
 
-    def delete(self, request, *args, **kwargs):
-        question = self.get_object()
-        question.delete_question()
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # С Django 4.0 DeleteView удаляет объект в form_valid, а не в delete(),
+        # поэтому мягкое удаление делаем здесь - иначе вопрос удалялся бы из БД
+        self.object.delete_question()
+        messages.success(self.request, self.success_message)
+        return redirect(self.get_success_url())
 
 @require_http_methods(["POST"])
 @login_required
@@ -179,3 +199,84 @@ def vote_question(request, pk):
         })
 
     return redirect('questions:list')
+
+
+# Максимум id одного типа в запросе состояния голосов
+VOTE_STATE_MAX_IDS = 100
+
+
+def _parse_ids(raw):
+    ids = []
+    for part in raw.split(','):
+        part = part.strip()
+        if part.isdigit():
+            ids.append(int(part))
+    return ids[:VOTE_STATE_MAX_IDS]
+
+
+@never_cache
+@require_GET
+def vote_state(request):
+    """
+    Голоса текущего пользователя за перечисленные вопросы и ответы:
+    ?questions=1,2,3&answers=4,5 -> {"questions": {"1": 1}, "answers": {"5": -1}}.
+
+    Позволяет закешированным (одинаковым для всех) страницам подсветить
+    голоса пользователя на клиенте. Отсутствующий id означает "не голосовал".
+    """
+    questions = QuestionVote.objects.votes_map(request.user, _parse_ids(request.GET.get('questions', '')))
+    answers = AnswerVote.objects.votes_map(request.user, _parse_ids(request.GET.get('answers', '')))
+
+    return JsonResponse({
+        'success': True,
+        'questions': questions,
+        'answers': answers,
+    })
+
+
+# Короче минимальной длины заголовка (QuestionForm.clean_title) дубли не ищем
+DUPLICATES_MIN_TITLE = 10
+
+
+@never_cache
+@require_GET
+def duplicates(request):
+    """
+    Вероятные дубли вопроса, который пользователь сейчас пишет:
+    ?title=...&content=...&exclude=42 -> {"results": [{"id": 7, "title": ...,
+    "similarity": 0.75}, ...]}.
+
+    Кандидаты выбираются по LSH-полосам MinHash-сигнатур одним запросом
+    по GIN-индексу, поэтому ответ не зависит от числа вопросов в базе.
+    exclude - id редактируемого вопроса, чтобы он не нашел сам себя.
+    """
+    title = request.GET.get('title', '').strip()
+    if len(title) < DUPLICATES_MIN_TITLE:
+        return JsonResponse({'success': True, 'results': []})
+
+    exclude = _parse_ids(request.GET.get('exclude', ''))
+    scored = QuestionSignature.objects.similar(
+        title,
+        request.GET.get('content', '')[:settings.DUPLICATES_MAX_CONTENT],
+        exclude=exclude[0] if exclude else None,
+    )
+    questions = Question.objects.only('id', 'title', 'answers_count').in_bulk(
+        [question_id for question_id, _ in scored]
+    )
+
+    results = []
+    for question_id, score in scored:
+        question = questions.get(question_id)
+        if question is not None:
+            results.append({
+                'id': question.pk,
+                'title': question.title,
+                'url': question.get_absolute_url(),
+                'answers_count': question.answers_count,
+                'similarity': round(score, 2),
+            })
+
+    return JsonResponse({
+        'success': True,
+        'results': results,
+    })
@@ -0,0 +1,89 @@
+from django.db import connection, transaction
+
+
+def _vote_sql(vote_model, target_field):
+    """
+    Собирает запросы движка голосования для модели голоса vote_model
+    (QuestionVote, AnswerVote), ссылающейся на цель полем target_field.
+
+    Основной запрос одним выражением вставляет или переключает голос
+    (INSERT ... ON CONFLICT DO UPDATE) и сдвигает счетчик votes у цели на
+    разницу, вычисленную из RETURNING. Значения голосов - только 1 и -1:
+    новый голос меняет счетчик на value, смена голоса - на 2 * value, а
+    повторный голос тем же значением обнуляет строку (-value) и она
+    удаляется вторым запросом в той же транзакции.
+    """
+    qn = connection.ops.quote_name
+    opts = vote_model._meta
+    fk = opts.get_field(target_field)
+    target_opts = fk.related_model._meta
+
+    votes = qn(opts.db_table)
+    pk = qn(opts.pk.column)
+    user = qn(opts.get_field('user').column)
+    target = qn(fk.column)
+    value = qn(opts.get_field('value').column)
+    created_at = qn(opts.get_field('created_at').column)
+    targets = qn(target_opts.db_table)
+    target_pk = qn(target_opts.pk.column)
+    counter = qn(target_opts.get_field('votes').column)
+
+    upsert = f"""
+        WITH vote AS (
+            INSERT INTO {votes} ({user}, {target}, {value}, {created_at})
+            VALUES (%(user)s, %(target)s, %(value)s, NOW())
+            ON CONFLICT ({user}, {target}) DO UPDATE SET {value} = CASE
+                WHEN {votes}.{value} = EXCLUDED.{value} THEN 0
+                ELSE EXCLUDED.{value}
+            END
+            RETURNING {pk} AS id, {value} AS value, (xmax = 0) AS created
+        ), delta AS (
+            SELECT id, value, CASE
+                WHEN created THEN value
+                WHEN value = 0 THEN -%(value)s
+                ELSE 2 * value
+            END AS amount
+            FROM vote
+        ), bumped AS (
+            UPDATE {targets} SET {counter} = {counter} + (SELECT amount FROM delta)
+            WHERE {target_pk} = %(target)s
+            RETURNING {counter}
+        )
+        SELECT delta.id, delta.value, delta.amount, (SELECT {counter} FROM bumped)
+        FROM delta
+    """
+    cleanup = f'DELETE FROM {votes} WHERE {pk} = %s AND {value} = 0'
+    return upsert, cleanup
+
+
+def apply_vote(vote_model, target_field, user_id, target_id, value):
+    """
+    Атомарно применяет голос пользователя: повторный голос с тем же значением
+    снимает его, противоположный - меняет, иначе голос создается. Голос и
+    счетчик цели меняются одним запросом без чтения-изменения-записи в
+    Python, поэтому параллельные голоса не теряются: конкурирующие запросы
+    по одной паре (пользователь, цель) ждут друг друга на строке голоса.
+
+    Возвращает словарь с новым значением счетчика (votes), изменением
+    счетчика (delta) и текущим голосом пользователя (voted: 1, -1 или 0).
+    """
+    upsert, cleanup = _vote_sql(vote_model, target_field)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(upsert, {'user': user_id, 'target': target_id, 'value': value})
+        vote_id, voted, delta, votes = cursor.fetchone()
+
+        if votes is None:
+            raise vote_model._meta.get_field(target_field).related_model.DoesNotExist(
+                'Vote target %s does not exist' % target_id
+            )
+        if voted == 0:
+            # Снятый голос не переживает транзакцию: строка с нулем видна
+            # только нам, конкуренты ждут ее блокировку до коммита
+            cursor.execute(cleanup, [vote_id])
+
+    return {
+        'votes': votes,
+        'delta': delta,
+        'voted': voted,
+    }
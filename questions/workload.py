@@ -0,0 +1,154 @@
+import json
+import math
+import random
+from bisect import bisect
+from collections import Counter
+from functools import lru_cache
+from itertools import accumulate
+
+# Профили распределений тестовых данных для fill_db. Показатель *_zipf - это
+# степень s закона Ципфа (вес k-го по популярности элемента 1 / k**s):
+# 0 - равномерное распределение, около 1 - как у реальных сообществ, где
+# немногие вопросы, теги и пользователи собирают большую часть активности.
+PROFILES = {
+    # Прежнее поведение fill_db: все выбирается равномерно
+    'uniform': {
+        'author_zipf': 0.0,           # авторы вопросов, ответов и голосов
+        'tag_zipf': 0.0,              # популярность тегов
+        'tags_per_question': [0, 0, 1],  # веса 1, 2 и 3 тегов у вопроса
+        'answer_zipf': 0.0,           # распределение ответов по вопросам
+        'unanswered_rate': 0.0,       # доля вопросов без ответов
+        'vote_zipf': 0.0,             # распределение голосов по вопросам
+        'answer_vote_zipf': 0.0,      # распределение голосов между ответами одного вопроса
+        'question_vote_share': 0.5,   # доля голосов за вопросы (остальные - за ответы)
+        'upvote_rate': 0.5,           # доля голосов "за"
+        'accepted_rate': 0.0,         # доля вопросов с ответами, где ответ принят
+        'span_days': 365,             # вопросы создаются за этот период до текущего момента
+        'growth': 0.0,                # рост активности за период (0 - равномерно во времени)
+        'answer_delay_hours': 720,    # среднее время до ответа
+    },
+    'realistic': {
+        'author_zipf': 1.1,
+        'tag_zipf': 1.2,
+        'tags_per_question': [0.25, 0.4, 0.35],
+        'answer_zipf': 0.8,
+        'unanswered_rate': 0.2,
+        'vote_zipf': 1.1,
+        'answer_vote_zipf': 1.5,
+        'question_vote_share': 0.35,
+        'upvote_rate': 0.85,
+        'accepted_rate': 0.45,
+        'span_days': 730,
+        'growth': 2.0,
+        'answer_delay_hours': 6,
+    },
+}
+
+DEFAULT_PROFILE = 'uniform'
+
+
+def load_profile(name_or_path, seed=None):
+    """
+    Профиль по имени из PROFILES или из JSON-файла (сохраненного
+    dump_profile). Недостающие ключи берутся из профиля uniform, а seed,
+    если не задан ни аргументом, ни в файле, выбирается случайно - и
+    сохраняется в профиле, чтобы прогон можно было повторить.
+    """
+    if name_or_path in PROFILES:
+        data = dict(PROFILES[name_or_path], name=name_or_path)
+    else:
+        try:
+            with open(name_or_path, encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as error:
+            raise ValueError('Unknown workload profile %r: %s' % (name_or_path, error))
+
+    profile = dict(PROFILES[DEFAULT_PROFILE], name=DEFAULT_PROFILE, seed=None)
+    unknown = set(data) - set(profile)
+    if unknown:
+        raise ValueError('Unknown workload profile keys: %s' % ', '.join(sorted(unknown)))
+    profile.update(data)
+
+    if seed is not None:
+        profile['seed'] = seed
+    elif profile['seed'] is None:
+        profile['seed'] = random.randrange(2 ** 32)
+    if not any(profile['tags_per_question']):
+        raise ValueError('tags_per_question must contain a positive weight')
+    return profile
+
+
+def dump_profile(profile, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(profile, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+@lru_cache(maxsize=8)
+def zipf_cum_weights(count, exponent):
+    """Накопленные веса закона Ципфа для count элементов (кешируются на процесс)."""
+    return list(accumulate((rank + 1) ** -exponent for rank in range(count)))
+
+
+class ZipfSampler:
+    """
+    Выбор чисел first..first+count-1 по закону Ципфа: first - самый
+    популярный. Таблица накопленных весов общая для всех выборщиков
+    процесса с теми же count и exponent.
+    """
+
+    def __init__(self, first, count, exponent):
+        self.first = first
+        self.count = count
+        self.cum_weights = zipf_cum_weights(count, exponent)
+        self.total = self.cum_weights[-1]
+
+    def sample(self, rnd):
+        return self.first + bisect(self.cum_weights, rnd.random() * self.total)
+
+    def sample_unique(self, rnd, k):
+        """k различных чисел (не больше count). Большие выборки - равномерно, без перебора."""
+        k = min(k, self.count)
+        if k * 2 > self.count:
+            return rnd.sample(range(self.first, self.first + self.count), k)
+        chosen = set()
+        while len(chosen) < k:
+            chosen.add(self.sample(rnd))
+        return list(chosen)
+
+
+def distribute(rnd, total, weights, batch=1000000):
+    """
+    Раскладывает total событий по элементам с весами weights (мультиномиально).
+    Возвращает Counter {индекс: число событий}.
+    """
+    counts = Counter()
+    cum_weights = list(accumulate(weights))
+    if not cum_weights or not cum_weights[-1]:
+        return counts
+    population = range(len(cum_weights))
+    while total > 0:
+        size = min(total, batch)
+        counts.update(rnd.choices(population, cum_weights=cum_weights, k=size))
+        total -= size
+    return counts
+
+
+def popularity_ranks(rnd, count):
+    """Случайный ранг популярности (0 - самый популярный) каждого из count элементов."""
+    ranks = list(range(count))
+    rnd.shuffle(ranks)
+    return ranks
+
+
+def question_time(profile, index, total):
+    """
+    Доля периода span_days (0 - начало, 1 - сейчас), в которую создан
+    вопрос номер index из total. При growth > 0 плотность вопросов растет
+    как e**(growth * t): недавних вопросов больше, чем старых.
+    """
+    position = (index + 0.5) / max(total, 1)
+    growth = profile['growth']
+    if not growth:
+        return position
+    return math.log1p(position * math.expm1(growth)) / growth
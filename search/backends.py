@@ -0,0 +1,215 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F, Q
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+from answers.models import Answer
+from questions.models import Question
+from tags.models import Tag
+from .bm25 import tokenize
+from .index import ANSWER, QUESTION, search_index
+
+# Маркеры подсветки ts_headline: текст вопросов и ответов может содержать
+# HTML, поэтому сначала вырезаем теги и экранируем фрагмент, а уже затем
+# заменяем маркеры на <mark>
+HIGHLIGHT_START = '⟦'
+HIGHLIGHT_STOP = '⟧'
+
+
+def _render_headline(headline):
+    text = escape(strip_tags(headline or ''))
+    text = text.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+    return mark_safe(text)
+
+
+class IContainsBackend:
+    """Поиск подстрокой (ILIKE) без индексов - для отладки и не-PostgreSQL баз."""
+    name = 'icontains'
+    # Порядок слов важен: ищется подстрока целиком
+    ordered_query = True
+
+    def filter_questions(self, queryset, query):
+        return queryset.filter(Q(title__icontains=query) | Q(content__icontains=query))
+
+    def search_questions(self, query):
+        return self.filter_questions(Question.objects.all(), query).order_by('-created_at')
+
+    def search_answers(self, query):
+        return Answer.objects.filter(content__icontains=query).order_by('-votes', '-created_at')
+
+    def search_tags(self, query):
+        return Tag.objects.filter(name__icontains=query)
+
+    def highlight(self, objects, query):
+        """Без полнотекстового поиска фрагменты не подсвечиваются."""
+        return objects
+
+
+class PostgresFullTextBackend(IContainsBackend):
+    """
+    Полнотекстовый поиск PostgreSQL по колонке search_vector.
+
+    Вектор хранится в строке и поддерживается триггером (заголовок вопроса
+    с весом A, текст - с весом B), поэтому запрос - это поиск по GIN-индексу
+    и SearchRank по уже готовому вектору, без to_tsvector на каждую строку.
+    Запрос пользователя разбирается в режиме websearch: "фраза в кавычках",
+    -исключение и OR работают так же, как в поисковиках.
+    """
+    name = 'postgres'
+    ordered_query = False
+
+    def __init__(self, config=None):
+        self.config = config or settings.SEARCH_CONFIG
+
+    def _query(self, query):
+        return SearchQuery(query, config=self.config, search_type='websearch')
+
+    def filter_questions(self, queryset, query):
+        return queryset.filter(search_vector=self._query(query))
+
+    def _ranked(self, queryset, query):
+        search_query = self._query(query)
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query),
+        ).order_by('-rank', '-id')
+
+    def search_questions(self, query):
+        return self._ranked(Question.objects.all(), query)
+
+    def search_answers(self, query):
+        return self._ranked(Answer.objects.all(), query)
+
+    def highlight(self, objects, query):
+        """
+        Проставляет объектам страницы атрибут headline - фрагмент текста с
+        подсвеченными совпадениями. ts_headline дорогой (разбирает весь
+        документ), поэтому считается отдельным запросом только для
+        показанных строк, а не для всей выборки.
+        """
+        objects = list(objects)
+        if not objects:
+            return objects
+
+        model = type(objects[0])
+        headlines = dict(
+            model._default_manager.filter(pk__in=[obj.pk for obj in objects]).annotate(
+                headline=SearchHeadline(
+                    'content',
+                    self._query(query),
+                    config=self.config,
+                    start_sel=HIGHLIGHT_START,
+                    stop_sel=HIGHLIGHT_STOP,
+                    max_words=35,
+                    min_words=15,
+                ),
+            ).values_list('pk', 'headline')
+        )
+        for obj in objects:
+            obj.headline = _render_headline(headlines.get(obj.pk))
+        return objects
+
+
+class RankedResults:
+    """
+    Результаты внешнего поискового индекса: упорядоченный список id, из
+    которого объекты поднимаются из БД только для запрошенного среза
+    (страницы). Повторяет нужную видам и Paginator часть API QuerySet.
+    """
+
+    def __init__(self, queryset, ids):
+        self.queryset = queryset
+        self.ids = ids
+
+    def select_related(self, *fields):
+        return RankedResults(self.queryset.select_related(*fields), self.ids)
+
+    def prefetch_related(self, *lookups):
+        return RankedResults(self.queryset.prefetch_related(*lookups), self.ids)
+
+    def only(self, *fields):
+        return RankedResults(self.queryset.only(*fields), self.ids)
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            ids = self.ids[key]
+            objects = self.queryset.in_bulk(ids)
+            # Документы, удаленные после индексации, просто пропускаются
+            return [objects[pk] for pk in ids if pk in objects]
+        return self[key:key + 1][0]
+
+
+class BM25Backend(IContainsBackend):
+    """
+    Переносимый поиск по индексу BM25 в памяти процесса (search/index.py),
+    не зависящий от текстового поиска PostgreSQL. Выдача ограничена
+    SEARCH_BM25_MAX_RESULTS лучшими документами. Пока файл индекса не
+    собран командой build_search_index, поиск идет подстрокой, как в
+    IContainsBackend.
+    """
+    name = 'bm25'
+    ordered_query = False
+
+    def _ids(self, kind, query):
+        result = search_index.search(query, kind)
+        return None if result is None else result[1]
+
+    def filter_questions(self, queryset, query):
+        ids = self._ids(QUESTION, query)
+        if ids is None:
+            return super().filter_questions(queryset, query)
+        return queryset.filter(pk__in=ids)
+
+    def search_questions(self, query):
+        ids = self._ids(QUESTION, query)
+        if ids is None:
+            return super().search_questions(query)
+        return RankedResults(Question.objects.all(), ids)
+
+    def search_answers(self, query):
+        ids = self._ids(ANSWER, query)
+        if ids is None:
+            return super().search_answers(query)
+        return RankedResults(Answer.objects.all(), ids)
+
+    def highlight(self, objects, query):
+        """Подсвечивает слова с теми же основами, что у слов запроса."""
+        terms = set(tokenize(query))
+        objects = list(objects)
+        for obj in objects:
+            words = strip_tags(obj.content).split()
+            matches = [bool(terms.intersection(tokenize(word))) for word in words]
+            if not any(matches):
+                continue
+            start = max(matches.index(True) - 10, 0)
+            window = range(start, min(start + 35, len(words)))
+            parts = [
+                '<mark>%s</mark>' % escape(words[i]) if matches[i] else escape(words[i])
+                for i in window
+            ]
+            prefix = '… ' if start else ''
+            suffix = ' …' if window.stop < len(words) else ''
+            obj.headline = mark_safe(prefix + ' '.join(parts) + suffix)
+        return objects
+
+
+BACKENDS = {
+    'icontains': IContainsBackend,
+    'postgres': PostgresFullTextBackend,
+    'bm25': BM25Backend,
+}
+
+
+def get_backend(name=None):
+    """Возвращает поисковый бэкенд по имени (по умолчанию SEARCH_BACKEND)."""
+    name = name or settings.SEARCH_BACKEND
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError('Unknown search backend: %s' % name)
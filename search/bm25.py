@@ -0,0 +1,322 @@
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import Counter
+from operator import itemgetter
+
+TOKEN_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-яё]')
+
+STOP_WORDS = frozenset((
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все', 'она', 'так',
+    'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по', 'только', 'ее', 'мне', 'было',
+    'вот', 'от', 'меня', 'еще', 'нет', 'о', 'из', 'ему', 'ли', 'если', 'или', 'ни', 'быть', 'был',
+    'до', 'вас', 'это', 'для', 'при', 'мы', 'их', 'чем', 'без', 'под', 'над', 'где', 'есть',
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it', 'of', 'on',
+    'or', 'that', 'the', 'this', 'to', 'was', 'with', 'how', 'what', 'why', 'do', 'does',
+))
+
+# Легкий стемминг: отрезаем самое длинное из типичных окончаний, оставляя
+# основу не короче MIN_STEM символов. Это не Snowball, но словоформы
+# "программист/программисты/программистов" и "query/queries" сводятся вместе
+RU_SUFFIXES = sorted((
+    'ировать', 'ировал', 'ирует', 'ением', 'ениям', 'ениях', 'ение', 'ения', 'ений', 'ости', 'ость',
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ться', 'ется', 'ются', 'ишь',
+    'ешь', 'ать', 'ять', 'ить', 'еть', 'ует', 'ют', 'ия', 'ий', 'ый', 'ой', 'ая', 'яя', 'ое', 'ее',
+    'ые', 'ие', 'ов', 'ев', 'ей', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю', 'а', 'я', 'о',
+    'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+EN_SUFFIXES = ('ingly', 'edly', 'ings', 'ing', 'ies', 'ed', 'es', 'ly', 's')
+MIN_STEM = 3
+
+MAGIC = b'BM25IDX\x01'
+HEADER = struct.Struct('<8sQ')
+
+
+def stem(word):
+    suffixes = RU_SUFFIXES if CYRILLIC_RE.search(word) else EN_SUFFIXES
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            if suffix == 'ies':
+                return word[:-3] + 'y'
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Разбивает текст на основы слов без стоп-слов."""
+    return [
+        stem(word) for word in TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+        if word not in STOP_WORDS
+    ]
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class BM25Index:
+    """
+    Инвертированный индекс с ранжированием BM25 на чистом Python.
+
+    Документ - пара (kind, pk), например вопрос или ответ. Каждому документу
+    присваивается плотный номер, а список вхождений термина хранится как два
+    массива: номера документов (array('I')) и частоты (array('H')), по 6 байт
+    на вхождение. Номера только растут, поэтому списки всегда отсортированы
+    и дополняются в конец. Обновление документа - удаление и добавление
+    заново: удаленный документ помечается нулевой длиной и пропускается при
+    поиске, а когда таких набирается COMPACT_RATIO, индекс уплотняется.
+
+    Индекс сохраняется в один файл (save) и открывается через mmap (load):
+    массивы читаются прямо из отображенной памяти без разбора, а копируются
+    только те списки, в которые потом добавляются документы.
+    """
+    K1 = 1.2
+    B = 0.75
+    COMPACT_RATIO = 0.2
+    MAX_TF = 0xFFFF
+
+    def __init__(self):
+        self._kinds = array('B')
+        self._pks = array('Q')
+        self._lengths = array('I')
+        self._postings = {}
+        self._numbers = {}
+        self._live = 0
+        self._total_length = 0
+        self._mmap = None
+        self.meta = {}
+
+    def __len__(self):
+        return self._live
+
+    @property
+    def term_count(self):
+        return len(self._postings)
+
+    def _make_writable(self):
+        # После load документы лежат в mmap (memoryview только для чтения)
+        if not isinstance(self._pks, array):
+            self._kinds = array('B', self._kinds)
+            self._pks = array('Q', self._pks)
+            self._lengths = array('I', self._lengths)
+
+    def _writable_postings(self, term):
+        postings = self._postings.get(term)
+        if postings is None:
+            postings = self._postings[term] = (array('I'), array('H'))
+        elif not isinstance(postings[0], array):
+            docs, tfs = array('I'), array('H')
+            docs.frombytes(postings[0].tobytes())
+            tfs.frombytes(postings[1].tobytes())
+            postings = self._postings[term] = (docs, tfs)
+        return postings
+
+    def add(self, kind, pk, tokens):
+        """Добавляет (или заменяет) документ списком его токенов."""
+        self.remove(kind, pk)
+        if not tokens:
+            return
+        self._make_writable()
+
+        doc = len(self._pks)
+        self._kinds.append(kind)
+        self._pks.append(pk)
+        self._lengths.append(len(tokens))
+        self._numbers[(kind, pk)] = doc
+        self._live += 1
+        self._total_length += len(tokens)
+
+        for term, tf in Counter(tokens).items():
+            docs, tfs = self._writable_postings(term)
+            docs.append(doc)
+            tfs.append(min(tf, self.MAX_TF))
+
+    def remove(self, kind, pk):
+        doc = self._numbers.pop((kind, pk), None)
+        if doc is None:
+            return False
+        self._make_writable()
+
+        self._live -= 1
+        self._total_length -= self._lengths[doc]
+        self._lengths[doc] = 0
+        if len(self._pks) - self._live > self.COMPACT_RATIO * len(self._pks):
+            self.compact()
+        return True
+
+    def compact(self):
+        """Перенумеровывает живые документы и выбрасывает удаленные из списков."""
+        lengths = self._lengths
+        remap = array('q', [-1]) * len(self._pks)
+        kinds, pks, new_lengths = array('B'), array('Q'), array('I')
+        for doc, length in enumerate(lengths):
+            if length:
+                remap[doc] = len(pks)
+                kinds.append(self._kinds[doc])
+                pks.append(self._pks[doc])
+                new_lengths.append(length)
+
+        postings = {}
+        for term, (docs, tfs) in self._postings.items():
+            new_docs, new_tfs = array('I'), array('H')
+            for doc, tf in zip(docs, tfs):
+                number = remap[doc]
+                if number >= 0:
+                    new_docs.append(number)
+                    new_tfs.append(tf)
+            if new_docs:
+                postings[term] = (new_docs, new_tfs)
+
+        self._kinds, self._pks, self._lengths = kinds, pks, new_lengths
+        self._postings = postings
+        self._numbers = {(kinds[doc], pks[doc]): doc for doc in range(len(pks))}
+        self._mmap = None
+
+    def search(self, terms, kind=None, limit=100):
+        """
+        Ранжирует документы по BM25 для списка терминов запроса.
+        Возвращает (число найденных документов, [(kind, pk, score), ...]
+        лучших limit документов). kind ограничивает поиск одним типом документов,
+        но idf считается по всей коллекции.
+        """
+        total = self._live
+        if not total:
+            return 0, []
+
+        k1, b = self.K1, self.B
+        average = self._total_length / total
+        lengths, kinds = self._lengths, self._kinds
+        scores = {}
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            live = [(doc, tf) for doc, tf in zip(*postings) if lengths[doc]]
+            if not live:
+                continue
+            idf = math.log(1 + (total - len(live) + 0.5) / (len(live) + 0.5))
+            for doc, tf in live:
+                if kind is not None and kinds[doc] != kind:
+                    continue
+                norm = tf + k1 * (1 - b + b * lengths[doc] / average)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / norm
+
+        top = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        pks = self._pks
+        return len(scores), [(kinds[doc], pks[doc], score) for doc, score in top]
+
+    @classmethod
+    def merge(cls, parts):
+        """Склеивает индексы, построенные по непересекающимся наборам документов."""
+        index = cls()
+        for part in parts:
+            if len(part._pks) != part._live:
+                part.compact()
+            offset = len(index._pks)
+            index._kinds.extend(part._kinds)
+            index._pks.extend(part._pks)
+            index._lengths.extend(part._lengths)
+            index._live += part._live
+            index._total_length += part._total_length
+            for (kind, pk), doc in part._numbers.items():
+                index._numbers[(kind, pk)] = doc + offset
+            for term, (docs, tfs) in part._postings.items():
+                target_docs, target_tfs = index._writable_postings(term)
+                target_docs.extend(doc + offset for doc in docs)
+                target_tfs.extend(tfs)
+        return index
+
+    def save(self, path):
+        """Атомарно записывает индекс в файл (через временный файл и rename)."""
+        if len(self._pks) != self._live:
+            self.compact()
+
+        terms = sorted(self._postings)
+        entries = []
+        position = 0
+        for term in terms:
+            count = len(self._postings[term][0])
+            entries.append([term, position, count])
+            position += count
+        header = json.dumps({
+            'byteorder': sys.byteorder,
+            'docs': len(self._pks),
+            'total_length': self._total_length,
+            'terms': entries,
+            'meta': self.meta,
+        }, ensure_ascii=False).encode()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp_path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, len(header)))
+            file.write(header)
+
+            def write_block(chunks):
+                for chunk in chunks:
+                    file.write(chunk)
+                file.write(b'\0' * (_align(file.tell()) - file.tell()))
+
+            file.write(b'\0' * (_align(file.tell()) - file.tell()))
+            write_block([self._kinds])
+            write_block([self._pks])
+            write_block([self._lengths])
+            write_block([self._postings[term][0] for term in terms])
+            write_block([self._postings[term][1] for term in terms])
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Открывает сохраненный индекс через mmap. Бросает ValueError для чужого файла."""
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(mapped) < HEADER.size:
+            raise ValueError('BM25 index file is truncated')
+        magic, header_length = HEADER.unpack_from(mapped)
+        if magic != MAGIC:
+            raise ValueError('Not a BM25 index file')
+        header = json.loads(mapped[HEADER.size:HEADER.size + header_length])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError('BM25 index file was written on a different architecture')
+
+        view = memoryview(mapped)
+        offset = _align(HEADER.size + header_length)
+
+        def take(fmt, count):
+            nonlocal offset
+            size = count * array(fmt).itemsize
+            if offset + size > len(mapped):
+                raise ValueError('BM25 index file is truncated')
+            block = view[offset:offset + size].cast(fmt)
+            offset = _align(offset + size)
+            return block
+
+        count = header['docs']
+        postings_count = sum(entry[2] for entry in header['terms'])
+        index = cls()
+        index._kinds = take('B', count)
+        index._pks = take('Q', count)
+        index._lengths = take('I', count)
+        docs = take('I', postings_count)
+        tfs = take('H', postings_count)
+
+        index._postings = {
+            term: (docs[start:start + size], tfs[start:start + size])
+            for term, start, size in header['terms']
+        }
+        index._numbers = {(index._kinds[doc], index._pks[doc]): doc for doc in range(count)}
+        index._live = count
+        index._total_length = header['total_length']
+        index._mmap = mapped
+        index.meta = header['meta']
+        return index
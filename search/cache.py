@@ -0,0 +1,68 @@
+import time
+from hashlib import blake2b
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def normalize_query(query, ordered=True):
+    """
+    Нормализует запрос для ключа кеша: регистр и пробелы не важны, а если
+    бэкенд не учитывает порядок слов (ordered=False), слова сортируются.
+    Фразы в кавычках и OR порядок сохраняют.
+    """
+    words = query.casefold().split()
+    if not ordered and '"' not in query and 'or' not in words:
+        words.sort()
+    return ' '.join(words)
+
+
+class SearchCache:
+    """
+    Кеш первых страниц поисковой выдачи (id и счетчики по блокам).
+
+    Ключ включает номер поколения: создание, правка и мягкое удаление
+    вопросов и ответов увеличивают его (bump), и все старые записи разом
+    перестают читаться, дожидаясь истечения SEARCH_CACHE_TIMEOUT. Сами
+    объекты в кеш не попадают - при попадании они поднимаются по id, так
+    что голоса и счетчики всегда актуальны.
+    """
+    GENERATION_KEY = 'search:generation'
+    ENTRY_KEY = 'search:v1:%s:%s:%s'
+
+    def _start(self):
+        # Если счетчик вытеснен из кеша, новое поколение начинается с текущего
+        # времени, а не с 1, чтобы не совпасть с уже использованными номерами
+        cache.add(self.GENERATION_KEY, int(time.time() * 1000), None)
+
+    def generation(self):
+        value = cache.get(self.GENERATION_KEY)
+        if value is None:
+            self._start()
+            value = cache.get(self.GENERATION_KEY)
+        return value
+
+    def bump(self):
+        try:
+            cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            self._start()
+
+    def key(self, namespace, query):
+        """
+        Ключ записи для нормализованного запроса в текущем поколении.
+        Ключ берется до вычисления выдачи: если поколение сменится, пока
+        она считается, результат уйдет в уже устаревшее поколение.
+        namespace разделяет бэкенды и виды данных.
+        """
+        digest = blake2b(query.encode(), digest_size=16).hexdigest()
+        return self.ENTRY_KEY % (self.generation(), namespace, digest)
+
+    def get(self, key):
+        return cache.get(key)
+
+    def set(self, key, entry):
+        cache.set(key, entry, settings.SEARCH_CACHE_TIMEOUT)
+
+
+search_cache = SearchCache()
@@ -0,0 +1,120 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity, TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from questions.models import Question
+from tags.models import Tag
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _trigrams(text):
+    """Множество триграмм строки так же, как их строит pg_trgm."""
+    result = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = '  %s ' % word
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(first, second):
+    """Аналог similarity() из pg_trgm: доля общих триграмм."""
+    first, second = _trigrams(first), _trigrams(second)
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _set_thresholds(cursor):
+    # Операторы % и %> берут порог из настроек pg_trgm, и только с ними
+    # (в отличие от similarity(...) > x) работает GIN-индекс. set_config
+    # с is_local=true действует до конца текущей транзакции
+    cursor.execute(
+        "SELECT set_config('pg_trgm.similarity_threshold', %s, true),"
+        " set_config('pg_trgm.word_similarity_threshold', %s, true)",
+        [str(settings.SEARCH_TRIGRAM_SIMILARITY), str(settings.SEARCH_TRIGRAM_WORD_SIMILARITY)],
+    )
+
+
+def _suggest(query, tags, questions):
+    """
+    Собирает исправленный запрос: каждое слово, которого нет среди слов
+    найденных тегов и заголовков, заменяется самым похожим из них.
+    Для запроса из одного слова предлагается самый похожий тег.
+    """
+    normalized = query.strip().lower()
+    words = WORD_RE.findall(normalized)
+    if len(words) == 1 and tags and tags[0].name != normalized:
+        return tags[0].name
+
+    vocabulary = set()
+    for text in [tag.name for tag in tags] + [question.title for question in questions]:
+        vocabulary.update(WORD_RE.findall(text.lower()))
+
+    corrected = []
+    for word in words:
+        if word in vocabulary or word.isdigit():
+            corrected.append(word)
+            continue
+        best = max(vocabulary, key=lambda candidate: similarity(word, candidate), default=None)
+        if best is not None and similarity(word, best) >= settings.SEARCH_TRIGRAM_SIMILARITY:
+            corrected.append(best)
+        else:
+            corrected.append(word)
+
+    if corrected != words:
+        return ' '.join(corrected)
+    return None
+
+
+def fuzzy_search(query, limit=None):
+    """
+    Нечеткий поиск по заголовкам вопросов и именам тегов на триграммах.
+
+    Заголовки ищутся по word_similarity (запрос похож на часть заголовка),
+    теги - по similarity имени с каждым словом запроса. Оба отбора идут
+    через GIN-индексы gin_trgm_ops, а точная похожесть считается только
+    для кандидатов.
+    Возвращает словарь с ранжированными вопросами, тегами и подсказкой
+    "возможно, вы имели в виду" (None, если исправлять нечего).
+    """
+    limit = limit or settings.SEARCH_FUZZY_LIMIT
+    query = query.strip()
+    # Слова короче трех букв дают слишком общие триграммы
+    words = [word for word in WORD_RE.findall(query.lower()) if len(word) >= 3]
+    words = words[:settings.SEARCH_FUZZY_MAX_WORDS]
+    if not words:
+        return {'questions': [], 'tags': [], 'suggestion': None}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _set_thresholds(cursor)
+
+        # Каждое слово запроса ищется отдельно: OR из условий % и %> по-прежнему
+        # обслуживается индексом (BitmapOr), а ранжируются кандидаты по
+        # похожести на весь запрос
+        title_condition, tag_condition = Q(), Q()
+        for word in words:
+            title_condition |= Q(title__trigram_word_similar=word)
+            tag_condition |= Q(name__trigram_similar=word)
+        tag_scores = [TrigramSimilarity('name', word) for word in words]
+
+        questions = list(
+            Question.objects.filter(title_condition).annotate(
+                similarity=TrigramWordSimilarity(query, 'title'),
+            ).select_related('author').prefetch_related('tags').order_by('-similarity', '-id')[:limit]
+        )
+        tags = list(
+            Tag.objects.filter(tag_condition).annotate(
+                similarity=Greatest(*tag_scores) if len(tag_scores) > 1 else tag_scores[0],
+            ).order_by('-similarity', '-usage_count')[:limit]
+        )
+
+    return {
+        'questions': questions,
+        'tags': tags,
+        'suggestion': _suggest(query, tags, questions),
+    }
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils.html import strip_tags
+
+from answers.models import Answer
+from questions.models import Question
+from .bm25 import BM25Index, tokenize
+
+QUESTION = 0
+ANSWER = 1
+
+# Заголовок вопроса весит как три повтора текста (упрощенный BM25F)
+TITLE_WEIGHT = 3
+
+
+def question_tokens(title, content):
+    return tokenize(title) * TITLE_WEIGHT + tokenize(strip_tags(content))
+
+
+def answer_tokens(content):
+    return tokenize(strip_tags(content))
+
+
+def _documents(kind, queryset):
+    """Строки выборки в виде (pk, is_active, updated_at, токены)."""
+    if kind == QUESTION:
+        rows = queryset.values_list('id', 'is_active', 'updated_at', 'title', 'content')
+        for pk, is_active, updated_at, title, content in rows.iterator(chunk_size=2000):
+            yield pk, is_active, updated_at, question_tokens(title, content)
+    else:
+        rows = queryset.values_list('id', 'is_active', 'updated_at', 'content')
+        for pk, is_active, updated_at, content in rows.iterator(chunk_size=2000):
+            yield pk, is_active, updated_at, answer_tokens(content)
+
+
+def _queryset(kind):
+    return Question.objects.all() if kind == QUESTION else Answer.objects.all()
+
+
+def _all_objects(kind):
+    return Question.all_objects.all() if kind == QUESTION else Answer.all_objects.all()
+
+
+def id_ranges(chunk_size):
+    """Диапазоны id активных вопросов и ответов: [(kind, first_id, last_id), ...]."""
+    ranges = []
+    for kind in (QUESTION, ANSWER):
+        bounds = _queryset(kind).aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            continue
+        ranges.extend(
+            (kind, start, min(start + chunk_size - 1, bounds['last']))
+            for start in range(bounds['first'], bounds['last'] + 1, chunk_size)
+        )
+    return ranges
+
+
+def build_partial(kind, first_id, last_id):
+    """Индекс активных документов одного типа в диапазоне id (для параллельной сборки)."""
+    index = BM25Index()
+    for pk, _, _, tokens in _documents(kind, _queryset(kind).filter(id__range=(first_id, last_id))):
+        index.add(kind, pk, tokens)
+    return index
+
+
+def watermark():
+    """Максимальный updated_at вопросов и ответов - точка, с которой догонять изменения."""
+    marks = [
+        _all_objects(kind).aggregate(mark=Max('updated_at'))['mark']
+        for kind in (QUESTION, ANSWER)
+    ]
+    marks = [mark for mark in marks if mark is not None]
+    return max(marks) if marks else None
+
+
+class SearchIndex:
+    """
+    Индекс BM25 вопросов и ответов в памяти процесса.
+
+    При первом поиске индекс открывается из файла SEARCH_BM25_PATH (через
+    mmap, без пересборки). Сам процесс индекс не строит: файл собирает
+    команда build_search_index, а пока его нет, search возвращает None и
+    бэкенд ищет без индекса. Изменения этого процесса приходят сразу из
+    сигналов post_save, а изменения других процессов догружаются не чаще
+    раза в SEARCH_BM25_REFRESH_INTERVAL секунд по updated_at (мягкое
+    удаление его тоже сдвигает). Если файл индекса пересобран, процесс
+    переоткрывает его при следующей проверке.
+
+    updated_at выставляется при сохранении, а видна строка после коммита,
+    поэтому догрузка перечитывает еще SEARCH_BM25_CATCH_UP_OVERLAP секунд
+    до водяного знака: иначе строка долгой транзакции со временем раньше
+    уже сдвинутого знака была бы пропущена. Строки, уже взятые с тем же
+    updated_at, повторно не индексируются.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._watermark = None
+        self._seen = {}
+        self._file_mtime = None
+        self._refreshed_at = None
+
+    @property
+    def path(self):
+        return str(settings.SEARCH_BM25_PATH)
+
+    def _file_changed(self):
+        try:
+            return os.path.getmtime(self.path) != self._file_mtime
+        except OSError:
+            return False
+
+    def _open(self):
+        """Открывает индекс из файла. Возвращает False, если файла нет или он испорчен."""
+        try:
+            mtime = os.path.getmtime(self.path)
+            index = BM25Index.load(self.path)
+        except (OSError, ValueError, KeyError):
+            return False
+
+        self._index = index
+        self._file_mtime = mtime
+        self._seen = {}
+        mark = index.meta.get('watermark')
+        self._watermark = mark and Question._meta.get_field('updated_at').to_python(mark)
+        self._catch_up()
+        return True
+
+    def _catch_up(self):
+        """Переиндексирует вопросы и ответы, измененные после водяного знака (с запасом)."""
+        overlap = timedelta(seconds=settings.SEARCH_BM25_CATCH_UP_OVERLAP)
+        since = self._watermark and self._watermark - overlap
+        for kind in (QUESTION, ANSWER):
+            queryset = _all_objects(kind)
+            if since is not None:
+                queryset = queryset.filter(updated_at__gt=since)
+            for pk, is_active, updated_at, tokens in _documents(kind, queryset):
+                if self._seen.get((kind, pk)) == updated_at:
+                    continue
+                if is_active:
+                    self._index.add(kind, pk, tokens)
+                else:
+                    self._index.remove(kind, pk)
+                self._seen[(kind, pk)] = updated_at
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+
+        # Строки, вышедшие из окна перекрытия, больше не перечитываются
+        if self._watermark is not None:
+            since = self._watermark - overlap
+            self._seen = {key: mark for key, mark in self._seen.items() if mark > since}
+        self._refreshed_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        """Открывает или догружает индекс. False - индекса в процессе пока нет."""
+        if (self._index is None or self._file_changed()) and self._open():
+            return True
+        if self._index is None:
+            return False
+        if time.monotonic() - self._refreshed_at >= settings.SEARCH_BM25_REFRESH_INTERVAL:
+            self._catch_up()
+        return True
+
+    def search(self, query, kind, limit=None):
+        """
+        Возвращает (число совпадений, [pk, ...] лучших limit документов типа
+        kind) или None, если файл индекса еще не собран.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return 0, []
+        with self._lock:
+            if not self._ensure_fresh():
+                return None
+            total, top = self._index.search(terms, kind, limit or settings.SEARCH_BM25_MAX_RESULTS)
+        return total, [pk for _, pk, _ in top]
+
+    def _update(self, kind, pk, is_active, make_tokens):
+        # Пока индекс не открыт в этом процессе, токенизировать незачем:
+        # изменение подхватится при открытии по updated_at
+        with self._lock:
+            if self._index is None:
+                return
+            if is_active:
+                self._index.add(kind, pk, make_tokens())
+            else:
+                self._index.remove(kind, pk)
+
+    def update_question(self, pk, title, content, is_active=True):
+        self._update(QUESTION, pk, is_active, lambda: question_tokens(title, content))
+
+    def update_answer(self, pk, content, is_active=True):
+        self._update(ANSWER, pk, is_active, lambda: answer_tokens(content))
+
+    def remove(self, kind, pk):
+        with self._lock:
+            if self._index is not None:
+                self._index.remove(kind, pk)
+
+
+search_index = SearchIndex()
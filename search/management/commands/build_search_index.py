@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from AnswerHub.parallel import run_parallel
+from search.bm25 import BM25Index
+from search.index import build_partial, id_ranges, watermark
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the BM25 search index of questions and answers and save it to SEARCH_BM25_PATH. '
+        'Id ranges are tokenized in parallel worker processes and merged in order. '
+        'Usage: python manage.py build_search_index [--workers N] [--chunk-size N] [--output PATH]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+        parser.add_argument('--chunk-size', type=int, default=settings.SEARCH_BM25_CHUNK_SIZE, help='Number of ids per worker task')
+        parser.add_argument('--output', default=str(settings.SEARCH_BM25_PATH), help='Index file path')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        chunk_size = options['chunk_size']
+        if workers <= 0 or chunk_size <= 0:
+            raise CommandError('workers and chunk-size must be positive integers')
+
+        started = time.monotonic()
+        # Изменения, сделанные во время сборки, процессы догонят по updated_at
+        mark = watermark()
+        tasks = id_ranges(chunk_size)
+        self.stdout.write('Indexing %s id ranges in %s processes...' % (len(tasks), workers))
+
+        parts = run_parallel(build_partial, tasks, workers)
+        tokenized = time.monotonic() - started
+
+        index = BM25Index.merge(parts)
+        index.meta['watermark'] = mark.isoformat() if mark else None
+        index.save(options['output'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write('Tokenized in %.2fs, merged and saved in %.2fs' % (tokenized, elapsed - tokenized))
+        self.stdout.write(self.style.SUCCESS('Indexed %s documents, %s terms, %.1f MB in %.2fs (%.0f docs/s)' % (
+            len(index), index.term_count, os.path.getsize(options['output']) / 2 ** 20,
+            elapsed, len(index) / elapsed if elapsed else 0,
+        )))
@@ -0,0 +1,53 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from answers.models import Answer
+from questions.models import Question
+from .cache import search_cache
+from .index import ANSWER, QUESTION, search_index
+
+INDEXED_FIELDS = {
+    QUESTION: {'title', 'content', 'is_active'},
+    ANSWER: {'content', 'is_active'},
+}
+
+
+def _affects_index(kind, update_fields):
+    return update_fields is None or bool(INDEXED_FIELDS[kind] & set(update_fields))
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, update_fields=None, **kwargs):
+    """
+    Переиндексирует вопрос в индексе BM25 и сбрасывает кеш выдачи
+    после коммита транзакции.
+    """
+    if _affects_index(QUESTION, update_fields):
+        transaction.on_commit(partial(
+            search_index.update_question, instance.pk, instance.title, instance.content, instance.is_active,
+        ))
+        transaction.on_commit(search_cache.bump)
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved(sender, instance, update_fields=None, **kwargs):
+    if _affects_index(ANSWER, update_fields):
+        transaction.on_commit(partial(
+            search_index.update_answer, instance.pk, instance.content, instance.is_active,
+        ))
+        transaction.on_commit(search_cache.bump)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(search_index.remove, QUESTION, instance.pk))
+    transaction.on_commit(search_cache.bump)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(search_index.remove, ANSWER, instance.pk))
+    transaction.on_commit(search_cache.bump)
@@ -1,3 +1,112 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from questions.models import Question
+from users.models import User
+from .bm25 import BM25Index, stem, tokenize
+from .index import ANSWER, QUESTION, SearchIndex
+
+
+class TokenizeTests(SimpleTestCase):
+    def test_stem_merges_word_forms(self):
+        self.assertEqual(stem('программисты'), stem('программистов'))
+        self.assertEqual(stem('программист'), stem('программисты'))
+        self.assertEqual(stem('queries'), 'query')
+        # Короткие основы не обрезаются
+        self.assertEqual(stem('дом'), 'дом')
+
+    def test_tokenize_drops_stop_words_and_normalizes(self):
+        self.assertEqual(tokenize('Как настроить ЁЖ и the Django?'), [stem('настроить'), 'еж', 'django'])
+        self.assertEqual(tokenize('и в the'), [])
+
+
+class BM25IndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = BM25Index()
+        self.index.add(QUESTION, 1, tokenize('django orm query django'))
+        self.index.add(QUESTION, 2, tokenize('django templates and forms with many other words here'))
+        self.index.add(QUESTION, 3, tokenize('postgres index'))
+        self.index.add(ANSWER, 4, tokenize('django answer'))
+
+    def _pks(self, *args, **kwargs):
+        return [pk for _, pk, _ in self.index.search(*args, **kwargs)[1]]
+
+    def test_scoring_order(self):
+        # Больше вхождений и короче документ - выше
+        self.assertEqual(self._pks(tokenize('django'), QUESTION), [1, 2])
+        # Редкий термин весит больше частого
+        self.assertEqual(self._pks(tokenize('django postgres'), QUESTION)[0], 3)
+        total, _ = self.index.search(tokenize('django'))
+        self.assertEqual(total, 3)
+
+    def test_update_and_remove(self):
+        self.index.add(QUESTION, 3, tokenize('django django django'))
+        self.assertEqual(self._pks(tokenize('django'), QUESTION)[0], 3)
+        self.assertEqual(self._pks(tokenize('postgres')), [])
+
+        self.assertTrue(self.index.remove(QUESTION, 1))
+        self.assertFalse(self.index.remove(QUESTION, 1))
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn(1, self._pks(tokenize('django')))
+
+    def test_save_load_round_trip(self):
+        self.index.remove(QUESTION, 2)
+        self.index.meta['watermark'] = 'mark'
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bm25.idx')
+            self.index.save(path)
+            loaded = BM25Index.load(path)
+
+            for terms in (tokenize('django'), tokenize('postgres index'), tokenize('orm')):
+                self.assertEqual(loaded.search(terms), self.index.search(terms))
+            self.assertEqual((len(loaded), loaded.term_count), (len(self.index), self.index.term_count))
+            self.assertEqual(loaded.meta, {'watermark': 'mark'})
+
+            # Загруженный индекс можно менять: списки копируются из mmap
+            loaded.add(QUESTION, 5, tokenize('django django django django'))
+            self.assertEqual([pk for _, pk, _ in loaded.search(tokenize('django'), QUESTION)[1]][0], 5)
+
+    def test_load_rejects_foreign_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.idx') as file:
+            file.write(b'not an index file')
+            file.flush()
+            with self.assertRaises(ValueError):
+                BM25Index.load(file.name)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'bm25.idx')
+        settings_override = override_settings(SEARCH_BM25_PATH=self.path, SEARCH_BM25_REFRESH_INTERVAL=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.author = User.objects.create_user(username='author', password='x')
+        self.question = Question.objects.create(title='Django ORM', content='Текст', author=self.author)
+
+    def test_missing_file_is_not_built_inline(self):
+        index = SearchIndex()
+        self.assertIsNone(index.search('django', QUESTION))
+        self.assertFalse(os.path.exists(self.path))
+
+        call_command('build_search_index', workers=1, output=self.path, stdout=StringIO())
+        self.assertEqual(index.search('django', QUESTION), (1, [self.question.pk]))
+
+    def test_catch_up_sees_rows_committed_behind_watermark(self):
+        call_command('build_search_index', workers=1, output=self.path, stdout=StringIO())
+        index = SearchIndex()
+        self.assertEqual(index.search('django', QUESTION), (1, [self.question.pk]))
+
+        # Строка долгой транзакции: закоммичена после сдвига водяного знака,
+        # но с более ранним updated_at
+        late = Question.objects.create(title='Django late', content='Текст', author=self.author)
+        Question.all_objects.filter(pk=late.pk).update(updated_at=index._watermark - timedelta(seconds=10))
+        _, pks = index.search('late', QUESTION)
+        self.assertEqual(pks, [late.pk])
@@ -1,46 +1,149 @@
+from django.conf import settings
+from django.db.models import Prefetch
 from django.shortcuts import render
-from django.db.models import Q
+
+from answers.models import Answer
 from questions.models import Question
+from questions.pagination import CappedPaginator
 from tags.models import Tag
-from answers.models import Answer
-from django.core.paginator import Paginator
+from .backends import get_backend
+from .cache import normalize_query, search_cache
+from .fuzzy import fuzzy_search
 
-def search(request):
-    query = request.GET.get('q', '').strip()
+# Колонки, которые выводит шаблон: тяжелые search_vector и т.п. не читаем
+QUESTION_FIELDS = ('id', 'title', 'content', 'votes', 'created_at', 'answers_count', 'views')
+ANSWER_FIELDS = ('id', 'content', 'created_at', 'question__id', 'question__title')
+
+PAGE_PARAMS = ('page', 'answers_page', 'tags_page')
+
+
+def _question_rows(queryset):
+    return queryset.only(*QUESTION_FIELDS).prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+    )
+
+
+def _answer_rows(queryset):
+    return queryset.select_related('question').only(*ANSWER_FIELDS)
+
+
+def _tag_rows(queryset):
+    return queryset.only('id', 'name')
+
+
+def _sections():
+    """Блоки выдачи: (имя, параметр страницы, размер страницы, проекция, модель)."""
+    return (
+        ('questions', 'page', 10, _question_rows, Question),
+        ('answers', 'answers_page', settings.SEARCH_ANSWERS_PER_PAGE, _answer_rows, Answer),
+        ('tags', 'tags_page', settings.SEARCH_TAGS_PER_PAGE, _tag_rows, Tag),
+    )
 
+
+def _search_pages(request, backend, query):
+    """Считает блоки выдачи: каждый не дальше SEARCH_COUNT_CAP строк, своей страницей."""
     results = {
-        'questions': [],
-        'tags': [],
-        'answers': [],
+        'questions': backend.search_questions(query),
+        'answers': backend.search_answers(query),
+        'tags': backend.search_tags(query),
     }
+    pages = {}
+    for name, param, per_page, rows, _ in _sections():
+        paginator = CappedPaginator(rows(results[name]), per_page, cap=settings.SEARCH_COUNT_CAP)
+        pages[name] = paginator.get_page(request.GET.get(param, 1))
+
+    # Фрагменты с подсветкой - только для строк текущих страниц
+    pages['questions'].object_list = backend.highlight(pages['questions'].object_list, query)
+    pages['answers'].object_list = backend.highlight(pages['answers'].object_list, query)
+    return pages
 
-    if query:
-        # Поиск по вопросам
-        results['questions'] = Question.objects.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query),
-            is_active=True
-        ).select_related('author').prefetch_related('tags')
 
-        # Поиск по тегам
-        results['tags'] = Tag.objects.filter(name__icontains=query)
+def _cache_entry(pages):
+    return {
+        name: {
+            'ids': [obj.pk for obj in page.object_list],
+            'total': page.paginator.total,
+            'headlines': {
+                obj.pk: obj.headline for obj in page.object_list if getattr(obj, 'headline', None)
+            },
+        }
+        for name, page in pages.items()
+    }
+
 
-        # Поиск по ответам
-        results['answers'] = Answer.objects.filter(
-            Q(content__icontains=query),
-            is_active=True
-        ).select_related('author', 'question')
+def _cached_pages(entry):
+    """Первые страницы из кеша: объекты поднимаются одним in_bulk на блок."""
+    pages = {}
+    for name, _, per_page, rows, model in _sections():
+        section = entry[name]
+        objects = rows(model.objects.all()).in_bulk(section['ids'])
+        object_list = [objects[pk] for pk in section['ids'] if pk in objects]
+        for obj in object_list:
+            if obj.pk in section['headlines']:
+                obj.headline = section['headlines'][obj.pk]
+        paginator = CappedPaginator(object_list, per_page, cap=settings.SEARCH_COUNT_CAP, total=section['total'])
+        pages[name] = paginator.page(1)
+    return pages
 
-    # Пагинация для вопросов
-    page_number = request.GET.get('page', 1)
-    paginator = Paginator(results['questions'], 10)
-    page = paginator.get_page(page_number)
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    backend = get_backend()
+
+    if not query:
+        pages = {
+            name: CappedPaginator([], per_page, cap=settings.SEARCH_COUNT_CAP).page(1)
+            for name, _, per_page, _, _ in _sections()
+        }
+    elif all(request.GET.get(param, '1') == '1' for param in PAGE_PARAMS):
+        # Первые страницы популярных запросов отдаются из кеша без обращения
+        # к текстовому поиску; поколение в ключе сбрасывает их при правках
+        key = search_cache.key('results:%s' % backend.name, normalize_query(query, backend.ordered_query))
+        entry = search_cache.get(key)
+        if entry is None:
+            pages = _search_pages(request, backend, query)
+            search_cache.set(key, _cache_entry(pages))
+        else:
+            pages = _cached_pages(entry)
+    else:
+        pages = _search_pages(request, backend, query)
+
+    # Почти ничего не нашлось - возможно, опечатка: показываем нечеткие
+    # совпадения по заголовкам и тегам и исправленный запрос
+    fuzzy = None
+    if query and pages['questions'].paginator.count + pages['tags'].paginator.count < settings.SEARCH_FUZZY_MIN_RESULTS:
+        fuzzy = _fuzzy(query, pages)
 
     return render(request, 'search/results.html', {
+        'fuzzy': fuzzy,
         'query': query,
-        'results': results,
-        'page': page,
-        'questions_count': len(results['questions']),
-        'tags_count': len(results['tags']),
-        'answers_count': len(results['answers']),
+        'page': pages['questions'],
+        'answers_page': pages['answers'],
+        'tags_page': pages['tags'],
     })
+
+
+def _fuzzy(query, pages):
+    # Подсказка зависит от порядка слов, поэтому ключ без сортировки
+    key = search_cache.key('fuzzy', normalize_query(query))
+    entry = search_cache.get(key)
+    if entry is None:
+        found = fuzzy_search(query)
+        entry = {
+            'questions': [question.pk for question in found['questions']],
+            'tags': [tag.pk for tag in found['tags']],
+            'suggestion': found['suggestion'],
+        }
+        search_cache.set(key, entry)
+
+    found_questions = {question.pk for question in pages['questions'].object_list}
+    found_tags = {tag.pk for tag in pages['tags'].object_list}
+    question_ids = [pk for pk in entry['questions'] if pk not in found_questions]
+    tag_ids = [pk for pk in entry['tags'] if pk not in found_tags]
+    questions = _question_rows(Question.objects.all()).in_bulk(question_ids)
+    tags = _tag_rows(Tag.objects.all()).in_bulk(tag_ids)
+    return {
+        'questions': [questions[pk] for pk in question_ids if pk in questions],
+        'tags': [tags[pk] for pk in tag_ids if pk in tags],
+        'suggestion': entry['suggestion'],
+    }
@@ -0,0 +1,92 @@
+// Похожие вопросы по мере ввода заголовка и текста (questions:duplicates)
+function initQuestionDuplicates() {
+    const titleInput = document.getElementById('title');
+    const bodyInput = document.getElementById('question-body');
+    const container = document.getElementById('duplicate-questions');
+
+    if (!titleInput || !container || !titleInput.dataset.duplicatesUrl) {
+        return;
+    }
+
+    // Текст нужен только для оценки сходства - длинный в URL не передаем
+    const MAX_CONTENT = 2000;
+    let timer = null;
+    let controller = null;
+    let lastQuery = null;
+
+    function render(results) {
+        container.innerHTML = '';
+        if (!results.length) {
+            return;
+        }
+
+        const heading = document.createElement('div');
+        heading.className = 'duplicate-questions-title';
+        heading.textContent = 'Возможно, на ваш вопрос уже ответили:';
+        container.appendChild(heading);
+
+        const list = document.createElement('ul');
+        results.forEach(result => {
+            const item = document.createElement('li');
+            const link = document.createElement('a');
+            link.href = result.url;
+            link.target = '_blank';
+            link.textContent = result.title;
+            item.appendChild(link);
+
+            const answers = document.createElement('span');
+            answers.className = 'duplicate-questions-answers';
+            answers.textContent = 'ответов: ' + result.answers_count;
+            item.appendChild(answers);
+
+            list.appendChild(item);
+        });
+        container.appendChild(list);
+    }
+
+    async function fetchDuplicates() {
+        const params = new URLSearchParams({
+            title: titleInput.value.trim(),
+            content: bodyInput ? bodyInput.value.slice(0, MAX_CONTENT) : '',
+        });
+        if (container.dataset.exclude) {
+            params.set('exclude', container.dataset.exclude);
+        }
+
+        const query = params.toString();
+        if (query === lastQuery) {
+            return;
+        }
+        lastQuery = query;
+
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+
+        try {
+            const response = await fetch(titleInput.dataset.duplicatesUrl + '?' + query, { signal: controller.signal });
+            if (response.ok) {
+                const data = await response.json();
+                render(data.results);
+            }
+        } catch (error) {
+            // Запрос отменен следующим нажатием или нет сети - подсказка не критична
+        }
+    }
+
+    function schedule(delay) {
+        clearTimeout(timer);
+        timer = setTimeout(fetchDuplicates, delay);
+    }
+
+    titleInput.addEventListener('input', () => schedule(300));
+    if (bodyInput) {
+        bodyInput.addEventListener('input', () => schedule(800));
+    }
+    if (titleInput.value.trim()) {
+        fetchDuplicates();
+    }
+}
+
+document.addEventListener('DOMContentLoaded', initQuestionDuplicates);
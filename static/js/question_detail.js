@@ -139,20 +139,21 @@ document.addEventListener('DOMContentLoaded', function() {
                         allVoteBtns.forEach(btn => btn.classList.remove('voted'));
 
                         // Обновляем состояние кнопок в зависимости от голоса
-                        if (data.voted === 1) {
+                        // (для ответов voted - булево, значение голоса приходит в value)
+                        if (data.value === 1) {
                             allVoteBtns.forEach(btn => {
                                 if (btn.classList.contains('vote-up')) {
                                     btn.classList.add('voted');
                                 }
                             });
-                        } else if (data.voted === -1) {
+                        } else if (data.value === -1) {
                             allVoteBtns.forEach(btn => {
                                 if (btn.classList.contains('vote-down')) {
                                     btn.classList.add('voted');
                                 }
                             });
                         }
-                        // Если data.voted = 0, обе кнопки остаются без класса voted
+                        // Если data.value = 0, обе кнопки остаются без класса voted
 
                         showMessage('Голос учтен!', 'success');
                     } else {
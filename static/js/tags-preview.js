@@ -1,5 +1,5 @@
 function initTagsPreview() {
-    const tagsInput = document.getElementById('id_tags_input');
+    const tagsInput = document.getElementById('tags') || document.getElementById('id_tags_input');
     const tagsPreview = document.getElementById('tags-preview');
 
     if (tagsInput && tagsPreview) {
@@ -19,7 +19,85 @@ function initTagsPreview() {
     }
 }
 
+// Подсказки существующих тегов по мере ввода (tags:autocomplete)
+function initTagsAutocomplete() {
+    const tagsInput = document.getElementById('tags') || document.getElementById('id_tags_input');
+    const suggestions = document.getElementById('tags-suggestions');
+
+    if (!tagsInput || !suggestions || !tagsInput.dataset.autocompleteUrl) {
+        return;
+    }
+
+    let timer = null;
+    let controller = null;
+
+    function currentPrefix() {
+        const parts = tagsInput.value.split(',');
+        return parts[parts.length - 1].trim().toLowerCase();
+    }
+
+    function applySuggestion(name) {
+        const parts = tagsInput.value.split(',').map(tag => tag.trim());
+        parts[parts.length - 1] = name;
+        tagsInput.value = parts.filter(tag => tag).join(', ');
+        suggestions.innerHTML = '';
+        tagsInput.dispatchEvent(new Event('input'));
+        tagsInput.focus();
+    }
+
+    function render(results) {
+        const chosen = tagsInput.value.split(',').map(tag => tag.trim().toLowerCase());
+        suggestions.innerHTML = '';
+        results
+            .filter(result => !chosen.slice(0, -1).includes(result.name))
+            .forEach(result => {
+                const button = document.createElement('button');
+                button.type = 'button';
+                button.className = 'tag';
+                button.textContent = result.name;
+
+                const count = document.createElement('span');
+                count.className = 'tag-suggestion-count';
+                count.textContent = result.usage_count;
+                button.appendChild(count);
+
+                button.addEventListener('click', () => applySuggestion(result.name));
+                suggestions.appendChild(button);
+            });
+    }
+
+    async function fetchSuggestions() {
+        const prefix = currentPrefix();
+        if (!prefix) {
+            suggestions.innerHTML = '';
+            return;
+        }
+
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+
+        try {
+            const url = tagsInput.dataset.autocompleteUrl + '?q=' + encodeURIComponent(prefix);
+            const response = await fetch(url, { signal: controller.signal });
+            if (response.ok) {
+                const data = await response.json();
+                render(data.results);
+            }
+        } catch (error) {
+            // Запрос отменен следующим нажатием или нет сети - подсказки не критичны
+        }
+    }
+
+    tagsInput.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(fetchSuggestions, 100);
+    });
+}
+
 // Инициализация при загрузке документа
 document.addEventListener('DOMContentLoaded', function() {
     initTagsPreview();
+    initTagsAutocomplete();
 });
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TagsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tags'
+
+    def ready(self):
+        """
+        Импортируем сигналы при загрузке приложения
+        """
+        import tags.signals
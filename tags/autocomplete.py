@@ -0,0 +1,131 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.apps import apps
+from django.conf import settings
+
+
+class TagPrefixIndex:
+    """
+    Индекс имен тегов в памяти процесса для автодополнения.
+
+    Имена хранятся в отсортированном списке: все теги с заданным префиксом
+    лежат в нем подряд и находятся двумя бинарными поисками (bisect), а
+    ранжирование по usage_count идет по словарю счетчиков. Готовые ответы
+    запоминаются по префиксу и сбрасываются только для префиксов
+    измененного тега, поэтому повторные нажатия клавиш (и самые дорогие
+    короткие префиксы) почти ничего не стоят, а запросов к БД на нажатие
+    нет совсем.
+
+    Теги, созданные в этом процессе, добавляются сразу (add), а созданные
+    другими процессами догружаются не чаще раза в
+    TAG_AUTOCOMPLETE_REFRESH_INTERVAL секунд запросом "id больше последнего
+    известного". Полная перезагрузка (удаления, счетчики других процессов) -
+    раз в TAG_AUTOCOMPLETE_REBUILD_INTERVAL секунд.
+    """
+    MAX_CACHED_PREFIXES = 4096
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = []
+        self._counts = {}
+        self._results = {}
+        self._max_id = 0
+        self._loaded_at = None
+        self._refreshed_at = None
+
+    def _tags(self):
+        return apps.get_model('tags', 'Tag').objects
+
+    def _load(self):
+        rows = list(self._tags().values_list('id', 'name', 'usage_count'))
+        self._names = sorted(name for _, name, _ in rows)
+        self._counts = {name: usage_count for _, name, usage_count in rows}
+        self._max_id = max((tag_id for tag_id, _, _ in rows), default=0)
+        self._results = {}
+        self._loaded_at = self._refreshed_at = time.monotonic()
+
+    def _refresh(self):
+        rows = self._tags().filter(id__gt=self._max_id).values_list('id', 'name', 'usage_count')
+        for tag_id, name, usage_count in rows:
+            self._add(name, usage_count)
+            self._max_id = max(self._max_id, tag_id)
+        self._refreshed_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= settings.TAG_AUTOCOMPLETE_REBUILD_INTERVAL:
+            self._load()
+        elif now - self._refreshed_at >= settings.TAG_AUTOCOMPLETE_REFRESH_INTERVAL:
+            self._refresh()
+
+    def _forget(self, name):
+        # Сбрасываем готовые ответы только для префиксов измененного имени
+        for length in range(1, len(name) + 1):
+            self._results.pop(name[:length], None)
+
+    def _add(self, name, usage_count):
+        if name not in self._counts:
+            insort(self._names, name)
+        self._counts[name] = usage_count
+        self._forget(name)
+
+    def add(self, name, usage_count=0):
+        """Добавляет тег или обновляет его счетчик."""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._add(name, usage_count)
+
+    def adjust(self, changes):
+        """Сдвигает usage_count тегов: {имя: изменение}."""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for name, delta in changes.items():
+                if name in self._counts:
+                    self._counts[name] = max(self._counts[name] + delta, 0)
+                    self._forget(name)
+
+    def remove(self, name):
+        with self._lock:
+            if self._counts.pop(name, None) is None:
+                return
+            position = bisect_left(self._names, name)
+            del self._names[position]
+            self._forget(name)
+
+    def suggest(self, prefix, limit=None):
+        """
+        Возвращает до limit (не больше TAG_AUTOCOMPLETE_LIMIT) пар
+        (имя, usage_count) с указанным префиксом, популярные первыми.
+        """
+        prefix = prefix.strip().lower()
+        max_limit = settings.TAG_AUTOCOMPLETE_LIMIT
+        limit = min(limit or max_limit, max_limit)
+        if not prefix:
+            return []
+
+        with self._lock:
+            self._ensure_fresh()
+            cached = self._results.get(prefix)
+            if cached is not None:
+                return cached[:limit]
+
+            start = bisect_left(self._names, prefix)
+            # '\uffff' больше любого символа имени - конец диапазона с префиксом
+            end = bisect_left(self._names, prefix + '\uffff', start)
+            counts = self._counts
+            top = heapq.nsmallest(
+                max_limit, self._names[start:end], key=lambda name: (-counts[name], name)
+            )
+            result = [(name, counts[name]) for name in top]
+
+            if len(self._results) >= self.MAX_CACHED_PREFIXES:
+                self._results = {}
+            self._results[prefix] = result
+            return result[:limit]
+
+
+tag_index = TagPrefixIndex()
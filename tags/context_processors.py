@@ -1,9 +1,9 @@
-from .models import Tag
+from django.db import DatabaseError
+from AnswerHub import sidebar
 
 def popular_tags(request):
     try:
-        popular_tags = Tag.objects.all().order_by('-usage_count')[:10]
-        return {'popular_tags': popular_tags}
-    except:
+        return {'popular_tags': sidebar.popular_tags.get()}
+    except DatabaseError:
         # Если база данных еще не готова, возвращаем пустой список
         return {'popular_tags': []}
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from tags.models import TagCooccurrence
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the tag co-occurrence table (top-N related tags per tag) from question tags. '
+        'Usage: python manage.py build_tag_cooccurrence [--top N] [--chunk-size N]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=settings.TAG_COOCCURRENCE_TOP_N, help='Number of related tags stored per tag')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Number of question-tag links fetched per round trip')
+
+    def handle(self, *args, **options):
+        if options['top'] <= 0 or options['chunk_size'] <= 0:
+            raise CommandError('top and chunk-size must be positive integers')
+
+        self.stdout.write('Building tag co-occurrence...')
+        started = time.monotonic()
+        questions, pairs, rows = TagCooccurrence.objects.rebuild(
+            top_n=options['top'], chunk_size=options['chunk_size']
+        )
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            'Counted %s tag pairs over %s questions, stored %s rows in %.2fs' % (pairs, questions, rows, elapsed)
+        ))
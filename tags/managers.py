@@ -1,4 +1,13 @@
-from django.db import models
+from collections import Counter, defaultdict
+from heapq import nlargest
+from itertools import permutations
+
+from django.apps import apps
+from django.db import connection, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .autocomplete import tag_index
 
 class TagQuerySet(models.QuerySet):
     """
@@ -19,6 +28,18 @@ class TagQuerySet(models.QuerySet):
         """
         return self.order_by('-usage_count')[:limit]
 
+    def recalculate_usage_count(self):
+        """
+        Пересчитывает usage_count по связям тегов с активными вопросами одним
+        UPDATE с подзапросом. Возвращает число обновленных тегов.
+        """
+        through = self.model.questions.through
+        counts = (
+            through.objects.filter(tag_id=OuterRef('pk'), question__is_active=True)
+            .order_by().values('tag_id').annotate(total=Count('*')).values('total')
+        )
+        return self.update(usage_count=Coalesce(Subquery(counts), Value(0)))
+
 
 class TagManager(models.Manager):
     """
@@ -36,3 +57,194 @@ class TagManager(models.Manager):
     def popular(self, limit=12):
         """Прокси для Question.objects.popular()"""
         return self.get_queryset().popular(limit)
+
+    def resolve(self, names):
+        """
+        Возвращает теги с указанными именами (в том же порядке, без повторов),
+        создавая недостающие одним bulk_create. Существующие теги читаются
+        одним запросом; конфликт с параллельным созданием того же тега
+        игнорируется, и тег перечитывается.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+
+        tags = {tag.name: tag for tag in self.filter(name__in=names)}
+        missing = [name for name in names if name not in tags]
+        if missing:
+            self.bulk_create(
+                [self.model(name=name, description=f'Вопросы о {name}') for name in missing],
+                ignore_conflicts=True,
+            )
+            created = list(self.filter(name__in=missing))
+            tags.update((tag.name, tag) for tag in created)
+            # bulk_create не отправляет post_save - добавляем новые теги в индекс сами
+            transaction.on_commit(
+                lambda: [tag_index.add(tag.name, tag.usage_count) for tag in created],
+                using=self.db,
+            )
+
+        return [tags[name] for name in names if name in tags]
+
+    def set_for_question(self, question, names):
+        """
+        Приводит теги вопроса к списку names: связи добавляются одним
+        bulk_create в таблицу связей и удаляются одним DELETE, а usage_count
+        меняется F()-выражениями только у добавленных и убранных тегов.
+        Возвращает (добавленные id тегов, убранные id тегов).
+        """
+        through = self.model.questions.through
+
+        with transaction.atomic(using=self.db):
+            new_tags = {tag.id: tag.name for tag in self.resolve(names)}
+            old_tags = dict(
+                through.objects.filter(question_id=question.pk).values_list('tag_id', 'tag__name')
+            )
+            new_ids = set(new_tags)
+            old_ids = set(old_tags)
+            added = new_ids - old_ids
+            removed = old_ids - new_ids
+
+            if removed:
+                through.objects.filter(question_id=question.pk, tag_id__in=removed).delete()
+                self.filter(pk__in=removed).update(usage_count=F('usage_count') - 1)
+            if added:
+                through.objects.bulk_create(
+                    [through(question_id=question.pk, tag_id=tag_id) for tag_id in added],
+                    ignore_conflicts=True,
+                )
+                self.filter(pk__in=added).update(usage_count=F('usage_count') + 1)
+
+            if added or removed:
+                apps.get_model('tags', 'TagCooccurrence').objects.apply_changes(old_ids, new_ids)
+                changes = {new_tags[tag_id]: 1 for tag_id in added}
+                changes.update({old_tags[tag_id]: -1 for tag_id in removed})
+                self._usage_changed(changes)
+
+        # Предзагруженные теги экземпляра больше не актуальны
+        getattr(question, '_prefetched_objects_cache', {}).pop('tags', None)
+        return added, removed
+
+    def release_for_question(self, question_id):
+        """
+        Вызывается при мягком удалении вопроса: связи с тегами остаются, но
+        usage_count и матрица совместного использования перестают учитывать
+        вопрос - так же, как их считают recalculate_usage_count и rebuild.
+        """
+        through = self.model.questions.through
+        with transaction.atomic(using=self.db):
+            tags = dict(through.objects.filter(question_id=question_id).values_list('tag_id', 'tag__name'))
+            if not tags:
+                return
+            self.filter(pk__in=tags).update(usage_count=F('usage_count') - 1)
+            apps.get_model('tags', 'TagCooccurrence').objects.apply_changes(tags, [])
+            self._usage_changed({name: -1 for name in tags.values()})
+
+    def _usage_changed(self, changes):
+        # update() и bulk_create не отправляют сигналы, поэтому кеш
+        # популярных тегов и индекс автодополнения обновляем сами после коммита
+        from AnswerHub import sidebar
+        transaction.on_commit(sidebar.popular_tags.invalidate, using=self.db)
+        transaction.on_commit(lambda: tag_index.adjust(changes), using=self.db)
+
+
+class TagCooccurrenceManager(models.Manager):
+    """Менеджер матрицы совместного использования тегов."""
+
+    def related_to(self, tag, limit=10):
+        """Самые частые соседи тега - один запрос по индексу (tag, -count)."""
+        return [
+            row.related for row in
+            self.filter(tag=tag, count__gt=0).select_related('related').order_by('-count', 'related__name')[:limit]
+        ]
+
+    def apply_changes(self, old_ids, new_ids):
+        """
+        Инкрементально обновляет матрицу, когда набор тегов вопроса меняется
+        с old_ids на new_ids: пары нового набора получают +1, пары старого -1.
+        Пары, общие для обоих наборов, не трогаются. Строки блокируются в
+        порядке (tag_id, related_id), чтобы параллельные правки вопросов с
+        общими тегами не взаимоблокировались; пары, чей счетчик дошел до
+        нуля, удаляются, как их не записал бы и rebuild.
+
+        rebuild хранит только top-N соседей каждого тега, поэтому пара вне
+        top-N, впервые встреченная здесь, получает count=1, а уменьшение
+        отсутствующей пары пропускается: для таких пар count - лишь нижняя
+        оценка до следующего rebuild.
+        """
+        old_pairs = set(permutations(old_ids, 2))
+        new_pairs = set(permutations(new_ids, 2))
+        added = sorted(new_pairs - old_pairs)
+        removed = sorted(old_pairs - new_pairs)
+        if not added and not removed:
+            return
+
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            if added:
+                values = ', '.join(['(%s, %s, 1)'] * len(added))
+                cursor.execute(
+                    f"INSERT INTO {table} (tag_id, related_id, count) VALUES {values} "
+                    f"ON CONFLICT (tag_id, related_id) DO UPDATE SET count = {table}.count + 1",
+                    [value for pair in added for value in pair],
+                )
+            if removed:
+                # Пары вне top-N могли не попасть в таблицу - уменьшаем только существующие
+                locked = list(
+                    self.select_for_update().filter(
+                        models.Q(*[models.Q(tag_id=tag_id, related_id=related_id) for tag_id, related_id in removed], _connector=models.Q.OR),
+                        count__gt=0,
+                    ).order_by('tag_id', 'related_id').values_list('pk', flat=True)
+                )
+                self.filter(pk__in=locked).update(count=F('count') - 1)
+                self.filter(pk__in=locked, count__lte=0).delete()
+
+    def rebuild(self, top_n=20, chunk_size=20000):
+        """
+        Полностью перестраивает матрицу по таблице связей вопросов и тегов.
+
+        Связи активных вопросов читаются потоком, упорядоченными по вопросу,
+        пары считаются в памяти (матрица разреженная - только встречавшиеся
+        пары), и для каждого тега сохраняются top_n самых частых соседей.
+        Возвращает (число вопросов, число различных пар, записано строк).
+        """
+        Tag = self.model._meta.get_field('tag').related_model
+        through = Tag.questions.through
+
+        links = (
+            through.objects.filter(question__is_active=True)
+            .order_by('question_id')
+            .values_list('question_id', 'tag_id')
+            .iterator(chunk_size=chunk_size)
+        )
+
+        neighbours = defaultdict(Counter)
+        questions = 0
+        current_id = None
+        current_tags = []
+        for question_id, tag_id in links:
+            if question_id != current_id:
+                for tag, related in permutations(current_tags, 2):
+                    neighbours[tag][related] += 1
+                questions += current_id is not None
+                current_id = question_id
+                current_tags = []
+            current_tags.append(tag_id)
+        for tag, related in permutations(current_tags, 2):
+            neighbours[tag][related] += 1
+        questions += current_id is not None
+
+        pairs = sum(len(counter) for counter in neighbours.values())
+        rows = [
+            self.model(tag_id=tag, related_id=related, count=count)
+            for tag, counter in neighbours.items()
+            for related, count in nlargest(top_n, counter.items(), key=lambda item: item[1])
+        ]
+
+        # Замена целиком в одной транзакции - читатели видят либо старую, либо новую матрицу
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            self.bulk_create(rows, batch_size=5000)
+
+        return questions, pairs, len(rows)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0003_alter_tag_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Совместных использований')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tags.tag', verbose_name='Связанный тег')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cooccurrences', to='tags.tag', verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'Совместное использование тегов',
+                'verbose_name_plural': 'Совместное использование тегов',
+                'indexes': [models.Index(fields=['tag', '-count'], name='tags_tagcoo_tag_id_f1eb38_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tag', 'related'), name='tags_cooccurrence_unique_pair')],
+            },
+        ),
+    ]
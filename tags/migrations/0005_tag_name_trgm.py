@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:05
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0004_tagcooccurrence'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='tag',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='tags_tag_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,6 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.db.models import Index
-from .managers import TagManager
+from .managers import TagCooccurrenceManager, TagManager
 
 class Tag(models.Model):
     name = models.CharField(
@@ -37,7 +38,51 @@ class Tag(models.Model):
         indexes = [
             Index(fields=['-usage_count', 'name']),
             Index(fields=['name']),
+            # Нечеткий поиск по имени (pg_trgm): similarity, ILIKE
+            GinIndex(name='tags_tag_name_trgm', fields=['name'], opclasses=['gin_trgm_ops']),
         ]
 
     def __str__(self):
         return self.name
+
+
+class TagCooccurrence(models.Model):
+    """
+    Разреженная матрица совместного использования тегов: сколько активных
+    вопросов помечены и tag, и related. Каждая пара хранится в обе стороны,
+    поэтому соседи тега читаются одним запросом по индексу (tag, -count).
+
+    Таблица строится командой build_tag_cooccurrence (top-N соседей на тег)
+    и дополняется инкрементально при сохранении тегов вопроса.
+    """
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='cooccurrences',
+        verbose_name='Тег'
+    )
+    related = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Связанный тег'
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Совместных использований'
+    )
+
+    objects = TagCooccurrenceManager()
+
+    class Meta:
+        verbose_name = 'Совместное использование тегов'
+        verbose_name_plural = 'Совместное использование тегов'
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'related'], name='tags_cooccurrence_unique_pair'),
+        ]
+        indexes = [
+            Index(fields=['tag', '-count']),
+        ]
+
+    def __str__(self):
+        return f"{self.tag_id} + {self.related_id}: {self.count}"
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from AnswerHub import sidebar
+from .autocomplete import tag_index
+from .models import Tag
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    """
+    Сбрасывает кеш популярных тегов при изменении тега
+    (в том числе его usage_count)
+    """
+    sidebar.popular_tags.invalidate()
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, **kwargs):
+    """Добавляет тег в индекс автодополнения (или обновляет его счетчик)."""
+    tag_index.add(instance.name, instance.usage_count)
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    tag_index.remove(instance.name)
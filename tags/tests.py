@@ -1,3 +1,95 @@
-from django.test import TestCase
+import time
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from questions.models import Question
+from users.models import User
+from .autocomplete import TagPrefixIndex
+from .models import Tag, TagCooccurrence
+
+
+class TagCountersTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author', password='x')
+        self.first = Question.objects.create(title='Первый', content='Текст', author=author)
+        self.second = Question.objects.create(title='Второй', content='Текст', author=author)
+        Tag.objects.set_for_question(self.first, ['django', 'orm', 'postgres'])
+        Tag.objects.set_for_question(self.second, ['django', 'orm'])
+
+    def _state(self):
+        return (
+            dict(Tag.objects.values_list('name', 'usage_count')),
+            set(TagCooccurrence.objects.values_list('tag__name', 'related__name', 'count')),
+        )
+
+    def test_soft_delete_matches_rebuild(self):
+        self.assertTrue(self.first.delete_question())
+        usage, pairs = self._state()
+        self.assertEqual(usage, {'django': 1, 'orm': 1, 'postgres': 0})
+        # Обнулившиеся пары удалены, а не оставлены с count=0
+        self.assertEqual(pairs, {('django', 'orm', 1), ('orm', 'django', 1)})
+
+        Tag.objects.all().recalculate_usage_count()
+        TagCooccurrence.objects.rebuild()
+        self.assertEqual(self._state(), (usage, pairs))
+
+        # Правка тегов оставляет ту же таблицу, что и rebuild
+        Tag.objects.set_for_question(self.second, ['orm', 'postgres'])
+        state = self._state()
+        TagCooccurrence.objects.rebuild()
+        self.assertEqual(self._state(), state)
+
+        # Повторное удаление ничего не меняет
+        self.assertFalse(self.first.delete_question())
+        self.assertEqual(self._state(), state)
+
+
+class StaticPrefixIndex(TagPrefixIndex):
+    """Индекс с фиксированным набором тегов вместо БД."""
+
+    def __init__(self, counts):
+        super().__init__()
+        self.initial = counts
+
+    def _load(self):
+        self._names = sorted(self.initial)
+        self._counts = dict(self.initial)
+        self._results = {}
+        self._loaded_at = self._refreshed_at = time.monotonic()
+
+    def _refresh(self):
+        self._refreshed_at = time.monotonic()
+
+
+@override_settings(TAG_AUTOCOMPLETE_LIMIT=3)
+class TagPrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = StaticPrefixIndex({
+            'django': 50, 'django-orm': 10, 'django-forms': 10, 'django-admin': 5,
+            'docker': 30, 'dotnet': 1, 'python': 40,
+        })
+
+    def test_prefix_lookup_and_ranking(self):
+        # Популярные первыми, при равном счетчике - по имени
+        self.assertEqual(self.index.suggest(' Django'), [('django', 50), ('django-forms', 10), ('django-orm', 10)])
+        self.assertEqual(self.index.suggest('do'), [('docker', 30), ('dotnet', 1)])
+        self.assertEqual(self.index.suggest('d', limit=1), [('django', 50)])
+        self.assertEqual(self.index.suggest('d', limit=100), [('django', 50), ('docker', 30), ('django-forms', 10)])
+        self.assertEqual(self.index.suggest('rust'), [])
+        self.assertEqual(self.index.suggest('  '), [])
+
+    def test_changes_invalidate_cached_prefixes(self):
+        self.assertEqual(self.index.suggest('django-')[0], ('django-forms', 10))
+        self.assertEqual(self.index.suggest('p'), [('python', 40)])
+
+        self.index.adjust({'django-admin': 20, 'missing': 5})
+        self.index.add('django-rest', 15)
+        self.assertEqual(
+            self.index.suggest('django-'),
+            [('django-admin', 25), ('django-rest', 15), ('django-forms', 10)],
+        )
+
+        self.index.remove('django')
+        self.index.remove('missing')
+        self.assertEqual(self.index.suggest('dj', limit=1), [('django-admin', 25)])
+        self.assertEqual(self.index.suggest('p'), [('python', 40)])
@@ -5,5 +5,6 @@ app_name = 'tags'
 
 urlpatterns = [
     path('', views.tag_list, name='list'),
+    path('api/autocomplete/', views.autocomplete, name='autocomplete'),
     path('<str:tag_name>/', views.tag_detail, name='detail'),
 ]
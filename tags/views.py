@@ -1,7 +1,12 @@
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
+from django.views.decorators.http import require_GET
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from .models import Tag
-from questions.models import Question
+from .autocomplete import tag_index
+from .models import Tag, TagCooccurrence
+from questions.models import Question, QuestionVote
+from questions.pagination import CursorPaginator
 
 def paginate(objects_list, request, per_page=10):
     paginator = Paginator(objects_list, per_page)
@@ -29,20 +34,31 @@ def tag_list(request):
 def tag_detail(request, tag_name):
     tag = get_object_or_404(Tag, name=tag_name)
 
-    questions = Question.objects.filter(
-        tags=tag,
-        is_active=True
-    ).select_related('author').prefetch_related('tags').order_by('-created_at')
+    questions = Question.objects.new().filter(tags=tag).with_prefetches()
 
-    page = paginate(questions, request, per_page=10)
-
-    # Получаем популярные теги с помощью Tag.objects.popular()
-    popular_tags = Tag.objects.popular(limit=12)
+    page = CursorPaginator(questions, per_page=10).get_page(request.GET.get('cursor'))
+    QuestionVote.objects.set_my_vote(request.user, page.object_list)
 
     return render(request, 'tags/detail.html', {
         'tag': tag,
         'page': page,
         'questions': page.object_list,
-        'questions_count': questions.count(),
-        'popular_tags': popular_tags,
+        'related_tags': TagCooccurrence.objects.related_to(tag, limit=settings.TAG_RELATED_LIMIT),
+    })
+
+
+@require_GET
+def autocomplete(request):
+    """
+    Подсказки тегов по префиксу: ?q=dj -> {"results": [{"name": "django", "usage_count": 42}]}.
+    Отвечает из индекса в памяти процесса, без запросов к БД.
+    """
+    try:
+        limit = max(int(request.GET.get('limit', settings.TAG_AUTOCOMPLETE_LIMIT)), 1)
+    except ValueError:
+        limit = settings.TAG_AUTOCOMPLETE_LIMIT
+
+    suggestions = tag_index.suggest(request.GET.get('q', ''), limit=limit)
+    return JsonResponse({
+        'results': [{'name': name, 'usage_count': usage_count} for name, usage_count in suggestions],
     })
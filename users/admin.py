@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import ReputationEvent, User
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -12,3 +12,12 @@ class CustomUserAdmin(UserAdmin):
             'fields': ('avatar', 'reputation', 'about', 'website', 'location')
         }),
     )
+
+
+@admin.register(ReputationEvent)
+class ReputationEventAdmin(admin.ModelAdmin):
+    list_display = ['user', 'kind', 'delta', 'object_id', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['user__username']
+    raw_id_fields = ['user']
+    readonly_fields = ['user', 'kind', 'delta', 'object_id', 'created_at']
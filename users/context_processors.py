@@ -1,10 +1,9 @@
-from users.models import User
+from AnswerHub import sidebar
 
 def top_users(request):
     """
     Контекстный процессор для получения списка лучших пользователей
     """
-    top_users_list = User.objects.order_by('-reputation')[:5]  # Получаем топ-5 пользователей
     return {
-        'top_users': top_users_list
+        'top_users': sidebar.top_users.get()
     }
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from AnswerHub import sidebar
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute User.reputation for all users from active questions and answers '
+        '(grouped aggregates joined into one bulk UPDATE per user id range). '
+        'Usage: python manage.py recalculate_reputation [--batch-size N] [--dry-run] [--from-votes]'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000, help='Number of user ids recomputed per UPDATE statement')
+        parser.add_argument('--dry-run', action='store_true', help='Only report users whose reputation differs, do not write anything')
+        parser.add_argument('--from-votes', action='store_true', help='Sum raw vote rows instead of the denormalized votes counters (slower)')
+        parser.add_argument('--show', type=int, default=20, help='Number of largest differences listed in the report')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        if batch_size <= 0:
+            raise CommandError('batch-size must be positive integer')
+
+        bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write('No users found')
+            return
+
+        self.stdout.write('Recalculating reputation%s...' % (' (dry run)' if dry_run else ''))
+        started = time.monotonic()
+        scanned = 0
+        changes = []
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            last = min(start + batch_size - 1, bounds['last'])
+            # Каждая пачка - отдельная короткая транзакция
+            changes.extend(User.objects.recalculate_reputation(
+                start, last, dry_run=dry_run, from_votes=options['from_votes']
+            ))
+            scanned += last - start + 1
+            self.stdout.write('.', ending='')
+        self.stdout.write(' done')
+
+        elapsed = time.monotonic() - started
+        if changes and not dry_run:
+            sidebar.top_users.invalidate()
+
+        changes.sort(key=lambda change: abs(change[2] - change[1]), reverse=True)
+        for user_id, old, new in changes[:options['show']]:
+            self.stdout.write('  user %s: %s -> %s (%+d)' % (user_id, old, new, new - old))
+        if len(changes) > options['show']:
+            self.stdout.write('  ... and %s more' % (len(changes) - options['show']))
+
+        self.stdout.write('Scanned id range of %s users in %.2fs (%.0f users/s)' % (
+            scanned, elapsed, scanned / elapsed if elapsed else 0
+        ))
+        self.stdout.write(self.style.SUCCESS('%s %s users, total drift %+d' % (
+            'Would update' if dry_run else 'Updated',
+            len(changes),
+            sum(new - old for _, old, new in changes),
+        )))
@@ -1,4 +1,6 @@
-from django.db import models
+from django.apps import apps
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Value, When
 # Импортируем базовый UserManager из django.contrib.auth
 from django.contrib.auth.models import UserManager as AuthUserManager
 
@@ -31,5 +33,164 @@ class UserManager(AuthUserManager):
         """Возвращает самых новых пользователей."""
         return self.get_queryset().recent()
 
-    # Сюда можно будет добавить методы для атомарного изменения репутации
-    # (например, User.objects.update_reputation(user_id, +10))
+    def change_reputation(self, user_id, delta, kind, object_id=None):
+        """
+        Атомарно меняет репутацию пользователя на delta (F-инкремент, без
+        пересчета по всем его вопросам и ответам) и записывает событие в
+        журнал репутации.
+        """
+        ReputationEvent = apps.get_model('users', 'ReputationEvent')
+        return ReputationEvent.objects.record([
+            ReputationEvent(user_id=user_id, delta=delta, kind=kind, object_id=object_id)
+        ])
+
+    def _reputation_sql(self, from_votes):
+        """
+        Запрос "пересчитанная репутация" для пользователей с id в диапазоне:
+        суммы голосов активных вопросов и ответов и число принятых ответов
+        считаются группировками по автору и присоединяются к таблице
+        пользователей. Возвращает только тех, у кого значение отличается.
+        """
+        qn = connection.ops.quote_name
+        ReputationEvent = apps.get_model('users', 'ReputationEvent')
+        Question = apps.get_model('questions', 'Question')
+        Answer = apps.get_model('answers', 'Answer')
+        users = qn(self.model._meta.db_table)
+        questions = qn(Question._meta.db_table)
+        answers = qn(Answer._meta.db_table)
+
+        if from_votes:
+            # Голоса суммируются по таблицам голосов - дольше, но не зависит
+            # от денормализованных счетчиков votes
+            question_votes = qn(apps.get_model('questions', 'QuestionVote')._meta.db_table)
+            answer_votes = qn(apps.get_model('answers', 'AnswerVote')._meta.db_table)
+            question_totals = f"""
+                SELECT q.author_id, SUM(v.value) AS votes
+                FROM {question_votes} v JOIN {questions} q ON q.id = v.question_id
+                WHERE q.is_active AND q.author_id BETWEEN %(first)s AND %(last)s
+                GROUP BY q.author_id
+            """
+            answer_totals = f"""
+                SELECT a.author_id, SUM(v.value) AS votes, 0 AS accepted
+                FROM {answer_votes} v JOIN {answers} a ON a.id = v.answer_id
+                WHERE a.is_active AND a.author_id BETWEEN %(first)s AND %(last)s
+                GROUP BY a.author_id
+                UNION ALL
+                SELECT author_id, 0, COUNT(*)
+                FROM {answers}
+                WHERE is_active AND is_correct AND author_id BETWEEN %(first)s AND %(last)s
+                GROUP BY author_id
+            """
+        else:
+            question_totals = f"""
+                SELECT author_id, SUM(votes) AS votes
+                FROM {questions}
+                WHERE is_active AND author_id BETWEEN %(first)s AND %(last)s
+                GROUP BY author_id
+            """
+            answer_totals = f"""
+                SELECT author_id, SUM(votes) AS votes, COUNT(*) FILTER (WHERE is_correct) AS accepted
+                FROM {answers}
+                WHERE is_active AND author_id BETWEEN %(first)s AND %(last)s
+                GROUP BY author_id
+            """
+
+        return f"""
+            WITH question_totals AS ({question_totals}),
+            answer_totals AS (
+                SELECT author_id, SUM(votes) AS votes, SUM(accepted) AS accepted
+                FROM ({answer_totals}) t
+                GROUP BY author_id
+            ),
+            computed AS (
+                SELECT
+                    u.id,
+                    u.reputation AS old,
+                    (
+                        {ReputationEvent.QUESTION_VOTE_WEIGHT} * COALESCE(qt.votes, 0)
+                        + {ReputationEvent.ANSWER_VOTE_WEIGHT} * COALESCE(ant.votes, 0)
+                        + {ReputationEvent.ANSWER_ACCEPTED_BONUS} * COALESCE(ant.accepted, 0)
+                    )::integer AS new
+                FROM {users} u
+                LEFT JOIN question_totals qt ON qt.author_id = u.id
+                LEFT JOIN answer_totals ant ON ant.author_id = u.id
+                WHERE u.id BETWEEN %(first)s AND %(last)s
+            )
+            SELECT id, old, new FROM computed WHERE old <> new
+        """
+
+    def recalculate_reputation(self, first_id, last_id, dry_run=False, from_votes=False):
+        """
+        Пересчитывает репутацию пользователей с id от first_id до last_id
+        включительно одним UPDATE ... FROM по сгруппированным агрегатам.
+        Расхождение прибавляется к текущему значению и записывается в журнал
+        событием-поправкой с той же дельтой, чтобы сумма журнала оставалась
+        равной User.reputation и при голосах, идущих во время пересчета.
+
+        Возвращает список (user_id, старое значение, новое значение) для
+        измененных пользователей; при dry_run ничего не меняет.
+        """
+        qn = connection.ops.quote_name
+        ReputationEvent = apps.get_model('users', 'ReputationEvent')
+        users = qn(self.model._meta.db_table)
+        events = qn(ReputationEvent._meta.db_table)
+        computed = self._reputation_sql(from_votes)
+        params = {'first': first_id, 'last': last_id, 'kind': ReputationEvent.ADJUSTMENT}
+
+        if dry_run:
+            sql = computed
+        else:
+            sql = f"""
+                WITH diff AS ({computed}),
+                updated AS (
+                    -- Поправка, а не абсолютное значение: голос, закоммиченный
+                    -- после снимка агрегатов, уже прибавил свою дельту к строке
+                    -- пользователя, и UPDATE перечитает ее, не затерев голос
+                    UPDATE {users} u SET reputation = u.reputation + (diff.new - diff.old)
+                    FROM diff WHERE u.id = diff.id
+                    RETURNING u.id
+                ),
+                logged AS (
+                    INSERT INTO {events} (user_id, kind, delta, created_at)
+                    SELECT id, %(kind)s, new - old, NOW() FROM diff
+                )
+                SELECT diff.id, diff.old, diff.new FROM diff JOIN updated ON updated.id = diff.id
+            """
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class ReputationEventManager(models.Manager):
+    """Менеджер журнала репутации."""
+
+    def record(self, events):
+        """
+        Записывает события репутации одним bulk_create и применяет их к
+        User.reputation одним UPDATE. События без пользователя (автор удален)
+        и с нулевым изменением пропускаются. Возвращает число записанных событий.
+        """
+        events = [event for event in events if event.user_id and event.delta]
+        if not events:
+            return 0
+
+        totals = {}
+        for event in events:
+            totals[event.user_id] = totals.get(event.user_id, 0) + event.delta
+
+        user_model = self.model._meta.get_field('user').related_model
+        with transaction.atomic(using=self.db):
+            self.bulk_create(events)
+            user_model._default_manager.filter(pk__in=totals).update(
+                reputation=F('reputation') + Case(
+                    *[When(pk=user_id, then=Value(delta)) for user_id, delta in totals.items()],
+                    default=Value(0),
+                )
+            )
+
+        # update() не отправляет post_save, поэтому кеш лучших пользователей
+        # сбрасываем сами - после коммита, чтобы не закешировать старые данные
+        from AnswerHub import sidebar
+        transaction.on_commit(sidebar.top_users.invalidate, using=self.db)
+        return len(events)
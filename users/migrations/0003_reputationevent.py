@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_user_created_at_alter_user_reputation_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReputationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('question_vote', 'Голос за вопрос'), ('answer_vote', 'Голос за ответ'), ('answer_accepted', 'Ответ принят'), ('question_deleted', 'Вопрос удален'), ('answer_deleted', 'Ответ удален')], max_length=32, verbose_name='Тип события')),
+                ('delta', models.IntegerField(verbose_name='Изменение репутации')),
+                ('object_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='ID вопроса или ответа')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата события')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reputation_events', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Событие репутации',
+                'verbose_name_plural': 'События репутации',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='users_reput_user_id_342f40_idx')],
+            },
+        ),
+    ]
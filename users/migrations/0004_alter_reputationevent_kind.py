@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_reputationevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reputationevent',
+            name='kind',
+            field=models.CharField(choices=[('question_vote', 'Голос за вопрос'), ('answer_vote', 'Голос за ответ'), ('answer_accepted', 'Ответ принят'), ('question_deleted', 'Вопрос удален'), ('answer_deleted', 'Ответ удален'), ('adjustment', 'Поправка при пересчете')], max_length=32, verbose_name='Тип события'),
+        ),
+    ]
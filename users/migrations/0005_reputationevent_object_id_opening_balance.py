@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_reputationevent_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reputationevent',
+            name='object_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ID вопроса или ответа'),
+        ),
+        # Начальный остаток: репутация, накопленная до появления журнала,
+        # записывается одним событием-поправкой на пользователя, чтобы сумма
+        # журнала сразу совпадала с User.reputation
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO users_reputationevent (user_id, kind, delta, created_at)
+                SELECT u.id, 'adjustment', u.reputation - COALESCE(e.total, 0), NOW()
+                FROM users_user u
+                LEFT JOIN (
+                    SELECT user_id, SUM(delta) AS total
+                    FROM users_reputationevent
+                    GROUP BY user_id
+                ) e ON e.user_id = u.id
+                WHERE u.reputation <> COALESCE(e.total, 0);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.db.models import Index
 from django.contrib.auth.models import AbstractUser
-from .managers import UserManager
+from .managers import ReputationEventManager, UserManager
 
 class User(AbstractUser):
     avatar = models.ImageField(
@@ -53,3 +53,70 @@ class User(AbstractUser):
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip() or self.username
+
+
+class ReputationEvent(models.Model):
+    """
+    Запись журнала репутации: одно изменение User.reputation и его причина.
+
+    Журнал только дополняется. Репутация пользователя равна сумме delta его
+    событий, а сам счетчик User.reputation меняется инкрементом F() в
+    момент записи события.
+    """
+    QUESTION_VOTE = 'question_vote'
+    ANSWER_VOTE = 'answer_vote'
+    ANSWER_ACCEPTED = 'answer_accepted'
+    QUESTION_DELETED = 'question_deleted'
+    ANSWER_DELETED = 'answer_deleted'
+    ADJUSTMENT = 'adjustment'
+
+    KIND_CHOICES = [
+        (QUESTION_VOTE, 'Голос за вопрос'),
+        (ANSWER_VOTE, 'Голос за ответ'),
+        (ANSWER_ACCEPTED, 'Ответ принят'),
+        (QUESTION_DELETED, 'Вопрос удален'),
+        (ANSWER_DELETED, 'Ответ удален'),
+        (ADJUSTMENT, 'Поправка при пересчете'),
+    ]
+
+    # Веса: очки за один голос за вопрос/ответ и бонус за правильный ответ
+    QUESTION_VOTE_WEIGHT = 5
+    ANSWER_VOTE_WEIGHT = 10
+    ANSWER_ACCEPTED_BONUS = 15
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='reputation_events',
+        verbose_name='Пользователь'
+    )
+    kind = models.CharField(
+        max_length=32,
+        choices=KIND_CHOICES,
+        verbose_name='Тип события'
+    )
+    delta = models.IntegerField(
+        verbose_name='Изменение репутации'
+    )
+    object_id = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='ID вопроса или ответа'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата события'
+    )
+
+    objects = ReputationEventManager()
+
+    class Meta:
+        verbose_name = 'Событие репутации'
+        verbose_name_plural = 'События репутации'
+        ordering = ['-created_at']
+        indexes = [
+            Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.delta:+d} ({self.kind})"
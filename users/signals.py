@@ -1,39 +1,20 @@
-from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from questions.models import Question
-from answers.models import Answer
+from AnswerHub import sidebar
+from .models import User
 
-def update_user_reputation(instance):
-    """
-    Обновляет репутацию пользователя на основе оценок его вопросов и ответов
-    """
-    user = instance.author
-
-    # Получаем сумму голосов всех вопросов пользователя
-    questions_rating = Question.objects.filter(author=user).aggregate(
-        total_rating=models.Sum('votes')
-    )['total_rating'] or 0
-
-    # Получаем сумму голосов всех ответов пользователя
-    answers_rating = Answer.objects.filter(author=user).aggregate(
-        total_rating=models.Sum('votes')
-    )['total_rating'] or 0
+# Поля пользователя, которые отображаются в блоке "Лучшие пользователи"
+TOP_USERS_FIELDS = {'reputation', 'username', 'avatar'}
 
-    # Устанавливаем новую репутацию (можно настроить веса для вопросов и ответов)
-    user.reputation = questions_rating * 5 + answers_rating * 10
-    user.save(update_fields=['reputation'])
-
-@receiver(post_save, sender=Question)
-def question_rating_changed(sender, instance, **kwargs):
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
     """
-    Сигнал, который срабатывает при изменении оценки вопроса
+    Сбрасывает кеш лучших пользователей, если изменились отображаемые поля
+    (например, при входе обновляется только last_login - кеш не трогаем)
     """
-    update_user_reputation(instance)
+    if update_fields is None or TOP_USERS_FIELDS.intersection(update_fields):
+        sidebar.top_users.invalidate()
 
-@receiver(post_save, sender=Answer)
-def answer_rating_changed(sender, instance, **kwargs):
-    """
-    Сигнал, который срабатывает при изменении оценки ответа
-    """
-    update_user_reputation(instance)
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    sidebar.top_users.invalidate()